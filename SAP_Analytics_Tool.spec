@@ -6,7 +6,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('data_generator.py', '.'), ('sap_data.csv', '.')],
-    hiddenimports=[],
+    # imported lazily inside functions for a fast start
+    hiddenimports=['data_analysis', 'report_cache', 'column_store', 'canvas', 'workers', 'matplotlib.backends.backend_qtagg'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
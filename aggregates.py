@@ -0,0 +1,468 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 10:02:37 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+# %%
+
+NUMERIC_FIELDS = ['Quantity', 'Amount']
+COUNT_FIELDS = ['CompanyCode', 'DocumentType', 'Plant']
+GROUP_FIELDS = ['CostCenter', 'DocumentType', 'Material']
+
+STATE_VERSION = 2
+
+# cumulative share (%) up to which materials are class A and B
+ABC_THRESHOLDS = (80, 95)
+TIME_SERIES_FREQ = 'M'
+# months in the rolling average of the monthly trend
+ROLLING_WINDOW = 3
+
+# %% report shaping shared by the in-memory and the aggregate-based analyzers
+
+def share_table(table):
+    """sum/mean/count per key plus percentage of the total, sorted by sum"""
+    table = table[['sum', 'count']].copy()
+    table['count'] = table['count'].astype('int64')
+    table.insert(1, 'mean', table['sum'] / table['count'])
+    table['percentage'] = table['sum'] / table['sum'].sum() * 100
+    return table.sort_values('sum', ascending=False)
+
+
+def monthly_trend(monthly, window=ROLLING_WINDOW):
+    """Add the rolling average and the month-over-month and year-over-year change (%) of the monthly sums"""
+    monthly['rolling_avg'] = monthly['sum'].rolling(window=window).mean()
+    monthly['mom_pct'] = monthly['sum'].pct_change(fill_method=None) * 100
+    monthly['yoy_pct'] = monthly['sum'].pct_change(12, fill_method=None) * 100
+    return monthly
+
+
+def abc_classification(material_value, thresholds=ABC_THRESHOLDS):
+    """Cumulative share and A/B/C class of a per-material sum"""
+    material_value = material_value.sort_values('Amount', ascending=False)
+    material_value['cumulative_percentage'] = material_value['Amount'].cumsum() / material_value['Amount'].sum() * 100
+    material_value['ABC_Class'] = np.where(
+        material_value['cumulative_percentage'] <= thresholds[0], 'A',
+        np.where(material_value['cumulative_percentage'] <= thresholds[1], 'B', 'C')
+    )
+    return material_value
+
+# %% mergeable accumulators
+
+class Moments:
+    """Count, mean, M2, min and max of a column, mergeable with Chan's update"""
+    def __init__(self):
+        self.count = 0
+        self.mean = np.nan
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, values):
+        missing = np.isnan(values)
+        if missing.any():
+            values = values[~missing]
+        if len(values) == 0:
+            return
+        other = Moments()
+        other.count = len(values)
+        other.mean = values.mean()
+        other.m2 = np.square(values - other.mean).sum()
+        other.min = values.min()
+        other.max = values.max()
+        self.merge(other)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1), like pandas"""
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+
+class Comoments:
+    """Streaming Pearson correlation of two columns (pairwise complete rows)"""
+    def __init__(self):
+        self.count = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.m2_y = 0.0
+        self.c_xy = 0.0
+
+    def update(self, x, y):
+        missing = np.isnan(x) | np.isnan(y)
+        if missing.any():
+            x, y = x[~missing], y[~missing]
+        if len(x) == 0:
+            return
+        other = Comoments()
+        other.count = len(x)
+        other.mean_x, other.mean_y = x.mean(), y.mean()
+        dx, dy = x - other.mean_x, y - other.mean_y
+        other.m2_x, other.m2_y, other.c_xy = (dx * dx).sum(), (dy * dy).sum(), (dx * dy).sum()
+        self.merge(other)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return
+        count = self.count + other.count
+        factor = self.count * other.count / count
+        dx, dy = other.mean_x - self.mean_x, other.mean_y - self.mean_y
+        self.m2_x += other.m2_x + dx * dx * factor
+        self.m2_y += other.m2_y + dy * dy * factor
+        self.c_xy += other.c_xy + dx * dy * factor
+        self.mean_x += dx * other.count / count
+        self.mean_y += dy * other.count / count
+        self.count = count
+
+    @property
+    def correlation(self):
+        return self.c_xy / np.sqrt(self.m2_x * self.m2_y) if self.count > 1 else np.nan
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch) with relative error alpha.
+
+    Values are counted in buckets whose bounds grow by gamma = (1+a)/(1-a),
+    so any returned quantile is within a factor of (1 +/- alpha) of a true
+    value at that rank. The number of buckets only depends on the value
+    range, and two sketches merge by adding their bucket counts.
+    """
+    def __init__(self, alpha=0.005):
+        self.alpha = alpha
+        self.log_gamma = np.log((1 + alpha) / (1 - alpha))
+        self.zero_count = 0
+        self.positive = (0, np.zeros(0, dtype=np.int64))
+        self.negative = (0, np.zeros(0, dtype=np.int64))
+
+    @property
+    def count(self):
+        return self.zero_count + self.positive[1].sum() + self.negative[1].sum()
+
+    @staticmethod
+    def _add(store, keys, counts):
+        """Add counts at integer keys to an (offset, counts) dense store"""
+        offset, bins = store
+        if len(keys) == 0:
+            return store
+        low = min(keys.min(), offset) if len(bins) else keys.min()
+        high = max(keys.max(), offset + len(bins) - 1) if len(bins) else keys.max()
+        merged = np.zeros(high - low + 1, dtype=np.int64)
+        merged[offset - low:offset - low + len(bins)] += bins
+        np.add.at(merged, keys - low, counts)
+        return low, merged
+
+    def _keys(self, values):
+        return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        self.zero_count += int((values == 0).sum())
+        for name, part in (('positive', values[values > 0]), ('negative', -values[values < 0])):
+            keys, counts = np.unique(self._keys(part), return_counts=True)
+            setattr(self, name, self._add(getattr(self, name), keys, counts))
+
+    def merge(self, other):
+        self.zero_count += other.zero_count
+        for name in ('positive', 'negative'):
+            offset, bins = getattr(other, name)
+            keys = np.arange(offset, offset + len(bins))
+            setattr(self, name, self._add(getattr(self, name), keys, bins))
+
+    def _value(self, key):
+        return 2 * np.exp(key * self.log_gamma) / (1 + np.exp(self.log_gamma))
+
+    def quantile(self, q):
+        count = self.count
+        if count == 0:
+            return np.nan
+        rank = q * (count - 1)
+        neg_offset, neg_bins = self.negative
+        # ascending order: largest negative magnitude first, then zeros, then positives
+        if rank < neg_bins.sum():
+            cumulative = np.cumsum(neg_bins[::-1])
+            key = neg_offset + len(neg_bins) - 1 - np.searchsorted(cumulative, rank, side='right')
+            return -self._value(key)
+        rank -= neg_bins.sum()
+        if rank < self.zero_count:
+            return 0.0
+        rank -= self.zero_count
+        pos_offset, pos_bins = self.positive
+        key = pos_offset + np.searchsorted(np.cumsum(pos_bins), rank, side='right')
+        return self._value(key)
+
+# %%
+
+def factorize(values):
+    """Integer codes (-1 for missing) and labels of a key column"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values)
+
+
+def value_counts(codes, labels):
+    """Occurrences per label with np.bincount"""
+    return pd.Series(np.bincount(codes[codes >= 0], minlength=len(labels)), index=labels)
+
+
+def grouped_sums(codes, labels, values, valid=None):
+    """
+    sum/count of values per code with np.bincount, for the codes that occur.
+
+    valid is the optional non-missing mask of values; missing values must
+    already be zeroed in values, so the same arrays serve every key column.
+    """
+    if (codes < 0).any():
+        keep = codes >= 0
+        codes, values = codes[keep], values[keep]
+        valid = None if valid is None else valid[keep]
+    rows = np.bincount(codes, minlength=len(labels))
+    sums = np.bincount(codes, weights=values, minlength=len(labels))
+    counts = rows if valid is None else np.bincount(codes, weights=valid, minlength=len(labels)).astype(np.int64)
+    present = rows > 0
+    return pd.DataFrame({'sum': sums[present], 'count': counts[present]}, index=labels[present])
+
+
+def month_codes(dates):
+    """Month number relative to the first month and the month labels of a date column"""
+    days = dates.to_numpy().astype('datetime64[D]')
+    valid = ~np.isnat(days)
+    if not valid.any():
+        return np.full(len(days), -1), pd.DatetimeIndex([])
+    days = days.view(np.int64)
+    first, last = days[valid].min(), days[valid].max()
+    # month of every calendar day in range, then one gather instead of a per-row calendar conversion
+    day_months = np.arange(first, last + 1).astype('datetime64[D]').astype('datetime64[M]').view(np.int64)
+    codes = day_months[np.where(valid, days - first, 0)] - day_months[0]
+    codes[~valid] = -1
+    labels = pd.DatetimeIndex(np.arange(day_months[0], day_months[-1] + 1).astype('datetime64[M]').astype('datetime64[ns]'))
+    return codes, labels
+
+
+def save_versioned(obj, path, version):
+    """Pickle obj with a format version, atomically, so an interrupted write keeps the old file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': version, 'state': obj}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_versioned(path, version, name='state'):
+    """Object written by save_versioned; other format versions are refused"""
+    with open(path, 'rb') as f:
+        stored = pickle.load(f)
+    if stored.get('version') != version:
+        raise ValueError(f"Unsupported {name} version in {path}: {stored.get('version')}")
+    return stored['state']
+
+
+def _add_tables(left, right):
+    """Add two keyed sum/count tables, keeping keys present in either"""
+    if left is None:
+        return right
+    return left.add(right, fill_value=0)
+
+
+class ReportState:
+    """
+    Mergeable aggregate state behind every report of generate_all_reports.
+
+    update() folds in one chunk of rows and merge() combines the states of
+    independent chunks, files or workers, so reports() can be produced for
+    data that never fits in memory at once. Everything is exact except the
+    medians, which come from a QuantileSketch (none if alpha is None).
+
+    All grouped figures are computed from factorized integer codes with
+    np.bincount, one reduction per key column instead of a hash group-by.
+
+    periods can hold a time_series.PeriodAggregates, which is then updated,
+    merged and persisted together with the report figures.
+    """
+    def __init__(self, alpha=0.005, periods=None):
+        self.total_records = 0
+        self.start = pd.NaT
+        self.end = pd.NaT
+        self.moments = {field: Moments() for field in NUMERIC_FIELDS}
+        self.sketches = {} if alpha is None else {field: QuantileSketch(alpha) for field in NUMERIC_FIELDS}
+        self.comoments = Comoments()
+        self.counts = {field: pd.Series(dtype='int64') for field in COUNT_FIELDS}
+        self.groups = {field: None for field in GROUP_FIELDS + ['Month']}
+        self.periods = periods
+        self.sources = []
+
+    def save(self, path):
+        """Persist the state atomically, so an interrupted write keeps the old file"""
+        save_versioned(self, path, STATE_VERSION)
+
+    @classmethod
+    def load(cls, path):
+        """Load a state written by save()"""
+        return load_versioned(path, STATE_VERSION, 'report state')
+
+    def _extend_period(self, start, end):
+        self.start = start if pd.isna(self.start) else min(self.start, start)
+        self.end = end if pd.isna(self.end) else max(self.end, end)
+
+    def update(self, chunk):
+        """Fold one DataFrame chunk (with parsed PostingDate) into the state"""
+        if len(chunk) == 0:
+            return self
+        self._extend_period(chunk['PostingDate'].min(), chunk['PostingDate'].max())
+        self.total_records += len(chunk)
+
+        values = {field: chunk[field].to_numpy(dtype=np.float64) for field in NUMERIC_FIELDS}
+        for field in NUMERIC_FIELDS:
+            self.moments[field].update(values[field])
+            if field in self.sketches:
+                self.sketches[field].update(values[field])
+        self.comoments.update(values['Quantity'], values['Amount'])
+
+        keys = {field: factorize(chunk[field]) for field in set(COUNT_FIELDS + GROUP_FIELDS)}
+        keys['Month'] = month_codes(chunk['PostingDate'])
+        for field in COUNT_FIELDS:
+            self.counts[field] = self.counts[field].add(value_counts(*keys[field]), fill_value=0)
+        amount = values['Amount']
+        valid = ~np.isnan(amount)
+        if not valid.all():
+            amount = np.where(valid, amount, 0.0)
+        for field in self.groups:
+            table = grouped_sums(*keys[field], amount, None if valid.all() else valid)
+            self.groups[field] = _add_tables(self.groups[field], table)
+        if self.periods is not None:
+            self.periods.update(chunk)
+        return self
+
+    def merge(self, other):
+        """Combine with the state of another, disjoint set of rows"""
+        if other.total_records == 0:
+            return self
+        self._extend_period(other.start, other.end)
+        self.total_records += other.total_records
+        for field in NUMERIC_FIELDS:
+            self.moments[field].merge(other.moments[field])
+            if field in self.sketches and field in other.sketches:
+                self.sketches[field].merge(other.sketches[field])
+        self.comoments.merge(other.comoments)
+        for field in COUNT_FIELDS:
+            self.counts[field] = self.counts[field].add(other.counts[field], fill_value=0)
+        for field in self.groups:
+            if other.groups[field] is not None:
+                self.groups[field] = _add_tables(self.groups[field], other.groups[field])
+        if self.periods is not None and other.periods is not None:
+            self.periods.merge(other.periods)
+        elif self.periods is not None:
+            # the other rows are missing from the period aggregates, which would be incomplete
+            self.periods = None
+        self.sources += other.sources
+        return self
+
+    def basic_statistics(self):
+        return {
+            'total_records': self.total_records,
+            'time_period': {'start': self.start, 'end': self.end},
+            'numeric_fields': {
+                field: {
+                    'mean': self.moments[field].mean,
+                    'median': self.sketches[field].quantile(0.5) if field in self.sketches else np.nan,
+                    'std': self.moments[field].std,
+                    'min': self.moments[field].min,
+                    'max': self.moments[field].max
+                }
+                for field in NUMERIC_FIELDS
+            },
+            'categorical_counts': {
+                field: counts[counts > 0].astype('int64').sort_values(ascending=False).to_dict()
+                for field, counts in self.counts.items()
+            }
+        }
+
+    def _table(self, field):
+        """sum/count table of a key, empty before any row with a key value was folded in"""
+        table = self.groups[field]
+        if table is None:
+            index = pd.DatetimeIndex([]) if field == 'Month' else pd.Index([], dtype=object)
+            table = pd.DataFrame({'sum': np.zeros(0), 'count': np.zeros(0, dtype=np.int64)}, index=index)
+        return table
+
+    def time_series(self):
+        table = self._table('Month')
+        if table.empty:
+            full_range = pd.DatetimeIndex([], freq=TIME_SERIES_FREQ, name='PostingDate')
+            monthly = pd.DataFrame({'sum': np.zeros(0), 'mean': np.zeros(0), 'count': np.zeros(0, dtype=np.int64)},
+                                   index=full_range)
+            return monthly_trend(monthly)
+        month_ends = (table.index.to_numpy().astype('datetime64[M]') + 1).astype('datetime64[D]') - 1
+        table = table.set_axis(pd.DatetimeIndex(month_ends))
+        full_range = pd.date_range(table.index.min(), table.index.max(), freq=TIME_SERIES_FREQ, name='PostingDate')
+        monthly = table.reindex(full_range, fill_value=0)
+        monthly = monthly.assign(mean=monthly['sum'] / monthly['count'])[['sum', 'mean', 'count']]
+        monthly['count'] = monthly['count'].astype('int64')
+        return monthly_trend(monthly)
+
+    def group_report(self, field):
+        return share_table(self._table(field).rename_axis(field))
+
+    def material_analysis(self):
+        material_value = self._table('Material')[['sum']].rename(columns={'sum': 'Amount'}).rename_axis('Material')
+        return abc_classification(material_value)
+
+    def correlation(self):
+        r = self.comoments.correlation
+        # like DataFrame.corr, even the diagonal is NaN without two complete rows
+        one = 1.0 if self.comoments.count > 1 else np.nan
+        return pd.DataFrame([[one, r], [r, one]], index=NUMERIC_FIELDS, columns=NUMERIC_FIELDS)
+
+    def reports(self):
+        """Report dict with the same keys and shapes as SAPDataAnalyzer.generate_all_reports"""
+        return {
+            'basic_statistics': self.basic_statistics(),
+            'time_series': self.time_series(),
+            'cost_centers': self.group_report('CostCenter'),
+            'material_analysis': self.material_analysis(),
+            'correlation': self.correlation(),
+            'document_types': self.group_report('DocumentType')
+        }
+
+
+def fused_reports(df):
+    """
+    All reports of generate_all_reports from one pass over an in-memory frame.
+
+    Same as ReportState.reports(), but with exact medians instead of a sketch.
+    """
+    reports = ReportState(alpha=None).update(df).reports()
+    for field in NUMERIC_FIELDS:
+        reports['basic_statistics']['numeric_fields'][field]['median'] = df[field].median()
+    # a groupby on a categorical column returns a CategoricalIndex, keep that for the group reports
+    for name, field in [('cost_centers', 'CostCenter'), ('material_analysis', 'Material'),
+                        ('document_types', 'DocumentType')]:
+        if isinstance(df[field].dtype, pd.CategoricalDtype):
+            report = reports[name]
+            report.index = pd.CategoricalIndex(report.index, categories=df[field].cat.categories,
+                                               name=report.index.name)
+    return reports
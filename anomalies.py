@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 20:03:12 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import time_series
+
+# %%
+
+# postings are compared with the other postings of their group
+GROUP_COLUMNS = ['CostCenter', 'GLAccount']
+
+# robust z-score above which a value is an outlier (Iglewicz and Hoaglin)
+Z_THRESHOLD = 3.5
+# z = MAD_SCALE * (x - median) / MAD is comparable to a standard z-score for normal data
+MAD_SCALE = 0.6745
+# mean absolute deviation scale used where the MAD is 0
+MEAN_AD_SCALE = 1.2533
+IQR_FACTOR = 1.5
+
+# posted periods a cost center/G/L combination needs before its period totals are scored
+MIN_PERIODS = 6
+
+TOP_N = 100
+
+# %% grouped statistics
+
+def group_codes(df, columns):
+    """
+    Integer group of every row over the combination of columns (-1 if any is
+    missing) and the labels of each column. Groups are mixed-radix codes of
+    the column codes, so group g decodes into one label per column.
+    """
+    codes = np.zeros(len(df), dtype=np.int64)
+    missing = np.zeros(len(df), dtype=bool)
+    labels = []
+    for column in columns:
+        column_codes, column_labels = aggregates.factorize(df[column])
+        missing |= column_codes < 0
+        codes = codes * len(column_labels) + column_codes
+        labels.append(column_labels)
+    codes[missing] = -1
+    return codes, labels
+
+
+def group_space(labels):
+    """Number of possible groups of group_codes"""
+    return int(np.prod([len(column_labels) for column_labels in labels], dtype=np.int64))
+
+
+def decode_groups(groups, labels, columns):
+    """Columns of labels of mixed-radix group codes"""
+    decoded = {}
+    for column, column_labels in zip(reversed(columns), reversed(labels)):
+        groups, column_codes = np.divmod(groups, len(column_labels))
+        decoded[column] = column_labels.take(column_codes)
+    return {column: decoded[column] for column in columns}
+
+
+def compact_groups(groups, n_groups):
+    """
+    The occurring groups and every row's position among them. A bincount
+    over the group space finds them without sorting the rows, unless the
+    space is much larger than the rows.
+    """
+    if n_groups > 4 * len(groups) + 1024:
+        return np.unique(groups, return_inverse=True)
+    occurs = np.bincount(groups, minlength=n_groups) > 0
+    return np.flatnonzero(occurs), (np.cumsum(occurs) - 1)[groups]
+
+
+def grouped_quantiles(values, groups, n_groups, quantiles):
+    """
+    Quantiles (linear interpolation) of values per group 0..n_groups-1, NaN
+    for empty groups, as an array of shape (len(quantiles), n_groups).
+
+    The values are sorted once and then stably by their small integer group,
+    so each group is a sorted slice and every quantile is a gather at the
+    slice offsets, for all groups at once.
+    """
+    order = np.argsort(values)
+    group_dtype = np.int16 if n_groups < np.iinfo(np.int16).max else np.int64
+    order = order[np.argsort(groups[order].astype(group_dtype), kind='stable')]
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    result = np.full((len(quantiles), n_groups), np.nan)
+    present = counts > 0
+    for i, q in enumerate(quantiles):
+        position = starts[present] + q * (counts[present] - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        result[i, present] = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+    return result
+
+
+def robust_scores(values, groups, n_groups):
+    """
+    Robust z-score and IQR outlier flag of every value against its group.
+
+    Returns (z, iqr_outlier, stats) where stats holds count, median, MAD,
+    Q1 and Q3 per group. Where a group's MAD is 0 the mean absolute
+    deviation is used instead; a value equal to a constant group scores 0.
+    """
+    median, q1, q3 = grouped_quantiles(values, groups, n_groups, (0.5, 0.25, 0.75))
+    deviation = np.abs(values - median[groups])
+    mad = grouped_quantiles(deviation, groups, n_groups, (0.5,))[0]
+    counts = np.bincount(groups, minlength=n_groups)
+    mean_ad = np.bincount(groups, weights=deviation, minlength=n_groups) / np.maximum(counts, 1)
+
+    scale = np.where(mad > 0, mad / MAD_SCALE, mean_ad * MEAN_AD_SCALE)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (values - median[groups]) / scale[groups]
+    z[deviation == 0] = 0.0
+
+    iqr = q3 - q1
+    iqr_outlier = (values < (q1 - IQR_FACTOR * iqr)[groups]) | (values > (q3 + IQR_FACTOR * iqr)[groups])
+    stats = pd.DataFrame({'count': counts, 'median': median, 'mad': mad, 'q1': q1, 'q3': q3})
+    return z, iqr_outlier, stats
+
+# %% detectors
+
+def posting_outliers(df, group_columns=GROUP_COLUMNS, measure='Amount', threshold=Z_THRESHOLD):
+    """
+    Postings whose measure is far from the other postings of their group,
+    by robust z-score (|z| > threshold) or outside the IQR fences, sorted by |z|.
+    The index holds the row positions in df.
+    """
+    groups, labels = group_codes(df, group_columns)
+    values = df[measure].to_numpy(dtype=np.float64)
+    rows = np.flatnonzero((groups >= 0) & ~np.isnan(values))
+    present, compact = compact_groups(groups[rows], group_space(labels))
+    z, iqr_outlier, stats = robust_scores(values[rows], compact, len(present))
+
+    flagged = (np.abs(z) > threshold) | iqr_outlier
+    rows, compact = rows[flagged], compact[flagged]
+    result = pd.DataFrame(decode_groups(present[compact], labels, group_columns), index=pd.Index(rows, name='row'))
+    for column in ['PostingDate', 'DocumentNumber']:
+        if column in df:
+            result[column] = df[column].to_numpy()[rows]
+    result[measure] = values[rows]
+    result['median'] = stats['median'].to_numpy()[compact]
+    result['mad'] = stats['mad'].to_numpy()[compact]
+    result['z_score'] = z[flagged]
+    result['iqr_outlier'] = iqr_outlier[flagged]
+    return result.iloc[np.argsort(-np.abs(result['z_score'].to_numpy()), kind='stable')]
+
+
+def combination_outliers(df, group_columns=GROUP_COLUMNS, measure='Amount', threshold=Z_THRESHOLD,
+                         min_periods=MIN_PERIODS):
+    """
+    Periods in which a combination of group_columns (e.g. cost center and
+    G/L account) posted an unusual total. The totals of the fiscal periods
+    a combination posted in are scored against the median/MAD of that
+    combination's own posted periods; periods without postings are not
+    counted as zeros, and combinations with fewer than min_periods posted
+    periods are not scored at all. Sorted by |z|.
+    """
+    empty = pd.DataFrame(columns=group_columns + ['period', measure, 'count', 'median', 'z_score'])
+    groups, labels = group_codes(df, group_columns)
+    granularity = 'fiscal_period' if {'FiscalYear', 'FiscalPeriod'} <= set(df.columns) else 'month'
+    periods = time_series.period_keys(df, granularity)
+    values = df[measure].to_numpy(dtype=np.float64)
+    keep = (groups >= 0) & (periods >= 0) & ~np.isnan(values)
+    groups, periods, values = groups[keep], periods[keep], values[keep]
+    if not len(values):
+        return empty
+
+    combinations, combination_codes = compact_groups(groups, group_space(labels))
+    first = periods.min()
+    n_periods = periods.max() - first + 1
+    cells = combination_codes * n_periods + (periods - first)
+    size = len(combinations) * n_periods
+    counts = np.bincount(cells, minlength=size)
+    occupied = np.flatnonzero(counts)
+    totals = np.bincount(cells, weights=values, minlength=size)[occupied]
+    counts = counts[occupied]
+
+    # only combinations with enough posted periods have a meaningful median/MAD
+    combination = occupied // n_periods
+    scored = np.bincount(combination, minlength=len(combinations))[combination] >= min_periods
+    occupied, totals, counts, combination = occupied[scored], totals[scored], counts[scored], combination[scored]
+    if not len(occupied):
+        return empty
+    z, _, stats = robust_scores(totals, combination, len(combinations))
+
+    flagged = np.abs(z) > threshold
+    combination, occupied = combination[flagged], occupied[flagged]
+    result = pd.DataFrame(decode_groups(combinations[combination], labels, group_columns))
+    result['period'] = pd.PeriodIndex.from_ordinals(first + occupied % n_periods, freq='M')
+    result[measure] = totals[flagged]
+    result['count'] = counts[flagged]
+    result['median'] = stats['median'].to_numpy()[combination]
+    result['z_score'] = z[flagged]
+    return result.iloc[np.argsort(-np.abs(result['z_score'].to_numpy()), kind='stable')].reset_index(drop=True)
+
+
+def duplicate_documents(df, columns=('DocumentNumber',), measure='Amount'):
+    """
+    Document numbers (or combinations of columns) that occur more than once.
+
+    Integer document numbers are their own hash; other keys are hashed to
+    64-bit values with pandas' vectorized hashing. Duplicates are then found
+    with one hash-table pass. Returns one row per duplicated key with its
+    number of postings, total measure and first row, most frequent first.
+    """
+    columns = list(columns)
+    present = df[columns].notna().all(axis=1).to_numpy()
+    if len(columns) == 1 and pd.api.types.is_integer_dtype(df[columns[0]]):
+        keys = df[columns[0]].reset_index(drop=True)
+    else:
+        keys = pd.Series(pd.util.hash_pandas_object(df[columns], index=False).to_numpy())
+    rows = np.flatnonzero(keys.duplicated(keep=False).to_numpy() & present)
+    codes, uniques = pd.factorize(keys.iloc[rows])
+    first = np.full(len(uniques), len(df), dtype=np.int64)
+    np.minimum.at(first, codes, rows)
+    result = df[columns].iloc[first].reset_index(drop=True)
+    result['postings'] = np.bincount(codes, minlength=len(uniques))
+    if measure in df:
+        amounts = df[measure].to_numpy(dtype=np.float64)[rows]
+        result[measure] = np.bincount(codes, weights=np.nan_to_num(amounts), minlength=len(uniques))
+    result['first_row'] = first
+    return result.sort_values(['postings', 'first_row'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+# %%
+
+def detect_anomalies(df, group_columns=GROUP_COLUMNS, measure='Amount', threshold=Z_THRESHOLD):
+    """Run every detector whose columns are present: {'postings', 'combinations', 'duplicates'}"""
+    results = {}
+    if all(column in df for column in group_columns + [measure]):
+        results['postings'] = posting_outliers(df, group_columns, measure, threshold)
+        if 'PostingDate' in df or {'FiscalYear', 'FiscalPeriod'} <= set(df.columns):
+            results['combinations'] = combination_outliers(df, group_columns, measure, threshold)
+    if 'DocumentNumber' in df:
+        results['duplicates'] = duplicate_documents(df, measure=measure)
+    return results
+
+
+def top_anomalies(results, n=TOP_N):
+    """
+    The n strongest anomalies of each kind in one table: kind, score (|z|,
+    or the number of postings of a duplicate), the posting or combination
+    and the expected value where there is one.
+    """
+    tables = []
+    for kind, table in results.items():
+        table = table.head(n)
+        if kind == 'duplicates':
+            score = table['postings'].astype(np.float64)
+        else:
+            score = table['z_score'].abs()
+        table = table.drop(columns=['z_score', 'mad', 'iqr_outlier', 'postings', 'first_row'], errors='ignore')
+        tables.append(table.reset_index(drop=kind != 'postings').assign(kind=kind, score=score.to_numpy()))
+    if not tables:
+        return pd.DataFrame(columns=['kind', 'score'])
+    top = pd.concat(tables, ignore_index=True)
+    if 'row' in top:
+        top['row'] = top['row'].astype('Int64')
+    front = ['kind', 'score']
+    return top[front + [column for column in top.columns if column not in front]]
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 18:52:16 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+import multiprocessing
+
+import pandas as pd
+
+import aggregates
+import data_storage
+from data_analysis import StreamingSAPDataAnalyzer
+from profiling import rss_bytes
+
+# %%
+
+STATE_FILE = 'state.pkl'
+SUMMARY_FILE = 'batch_summary.json'
+CONSOLIDATED_DIR = '_consolidated'
+
+# %%
+
+def expand_inputs(patterns):
+    """Sorted, de-duplicated input paths of files, directories and glob patterns"""
+    paths = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise FileNotFoundError(f"No input matches {pattern}")
+        paths.extend(os.path.abspath(path) for path in matches)
+    return sorted(set(paths))
+
+
+def output_names(paths):
+    """Unique output directory name per input: its path below the common parent ('/' becomes '__')"""
+    if len(paths) == 1:
+        root = os.path.dirname(paths[0])
+    else:
+        root = os.path.commonpath([os.path.dirname(path) for path in paths])
+    return {path: os.path.relpath(path, root).replace(os.sep, '__') for path in paths}
+
+
+def write_reports(reports, directory, frame_format='parquet'):
+    """Report tables as Parquet (or JSON), scalar reports as JSON; returns the written file names"""
+    os.makedirs(directory, exist_ok=True)
+    if frame_format == 'parquet':
+        data_storage._require_pyarrow()
+    written = []
+    for name, value in reports.items():
+        if isinstance(value, pd.DataFrame):
+            path = os.path.join(directory, f'{name}.{frame_format}')
+            if frame_format == 'parquet':
+                value.to_parquet(path)
+            else:
+                value.to_json(path, orient='table', date_format='iso')
+        else:
+            path = os.path.join(directory, f'{name}.json')
+            with open(path, 'w') as f:
+                json.dump(value, f, indent=2, default=str)
+        written.append(os.path.basename(path))
+    return written
+
+# %% workers
+
+def _limit_memory(max_memory_mb):
+    """Pool initializer: cap the address space of a worker (POSIX only)"""
+    if max_memory_mb is None:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = int(max_memory_mb * 1024 * 1024)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return rss_bytes() / 1e6
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (peak if sys.platform == 'darwin' else peak * 1024) / 1e6
+
+
+def analyze_file(task):
+    """
+    Worker: fold one input into a ReportState chunk by chunk, write its
+    reports and state to the output directory and return a timing record.
+    Failures are recorded instead of raised, so one bad file does not stop the batch.
+    """
+    path, directory, options = task
+    start = time.perf_counter()
+    record = {'path': path, 'output': directory, 'rows': 0, 'pid': os.getpid()}
+    try:
+        analyzer = StreamingSAPDataAnalyzer(path, filters=options['filters'], chunksize=options['chunksize'],
+                                            alpha=options['alpha'])
+        state = analyzer.state
+        reports = state.reports()
+        # the state is written last, so consolidation never picks up a failed input
+        record['files'] = write_reports(reports, directory, options['frame_format'])
+        state.save(os.path.join(directory, STATE_FILE))
+        record['rows'] = state.total_records
+        record['status'] = 'ok' if state.total_records else 'empty'
+    except Exception as e:  # any failure of one input is reported, the batch goes on
+        record['status'] = 'error'
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['seconds'] = time.perf_counter() - start
+    record['peak_rss_mb'] = _peak_rss_mb()
+    return record
+
+# %%
+
+def run_batch(inputs, output_dir, processes=None, chunksize=250_000, alpha=0.005, filters=None,
+              frame_format=None, max_memory_mb=None, tasks_per_worker=None, group_pattern=None, verbose=True):
+    """
+    Generate the reports of every input in a process pool.
+
+    inputs are paths or glob patterns. Each file is streamed by a worker in
+    chunks of chunksize rows, so a worker holds roughly one chunk whatever
+    the file size; max_memory_mb additionally caps its address space and
+    tasks_per_worker recycles workers. Every input gets a directory in
+    output_dir with its reports and its aggregate state, which
+    consolidate() merges into group-level reports. The run is summarized
+    (per-file timing, throughput) in output_dir/batch_summary.json.
+    """
+    paths = expand_inputs(inputs)
+    names = output_names(paths)
+    if frame_format is None:
+        frame_format = 'parquet' if data_storage.pa is not None else 'json'
+    options = {'filters': filters, 'chunksize': chunksize, 'alpha': alpha, 'frame_format': frame_format}
+    tasks = [(path, os.path.join(output_dir, names[path]), options) for path in paths]
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    records = []
+    processes = min(processes or os.cpu_count() or 1, len(tasks)) or 1
+    with multiprocessing.Pool(processes, initializer=_limit_memory, initargs=(max_memory_mb,),
+                              maxtasksperchild=tasks_per_worker) as pool:
+        for record in pool.imap_unordered(analyze_file, tasks):
+            records.append(record)
+            if verbose:
+                status = record['status'] if record['status'] != 'error' else record['error']
+                print(f"{len(records):>5}/{len(tasks)}  {record['seconds']:8.2f}s  {record['rows']:>12,} rows  "
+                      f"{record['peak_rss_mb']:8.1f} MB  {names[record['path']]}  {status}")
+    seconds = time.perf_counter() - start
+
+    rows = sum(record['rows'] for record in records)
+    summary = {
+        'files': len(records),
+        'failed': sum(record['status'] == 'error' for record in records),
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else None,
+        'files_per_second': len(records) / seconds if seconds else None,
+        'processes': processes,
+        'records': sorted(records, key=lambda record: record['path'])
+    }
+    if group_pattern is not None or len(records) > 1:
+        state_paths = [os.path.join(record['output'], STATE_FILE) for record in records if record['status'] != 'error']
+        summary['consolidated'] = consolidate(output_dir, group_pattern, frame_format, state_paths)
+    with open(os.path.join(output_dir, SUMMARY_FILE), 'w') as f:
+        json.dump(summary, f, indent=2)
+    if verbose:
+        print(f"{summary['files']} files ({summary['failed']} failed), {rows:,} rows in {seconds:.2f}s: "
+              f"{summary['rows_per_second'] or 0:,.0f} rows/s, {summary['files_per_second'] or 0:.2f} files/s "
+              f"on {processes} processes")
+    return summary
+
+
+def consolidate(output_dir, group_pattern=None, frame_format=None, state_paths=None):
+    """
+    Merge the stored states of a batch run into consolidated reports.
+
+    Without group_pattern all inputs form one group 'all'. Otherwise the
+    pattern is searched in each output name and its first group (or the
+    whole match) names the group, e.g. r'COMP_[A-Z]' for one report per
+    company code. Only the small state files are read, never the inputs:
+    state_paths, or every state in output_dir if None. Returns {group: number of merged inputs}.
+    """
+    if frame_format is None:
+        frame_format = 'parquet' if data_storage.pa is not None else 'json'
+    pattern = re.compile(group_pattern) if group_pattern is not None else None
+    states = {}
+    if state_paths is None:
+        state_paths = sorted(glob.glob(os.path.join(output_dir, '*', STATE_FILE)))
+    for state_path in state_paths:
+        name = os.path.basename(os.path.dirname(state_path))
+        if name == CONSOLIDATED_DIR:
+            continue
+        if pattern is None:
+            group = 'all'
+        else:
+            match = pattern.search(name)
+            if match is None:
+                continue
+            group = match.group(1) if match.groups() else match.group(0)
+        state = aggregates.ReportState.load(state_path)
+        merged, count = states.get(group, (None, 0))
+        states[group] = (state if merged is None else merged.merge(state), count + 1)
+
+    for group, (state, count) in states.items():
+        directory = os.path.join(output_dir, CONSOLIDATED_DIR, group)
+        os.makedirs(directory, exist_ok=True)
+        state.save(os.path.join(directory, STATE_FILE))
+        write_reports(state.reports(), directory, frame_format)
+    return {group: count for group, (state, count) in states.items()}
+
+# %%
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the reports of many ledgers in parallel")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Analyze every input and write its reports")
+    run.add_argument('inputs', nargs='+', help="Files, directories or glob patterns (quote them)")
+    run.add_argument('--output', required=True, help="Output directory")
+    run.add_argument('--processes', type=int, default=None, help="Worker processes (default: all cores)")
+    run.add_argument('--chunksize', type=int, default=250_000, help="Rows per chunk a worker holds in memory")
+    run.add_argument('--alpha', type=float, default=0.005, help="Relative error of the medians")
+    run.add_argument('--format', choices=['parquet', 'json'], default=None, help="Format of the report tables")
+    run.add_argument('--max-memory-mb', type=float, default=None, help="Address space limit per worker")
+    run.add_argument('--tasks-per-worker', type=int, default=None, help="Restart workers after this many files")
+    run.add_argument('--group-pattern', default=None, help="Regex naming the consolidation group of an input")
+
+    merge = commands.add_parser('consolidate', help="Merge the states of a finished run")
+    merge.add_argument('output', help="Output directory of a run")
+    merge.add_argument('--group-pattern', default=None)
+    merge.add_argument('--format', choices=['parquet', 'json'], default=None)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        summary = run_batch(args.inputs, args.output, args.processes, args.chunksize, args.alpha,
+                            frame_format=args.format, max_memory_mb=args.max_memory_mb,
+                            tasks_per_worker=args.tasks_per_worker, group_pattern=args.group_pattern)
+        sys.exit(1 if summary['failed'] else 0)
+    else:
+        for group, count in consolidate(args.output, args.group_pattern, args.format).items():
+            print(f"{group}: {count} inputs merged")
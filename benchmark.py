@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 11:20:45 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import threading
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+import column_store
+import data_generator
+import data_storage
+from data_analysis import SAPDataAnalyzer
+from profiling import rss_bytes
+
+# %%
+
+SUITE_ROWS = [10_000, 1_000_000, 10_000_000]
+
+# report name -> SAPDataAnalyzer method
+REPORT_METHODS = SAPDataAnalyzer.REPORT_METHODS
+
+# GUI stage -> AnalysisApp method
+GUI_METHODS = {
+    'gui_summary': 'display_summary',
+    'gui_plot_time_series': 'plot_time_series',
+    'gui_plot_cost_centers': 'plot_cost_centers',
+    'gui_plot_material': 'plot_material_analysis'
+}
+
+# %% engine comparison
+
+def make_analyzer(rows, seed=0, document_numbers=False, numeric='float64'):
+    """
+    Analyzer over a synthetic in-memory ledger. DocumentNumber is dropped to
+    save memory, or parsed to int64 chunk by chunk with document_numbers=True.
+    """
+    chunks = data_generator.generate_sap_like_data_chunks(rows, seed=seed)
+    formats = set()
+    
+    def parse(chunk):
+        numbers, number_format = data_storage.parse_document_numbers(chunk['DocumentNumber'])
+        formats.add(number_format)
+        return chunk.assign(DocumentNumber=numbers)
+    
+    if document_numbers:
+        chunks = (parse(chunk) for chunk in chunks)
+    else:
+        chunks = (chunk.drop(columns=['DocumentNumber']) for chunk in chunks)
+    analyzer = SAPDataAnalyzer.from_frame(pd.concat(chunks, ignore_index=True), numeric=numeric)
+    # the format is only kept if every chunk had the same one
+    if len(formats) == 1:
+        analyzer.document_number_format = formats.pop()
+    return analyzer
+
+
+def best_time(func, repeat):
+    """Best wall time of repeat calls"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_engines(rows_list, repeat=3):
+    """Per-method vs fused generate_all_reports for every row count"""
+    results = []
+    for rows in rows_list:
+        analyzer = make_analyzer(rows)
+        methods = best_time(lambda: analyzer.generate_all_reports(engine='methods'), repeat)
+        fused = best_time(lambda: analyzer.generate_all_reports(engine='fused'), repeat)
+        results.append({'rows': rows, 'methods_s': methods, 'fused_s': fused, 'speedup': methods / fused})
+        print(f"{rows:>12,} rows  methods {methods:8.3f}s  fused {fused:8.3f}s  speedup {methods / fused:5.1f}x")
+        del analyzer
+    return results
+
+
+def bench_anomalies(rows_list, repeat=1):
+    """Time of the anomaly scan (outliers, combinations, duplicates) for every row count"""
+    results = []
+    for rows in rows_list:
+        analyzer = make_analyzer(rows, document_numbers=True)
+        seconds = best_time(analyzer.detect_anomalies, repeat)
+        results.append({'rows': rows, 'seconds': seconds, 'rows_per_second': rows / seconds})
+        print(f"{rows:>12,} rows  anomalies {seconds:8.3f}s  {rows / seconds:14,.0f} rows/s")
+        del analyzer
+    return results
+
+
+def memory_record(rows, analyzer):
+    """Footprint of the analyzer's frame against the plain object/float64 ledger (see SAPDataAnalyzer.memory_report)"""
+    total = analyzer.memory_report().loc['Total']
+    record = {'stage': 'memory', 'rows': rows, 'plain_mb': total['plain'] / 1e6, 'compact_mb': total['compact'] / 1e6,
+              'ratio': total['ratio']}
+    print(f"{rows:>12,} rows  {'memory':<24} plain {record['plain_mb']:9.1f} MB  compact {record['compact_mb']:9.1f} MB"
+          f"  {record['ratio']:5.1f}x smaller")
+    return record
+
+
+def bench_memory(rows_list, numeric='float64'):
+    """Per-column footprint of the analyzer's frame for every row count"""
+    results = []
+    for rows in rows_list:
+        analyzer = make_analyzer(rows, document_numbers=True, numeric=numeric)
+        print(analyzer.memory_report().to_string(float_format='{:,.1f}'.format))
+        results.append(memory_record(rows, analyzer))
+        del analyzer
+    return results
+
+# %% import and startup time
+
+IMPORT_MODULES = ['numpy', 'pandas', 'pyarrow', 'matplotlib.pyplot', 'seaborn', 'PySide6.QtWidgets',
+                  'data_analysis', 'sap_analytics_app', 'main']
+
+STARTUP_TARGET_SECONDS = 1.0
+
+IMPORT_PROBE = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "from profiling import rss_bytes; print(time.perf_counter() - start, rss_bytes(), flush=True)"
+)
+
+# same path as main.py until the window is painted
+STARTUP_PROBE = (
+    "import main; app, window = main.start_gui([]); "
+    "from profiling import rss_bytes; print(rss_bytes(), flush=True)"
+)
+
+
+def _probe(code):
+    """Run code in a fresh interpreter; (wall seconds until its first output line, that line)"""
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [repo_dir, env.get('PYTHONPATH')]))
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               text=True, env=env, cwd=repo_dir)
+    line = process.stdout.readline()
+    seconds = time.perf_counter() - start
+    process.communicate()
+    if not line:
+        raise RuntimeError(f"Probe failed: {code}")
+    return seconds, line.split()
+
+
+def bench_startup(repeat=5):
+    """Cold import time of the heavy modules and time until the main window is shown, best of repeat fresh processes"""
+    records = []
+    for module in IMPORT_MODULES:
+        runs = [_probe(IMPORT_PROBE.format(module=module))[1] for _ in range(repeat)]
+        seconds, rss = min((float(s), int(r)) for s, r in runs)
+        records.append({'stage': f'import_{module}', 'rows': 0, 'seconds': seconds, 'peak_rss_mb': rss / 1e6})
+        print(f"{'import ' + module:<38} {seconds:9.4f}s  RSS {rss / 1e6:9.1f} MB")
+
+    runs = [_probe(STARTUP_PROBE) for _ in range(repeat)]
+    seconds, line = min(runs, key=lambda run: run[0])
+    records.append({'stage': 'startup_window', 'rows': 0, 'seconds': seconds, 'peak_rss_mb': int(line[0]) / 1e6})
+    status = 'OK' if seconds < STARTUP_TARGET_SECONDS else 'SLOW'
+    print(f"{'window shown (process start)':<38} {seconds:9.4f}s  target < {STARTUP_TARGET_SECONDS:.1f}s  {status}")
+    return records
+
+# %% stage measurements
+
+class PeakRSS:
+    """Samples the RSS on a background thread while a stage runs"""
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start = self.peak = rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+def measure(stage, rows, func, setup=None, allocations=True):
+    """
+    Run func(setup()) once for wall time and peak RSS, and once more under
+    tracemalloc for the peak of Python/numpy allocations (skipped if not
+    allocations). setup runs outside the measurement.
+    Returns (result of the timed run, record).
+    """
+    args = () if setup is None else (setup(),)
+    gc.collect()
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - start
+    record = {
+        'stage': stage,
+        'rows': rows,
+        'seconds': seconds,
+        'peak_rss_mb': rss.peak / 1e6,
+        'rss_delta_mb': (rss.peak - rss.start) / 1e6
+    }
+    if allocations:
+        args = () if setup is None else (setup(),)
+        gc.collect()
+        tracemalloc.start()
+        func(*args)
+        record['alloc_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    print(f"{rows:>12,} rows  {stage:<24} {seconds:9.4f}s  peak RSS {record['peak_rss_mb']:9.1f} MB"
+          + (f"  alloc peak {record['alloc_peak_mb']:9.1f} MB" if allocations else ""))
+    return result, record
+
+
+def _gui_app():
+    """AnalysisApp on the offscreen Qt platform, so the suite also runs headless"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide6.QtWidgets import QApplication
+    from sap_analytics_app import AnalysisApp
+    app = QApplication.instance() or QApplication([])
+    window = AnalysisApp()
+    window.show()
+    app.processEvents()
+    return app, window
+
+
+def bench_rows(rows, work_dir, allocations=True, gui=True, seed=0):
+    """Records of every stage for one dataset size"""
+    records = []
+
+    def run(stage, func, setup=None):
+        result, record = measure(stage, rows, func, setup, allocations)
+        records.append(record)
+        return result
+
+    df = run('generate', lambda: data_generator.generate_sap_like_data(rows, seed=seed))
+    csv_path = os.path.join(work_dir, f'ledger_{rows}.csv')
+    run('save_csv', lambda: data_generator.save_data(df, csv_path, verbose=False))
+    paths = {'csv': csv_path}
+    if data_storage.pa is not None:
+        paths['parquet'] = os.path.join(work_dir, f'ledger_{rows}.parquet')
+        run('save_parquet', lambda: data_generator.save_data(df, paths['parquet'], verbose=False))
+    del df
+    paths['columns'] = os.path.join(work_dir, f'ledger_{rows}.columns')
+    run('save_columns', lambda: column_store.convert(csv_path, paths['columns']))
+
+    for fmt, path in paths.items():
+        analyzer = run(f'load_{fmt}', lambda: SAPDataAnalyzer(path))
+    records.append(memory_record(rows, analyzer))
+    raw = data_storage.read_data(csv_path)
+    run('convert_data_types', SAPDataAnalyzer.from_frame, setup=raw.copy)
+    del raw
+
+    reports = {}
+    for name, method in REPORT_METHODS.items():
+        reports[name] = run(f'report_{name}', getattr(analyzer, method))
+    run('reports_fused', lambda: analyzer.generate_all_reports(engine='fused'))
+    run('anomalies', analyzer.detect_anomalies)
+
+    if gui:
+        app, window = _gui_app()
+        window.reports = reports
+        for stage, method in GUI_METHODS.items():
+            run(stage, getattr(window, method))
+
+        def show_table():
+            window.display_data_table(analyzer.frame(), analyzer.formatters())
+            window.tabs.setCurrentWidget(window.table_tab)
+            window.data_table.grab()  # paints the visible cells
+
+        run('gui_table', show_table)
+        window.close()
+        app.processEvents()
+
+    for path in paths.values():
+        if os.path.isdir(path):
+            # the column store may still be mapped by the analyzer (Windows refuses to delete it then)
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+    return records
+
+
+def run_suite(rows_list=SUITE_ROWS, output=None, allocations=True, gui=True, work_dir=None, startup=True):
+    """Benchmark all stages for every dataset size; results are written to output as JSON"""
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'results': []
+    }
+    if startup:
+        results['results'].extend(bench_startup())
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        for rows in rows_list:
+            results['results'].extend(bench_rows(rows, tmp, allocations, gui))
+            gc.collect()
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved in {output}")
+    return results
+
+# %% regression check
+
+COMPARED_METRICS = {'seconds': 0.005, 'peak_rss_mb': 1.0, 'alloc_peak_mb': 1.0, 'compact_mb': 1.0}
+
+
+def compare(base_path, new_path, threshold=0.10):
+    """
+    Compare two suite runs stage by stage.
+
+    A metric regresses when it grew by more than threshold (relative) and
+    by more than the noise floor in COMPARED_METRICS (absolute).
+    Returns the list of regressions.
+    """
+    with open(base_path) as f:
+        base = {(r['rows'], r['stage']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = {(r['rows'], r['stage']): r for r in json.load(f)['results']}
+
+    regressions = []
+    for key in sorted(base.keys() & new.keys()):
+        changes = []
+        for metric, floor in COMPARED_METRICS.items():
+            if metric not in base[key] or metric not in new[key]:
+                continue
+            old_value, new_value = base[key][metric], new[key][metric]
+            ratio = new_value / old_value if old_value else float('inf')
+            changes.append(f"{metric} {ratio:6.2f}x")
+            if new_value - old_value > floor and ratio > 1 + threshold:
+                regressions.append({'rows': key[0], 'stage': key[1], 'metric': metric,
+                                    'base': old_value, 'new': new_value, 'ratio': ratio})
+        flagged = any(r['rows'] == key[0] and r['stage'] == key[1] for r in regressions)
+        print(f"{key[0]:>12,} rows  {key[1]:<24} {'  '.join(changes)}{'  REGRESSION' if flagged else ''}")
+    for key in sorted(base.keys() - new.keys()):
+        print(f"{key[0]:>12,} rows  {key[1]:<24} missing in {new_path}")
+    print(f"{len(regressions)} regression(s) above {threshold:.0%}")
+    return regressions
+
+# %%
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Performance benchmarks of the SAP analytics tool")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    suite = commands.add_parser('suite', help="Time, RSS and allocations of every stage")
+    suite.add_argument('--rows', type=int, nargs='+', default=SUITE_ROWS)
+    suite.add_argument('--output', default='benchmark_results.json')
+    suite.add_argument('--no-allocations', action='store_true', help="Skip the tracemalloc run of each stage")
+    suite.add_argument('--no-gui', action='store_true', help="Skip the plotting and table stages")
+    suite.add_argument('--no-startup', action='store_true', help="Skip the import and startup timing")
+    suite.add_argument('--work-dir', default=None, help="Directory for the temporary data files")
+
+    startup = commands.add_parser('startup', help="Import times and time until the window is shown")
+    startup.add_argument('--repeat', type=int, default=5)
+    startup.add_argument('--output', default=None)
+
+    engines = commands.add_parser('engines', help="Per-method vs fused report engine")
+    engines.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000, 50_000_000])
+    engines.add_argument('--repeat', type=int, default=3)
+
+    anomaly_scan = commands.add_parser('anomalies', help="Anomaly scan over large synthetic ledgers")
+    anomaly_scan.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000, 50_000_000])
+    anomaly_scan.add_argument('--repeat', type=int, default=1)
+
+    memory = commands.add_parser('memory', help="Per-column memory footprint of the loaded ledger")
+    memory.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    memory.add_argument('--numeric', choices=SAPDataAnalyzer.NUMERIC_STORAGE, default='float64')
+
+    regression = commands.add_parser('compare', help="Flag regressions between two suite results")
+    regression.add_argument('base')
+    regression.add_argument('new')
+    regression.add_argument('--threshold', type=float, default=0.10)
+
+    args = parser.parse_args()
+    if args.command == 'suite':
+        run_suite(args.rows, args.output, not args.no_allocations, not args.no_gui, args.work_dir,
+                  not args.no_startup and not args.no_gui)
+    elif args.command == 'startup':
+        records = bench_startup(args.repeat)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'results': records}, f, indent=2)
+    elif args.command == 'engines':
+        bench_engines(args.rows, args.repeat)
+    elif args.command == 'anomalies':
+        bench_anomalies(args.rows, args.repeat)
+    elif args.command == 'memory':
+        bench_memory(args.rows, args.numeric)
+    else:
+        sys.exit(1 if compare(args.base, args.new, args.threshold) else 0)
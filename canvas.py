@@ -6,14 +6,210 @@ Created on Sat Jul  5 12:38:48 2025
 """
 # %% imports
 
+import numpy as np
+import pandas as pd
 from matplotlib.figure import Figure
+from matplotlib.dates import date2num
+from matplotlib.ticker import FuncFormatter, MaxNLocator
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 
+# %% downsampling
+
+def minmax_downsample(x, y, max_points):
+    """Keep the minimum and maximum of each of max_points/2 buckets, so peaks survive"""
+    n = len(y)
+    if n <= max_points:
+        return x, y
+    buckets = max_points // 2
+    # every point falls into a bucket, the last one is padded with NaN
+    size = -(-n // buckets)
+    buckets = -(-n // size)
+    values = np.full(buckets * size, np.nan)
+    values[:n] = y
+    values = values.reshape(buckets, size)
+    filled = np.isnan(values)
+    start = np.arange(buckets) * size
+    low = start + np.argmin(np.where(filled, np.inf, values), axis=1)
+    high = start + np.argmax(np.where(filled, -np.inf, values), axis=1)
+    keep = np.unique(np.concatenate([low, high, [0, n - 1]]))
+    return x[keep], y[keep]
+
+
+def lttb_downsample(x, y, max_points):
+    """Largest-Triangle-Three-Buckets: max_points that keep the visual shape of the line"""
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        # average point of the next bucket is the third triangle corner
+        avg_x, avg_y = x[next_lo:next_hi].mean(), np.nanmean(y[next_lo:next_hi])
+        area = np.abs((x[previous] - avg_x) * (y[lo:hi] - y[previous]) - (x[previous] - x[lo:hi]) * (avg_y - y[previous]))
+        previous = lo + (int(np.nanargmax(area)) if not np.isnan(area).all() else 0)
+        keep[i + 1] = previous
+    return x[keep], y[keep]
+
+
+DOWNSAMPLERS = {'minmax': minmax_downsample, 'lttb': lttb_downsample}
+
 # %%
 
 class MplCanvas(FigureCanvas):
-    """Matplotlib Canvas für die Einbettung in PySide"""
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
+    """
+    Matplotlib Canvas für die Einbettung in PySide.
+
+    The figure, axes and artists are created once and updated in place
+    (set_line, set_bars, set_scatter). The data artists are animated: a
+    full draw renders everything else and caches it as background, and a
+    refresh whose axes, ticks and labels are unchanged only restores that
+    background and blits the artists. Lines with more than max_points
+    points are downsampled before they are drawn.
+    """
+    def __init__(self, parent=None, width=5, height=4, dpi=100, max_points=2000, downsample='minmax'):
         fig = Figure(figsize=(width, height), dpi=dpi)
         self.axes = fig.add_subplot(111)
         super().__init__(fig)
+        self.max_points = max_points
+        self.downsample = DOWNSAMPLERS[downsample]
+        self.artists = {}
+        self._background = None
+        self._stale = True
+        self._legend = None
+        self._tick_labels = None
+        self._dates = False
+        self.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        self._background = self.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
+
+    @staticmethod
+    def _parts(artist):
+        """Drawable artists of an artist or a bar container"""
+        return getattr(artist, 'patches', [artist])
+
+    def _draw_artists(self):
+        for artist in self.artists.values():
+            for part in self._parts(artist):
+                self.axes.draw_artist(part)
+
+    def _add(self, key, artist):
+        for part in self._parts(artist):
+            part.set_animated(True)
+        self.artists[key] = artist
+        self._stale = True
+        return artist
+
+    def _remove(self, key):
+        artist = self.artists.pop(key, None)
+        if artist is not None:
+            artist.remove()
+            self._stale = True
+
+    def clear_artists(self, keep=()):
+        """Remove every data artist except those in keep"""
+        for key in [key for key in self.artists if key not in keep]:
+            self._remove(key)
+
+    def set_line(self, key, x, y, label=None):
+        """Create or update a line; datetime x values are plotted as dates"""
+        if isinstance(x, pd.DatetimeIndex) or np.issubdtype(np.asarray(x).dtype, np.datetime64):
+            x = date2num(np.asarray(x, dtype='datetime64[ns]'))
+            if not self._dates:
+                self.axes.xaxis_date()
+                self._dates = True
+        x, y = self.downsample(np.asarray(x, dtype=float), np.asarray(y, dtype=float), self.max_points)
+        line = self.artists.get(key)
+        if line is None:
+            (line,) = self.axes.plot(x, y, label=label)
+            self._add(key, line)
+        else:
+            line.set_data(x, y)
+            if label is not None and line.get_label() != label:
+                line.set_label(label)
+                self._stale = True
+        return line
+
+    def set_bars(self, key, labels, heights):
+        """Create or update a bar chart at integer positions with the labels as ticks"""
+        labels = [str(label) for label in labels]
+        heights = np.asarray(heights, dtype=float)
+        bars = self.artists.get(key)
+        if bars is None or len(bars.patches) != len(heights):
+            self._remove(key)
+            bars = self._add(key, self.axes.bar(np.arange(len(heights)), heights))
+        else:
+            for patch, height in zip(bars.patches, heights):
+                patch.set_height(height)
+        if labels != self._tick_labels:
+            self.axes.set_xticks(np.arange(len(labels)), labels)
+            self._tick_labels = labels
+            self._stale = True
+        return bars
+
+    def set_scatter(self, key, x, y, colors):
+        """Create or update a scatter plot with one colour per point"""
+        offsets = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+        points = self.artists.get(key)
+        if points is None:
+            points = self._add(key, self.axes.scatter(offsets[:, 0], offsets[:, 1], c=colors))
+        else:
+            points.set_offsets(offsets)
+            points.set_facecolor(colors)
+            points.set_edgecolor(colors)
+        return points
+
+    def set_labels(self, title=None, xlabel=None, ylabel=None, legend=None, grid=None):
+        """Texts of the axes; only a change triggers a full redraw. legend is True or a list of handles"""
+        axes = self.axes
+        for text, getter, setter in ((title, axes.get_title, axes.set_title),
+                                     (xlabel, axes.get_xlabel, axes.set_xlabel),
+                                     (ylabel, axes.get_ylabel, axes.set_ylabel)):
+            if text is not None and getter() != text:
+                setter(text)
+                self._stale = True
+        if grid is not None:
+            axes.grid(grid)
+        if legend is not None:
+            self._legend = legend
+
+    def set_tick_formatter(self, labels):
+        """Show integer x positions as labels[position], with as many ticks as fit"""
+        labels = list(map(str, labels))
+        if labels == self._tick_labels:
+            return
+        self.axes.xaxis.set_major_locator(MaxNLocator(nbins=10, integer=True))
+        self.axes.xaxis.set_major_formatter(FuncFormatter(
+            lambda value, pos: labels[int(value)] if 0 <= int(value) < len(labels) and value == int(value) else ''))
+        self._tick_labels = labels
+        self._stale = True
+
+    def _autoscale(self):
+        axes = self.axes
+        axes.relim()
+        for artist in self.artists.values():
+            # relim ignores collections
+            if hasattr(artist, 'get_offsets') and len(artist.get_offsets()):
+                axes.update_datalim(artist.get_offsets())
+        axes.autoscale_view()
+
+    def refresh(self):
+        """Redraw after updates: blit the artists if nothing else changed, full draw otherwise"""
+        limits = (self.axes.get_xlim(), self.axes.get_ylim())
+        self._autoscale()
+        if self._stale or self._background is None or limits != (self.axes.get_xlim(), self.axes.get_ylim()):
+            if self._legend is True:
+                self.axes.legend()
+            elif self._legend is not None:
+                self.axes.legend(handles=self._legend)
+            self._stale = False
+            self.draw()
+        else:
+            self.restore_region(self._background)
+            self._draw_artists()
+            self.blit(self.figure.bbox)
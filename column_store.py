@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 18:07:31 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+
+import data_storage
+
+# %%
+
+STORE_VERSION = 1
+
+# columns stored as integer codes into a dictionary
+CODED_COLUMNS = data_storage.DIMENSION_COLUMNS + data_storage.PARTITION_COLUMNS
+
+# %%
+
+def store_dir(path):
+    """Directory of a column store, given the directory or its meta.json"""
+    return os.path.dirname(path) if os.path.basename(path) == data_storage.STORE_META else path
+
+
+def is_store(path):
+    return os.path.isfile(os.path.join(store_dir(path), data_storage.STORE_META))
+
+
+def read_meta(path):
+    with open(os.path.join(store_dir(path), data_storage.STORE_META)) as f:
+        meta = json.load(f)
+    if meta['version'] != STORE_VERSION:
+        raise ValueError(f"{path} was written by another column store version")
+    return meta
+
+
+def _code_dtype(n_categories):
+    """Smallest code dtype, the one pandas uses itself, so opening does not copy the codes"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _encode(values, dictionary):
+    """int32 codes of a chunk into the growing dictionary (-1 = missing) and the extended dictionary"""
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+    categories = values.cat.categories
+    if dictionary is None:
+        dictionary = categories[:0]
+    new = categories.difference(dictionary)
+    if len(new):
+        dictionary = dictionary.append(new)
+    mapping = dictionary.get_indexer(categories).astype(np.int32)
+    codes = values.cat.codes.to_numpy()
+    return np.where(codes >= 0, mapping[codes], -1).astype(np.int32), dictionary
+
+
+def _recode(path, n_rows, dictionary, chunksize):
+    """Rewrite the int32 codes of a column with sorted categories and the smallest code dtype"""
+    order = np.argsort(np.asarray(dictionary), kind='stable')
+    remap = np.empty(len(order) + 1, dtype=np.int64)
+    remap[order] = np.arange(len(order))
+    remap[-1] = -1
+    dtype = _code_dtype(len(order))
+    codes = np.memmap(path, dtype=np.int32, mode='r', shape=(n_rows,)) if n_rows else np.zeros(0, dtype=np.int32)
+    with open(path + '.recode', 'wb') as f:
+        for start in range(0, n_rows, chunksize):
+            remap[codes[start:start + chunksize]].astype(dtype).tofile(f)
+    del codes
+    os.replace(path + '.recode', path)
+    return dictionary[order], dtype
+
+# %%
+
+def convert(source, target, columns=None, filters=None, chunksize=1_000_000):
+    """
+    Convert a ledger (any format read_data accepts) into a column store.
+
+    The store is a directory with one raw binary file per column and a
+    meta.json holding the row count, dtypes and the dictionaries of the
+    coded columns. Dimensions are stored as integer codes (categories
+    sorted), DocumentNumber as int64 and PostingDate as datetime64[ns].
+    The input is streamed chunk by chunk, the store replaces target at the end.
+    """
+    target = store_dir(target)
+    tmp = target.rstrip(os.sep) + '.tmp{}'.format(os.getpid())
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+
+    specs, dictionaries, formats = {}, {}, {}
+    n_rows = 0
+    for chunk in data_storage.iter_chunks(source, columns=columns, filters=filters, chunksize=chunksize):
+        for name in chunk.columns:
+            values = chunk[name]
+            if name == 'DocumentNumber':
+                numbers, number_format = data_storage.parse_document_numbers(values)
+                # the format is only kept if every chunk had the same one
+                formats[name] = number_format if formats.get(name, number_format) == number_format else None
+                spec = specs.setdefault(name, {'name': name, 'dtype': 'int64'})
+                spec['nullable'] = spec.get('nullable', False) or bool(numbers.isna().any())
+                data = numbers.fillna(-1).to_numpy(np.int64)
+            elif name in CODED_COLUMNS or values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+                data, dictionaries[name] = _encode(values, dictionaries.get(name))
+            elif name == 'PostingDate':
+                data = values.to_numpy().astype('datetime64[ns]')
+            else:
+                data = values.to_numpy(specs[name]['dtype'] if name in specs else None)
+            specs.setdefault(name, {'name': name, 'dtype': data.dtype.str})
+            with open(os.path.join(tmp, name + '.bin'), 'ab') as f:
+                data.tofile(f)
+        n_rows += len(chunk)
+
+    for name, dictionary in dictionaries.items():
+        categories, dtype = _recode(os.path.join(tmp, name + '.bin'), n_rows, dictionary, chunksize)
+        specs[name].update(dtype=dtype.str, categories=categories.tolist())
+    if formats.get('DocumentNumber'):
+        specs['DocumentNumber']['format'] = list(formats['DocumentNumber'])
+
+    meta = {
+        'version': STORE_VERSION,
+        'n_rows': n_rows,
+        'source': os.path.abspath(source),
+        'columns': [specs[name] for name in data_storage.COLUMNS if name in specs]
+                   + [spec for name, spec in specs.items() if name not in data_storage.COLUMNS]
+    }
+    with open(os.path.join(tmp, data_storage.STORE_META), 'w') as f:
+        json.dump(meta, f, indent=1)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(tmp, target)
+    return meta
+
+
+def open_store(path, columns=None):
+    """
+    The store as a DataFrame over read-only memory maps of its column files.
+
+    Nothing is read up front: pages are loaded when a column is used and
+    are shared through the page cache with every process that maps the
+    same store.
+    """
+    path = store_dir(path)
+    meta = read_meta(path)
+    n_rows = meta['n_rows']
+    data = {}
+    for spec in meta['columns']:
+        name = spec['name']
+        if columns is not None and name not in columns:
+            continue
+        dtype = np.dtype(spec['dtype'])
+        if n_rows:
+            values = np.memmap(os.path.join(path, name + '.bin'), dtype=dtype, mode='r', shape=(n_rows,))
+        else:
+            values = np.zeros(0, dtype=dtype)
+        if 'categories' in spec:
+            values = pd.Categorical.from_codes(values, categories=spec['categories'], validate=False)
+        elif spec.get('nullable'):
+            values = pd.arrays.IntegerArray(values, values < 0)
+        data[name] = values
+    df = pd.DataFrame(data, copy=False)
+    # the analyzer formats the parsed document numbers back for display
+    number_format = next((spec['format'] for spec in meta['columns']
+                          if spec['name'] == 'DocumentNumber' and 'format' in spec), None)
+    if number_format is not None and 'DocumentNumber' in df:
+        df.attrs['document_number_format'] = tuple(number_format)
+    return df
+
+# %%
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a ledger into a memory-mapped column store")
+    parser.add_argument('source', help="CSV, Parquet, Feather or a directory of part files")
+    parser.add_argument('target', help="directory of the column store")
+    parser.add_argument('--chunksize', type=int, default=1_000_000)
+    args = parser.parse_args()
+    meta = convert(args.source, args.target, chunksize=args.chunksize)
+    print(f"{args.target}: {meta['n_rows']:,} rows, {len(meta['columns'])} columns")
@@ -7,115 +7,328 @@ Created on Sat Jul  5 11:45:19 2025
 
 # %%
 
+import os
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+import aggregates
+import anomalies
+import data_storage
+import ledger_index
+import olap_cube
+import profiling
+import report_cache
+import time_series
+
+# %%
+
+def _to_cents(values):
+    """Amounts as fixed-point integer cents: int32 if the range allows, nullable only if values are missing"""
+    cents = (values * 100).round()
+    small = cents.abs().max() < 2 ** 31 if len(cents) else True
+    if cents.isna().any():
+        return cents.astype('Int32' if small else 'Int64')
+    return cents.astype(np.int32 if small else np.int64)
 
 # %%
 
 class SAPDataAnalyzer:
-    def __init__(self, data_path):
-        self.df = pd.read_csv(data_path)
+    # columns each report of generate_all_reports needs
+    REPORT_COLUMNS = {
+        'basic_statistics': ['PostingDate', 'Quantity', 'Amount', 'CompanyCode', 'DocumentType', 'Plant'],
+        'time_series': ['PostingDate', 'Amount'],
+        'cost_centers': ['CostCenter', 'Amount'],
+        'material_analysis': ['Material', 'Amount'],
+        'correlation': ['Quantity', 'Amount'],
+        'document_types': ['DocumentType', 'Amount']
+    }
+    
+    # method computing each report, shared by the backends and the benchmark
+    REPORT_METHODS = {
+        'basic_statistics': 'basic_statistics',
+        'time_series': 'time_series_analysis',
+        'cost_centers': 'cost_center_analysis',
+        'material_analysis': 'material_analysis',
+        'correlation': 'correlation_analysis',
+        'document_types': 'document_type_analysis'
+    }
+    
+    # storage of Quantity/Amount: float64, float32 or fixed-point integer cents
+    NUMERIC_STORAGE = ('float64', 'float32', 'cents')
+    
+    @profiling.profiled(rows=profiling.frame_rows)
+    def __init__(self, data_path, columns=None, filters=None, numeric='float64'):
+        """
+        Load a ledger, optionally only some columns and the rows matching filters,
+        e.g. filters={'PostingDate': ('2024-01-01', '2024-03-31'), 'CompanyCode': ['COMP_A']}
+        """
+        self.numeric = numeric
+        self.document_number_format = None
+        with profiling.span('read_data') as read_span:
+            self.df = data_storage.read_data(data_path, columns=columns, filters=filters)
+            read_span.rows = len(self.df)
+        self.source = (data_path, columns, filters)
+        self.index = None
+        self.index_dir = ledger_index.DEFAULT_INDEX_DIR
         self.convert_data_types()
         
+    @classmethod
+    def from_frame(cls, df, numeric='float64'):
+        """Create an analyzer for a DataFrame that is already in memory"""
+        analyzer = cls.__new__(cls)
+        analyzer.numeric = numeric
+        analyzer.document_number_format = None
+        analyzer.df = df
+        analyzer.source = (None, None, None)
+        analyzer.index = None
+        analyzer.index_dir = ledger_index.DEFAULT_INDEX_DIR
+        analyzer.convert_data_types()
+        return analyzer
+    
+    @profiling.profiled(rows=profiling.frame_rows)
+    def build_index(self, index_dir=None):
+        """
+        Load the secondary indexes of a previously indexed file, or build and
+        store them in index_dir (kept for later lookups, default: the user's index directory)
+        """
+        if index_dir is not None:
+            self.index_dir = index_dir
+        data_path, columns, filters = self.source
+        self.index = ledger_index.load_or_build(self.df, data_path, columns, filters, self.index_dir)
+        return self.index
+    
+    @profiling.profiled(rows=profiling.frame_rows)
+    def filtered(self, filters):
+        """
+        Analyzer over the rows matching filters, e.g.
+        {'PostingDate': ('2024-01-01', '2024-03-31'), 'Plant': ['PLANT_1', 'PLANT_2']}.
+        
+        The rows are looked up through the secondary indexes (built on first
+        use), so only the matching rows are touched, not the whole frame.
+        """
+        if self.index is None:
+            self.build_index()
+        df = self.df.take(self.index.rows(filters, self.df)).reset_index(drop=True)
+        for name in df.columns:
+            if isinstance(df[name].dtype, pd.CategoricalDtype):
+                df[name] = df[name].cat.remove_unused_categories()
+        analyzer = SAPDataAnalyzer.from_frame(df, numeric=self.numeric)
+        analyzer.document_number_format = self.document_number_format
+        analyzer.index_dir = self.index_dir
+        return analyzer
+    
+    def filtered_reports(self, filters, engine='fused'):
+        """generate_all_reports over the rows matching filters"""
+        return self.filtered(filters).generate_all_reports(engine=engine)
+        
+    @profiling.profiled(rows=profiling.frame_rows)
     def convert_data_types(self):
-        """Convert data types for better analysis"""
-        self.df['PostingDate'] = pd.to_datetime(self.df['PostingDate'])
-        self.df['FiscalYear'] = self.df['FiscalYear'].astype('category')
-        self.df['FiscalPeriod'] = self.df['FiscalPeriod'].astype('category')
+        """
+        Convert data types for better analysis and a compact frame.
         
+        Dimensions become categoricals (integer codes plus one dictionary per
+        column), DocumentNumber is parsed to int64 and Quantity/Amount are
+        stored as selected by self.numeric. Columns that already have their
+        target type are left alone, so converting twice is cheap.
+        """
+        if self.numeric not in self.NUMERIC_STORAGE:
+            raise ValueError(f"numeric must be one of {self.NUMERIC_STORAGE}")
+        # columnar files and date-filtered CSV already carry typed dates
+        if 'PostingDate' in self.df and not pd.api.types.is_datetime64_any_dtype(self.df['PostingDate']):
+            self.df['PostingDate'] = pd.to_datetime(self.df['PostingDate'])
+        for column in ['FiscalYear', 'FiscalPeriod'] + data_storage.DIMENSION_COLUMNS:
+            if column in self.df and not isinstance(self.df[column].dtype, pd.CategoricalDtype):
+                self.df[column] = self.df[column].astype('category')
+        if 'DocumentNumber' in self.df and not pd.api.types.is_integer_dtype(self.df['DocumentNumber']):
+            self.df['DocumentNumber'], self.document_number_format = data_storage.parse_document_numbers(self.df['DocumentNumber'])
+        elif 'DocumentNumber' in self.df and self.document_number_format is None:
+            # column stores hold parsed numbers and keep their format in the frame's attrs
+            self.document_number_format = self.df.attrs.get('document_number_format')
+        for column in aggregates.NUMERIC_FIELDS:
+            if column not in self.df or self.df[column].dtype != np.float64:
+                continue
+            if self.numeric == 'float32':
+                self.df[column] = self.df[column].astype(np.float32)
+            elif self.numeric == 'cents':
+                self.df[column] = _to_cents(self.df[column])
+    
+    def frame(self, columns=None, formatted=False):
+        """
+        The given columns of self.df with Quantity/Amount as float64, whatever
+        their storage. float64 columns are shared, not copied. With
+        formatted=True DocumentNumber is turned back into its original text
+        (e.g. 'DOC_00001234'), as for an export.
+        """
+        columns = [c for c in (self.df.columns if columns is None else columns) if c in self.df]
+        data = {}
+        for column in columns:
+            values = self.df[column]
+            if column in aggregates.NUMERIC_FIELDS and values.dtype != np.float64:
+                values = values.astype(np.float64)
+                if self.numeric == 'cents':
+                    values = values / 100
+            elif column == 'DocumentNumber' and formatted:
+                values = data_storage.format_document_numbers(values, self.document_number_format)
+            data[column] = values
+        return pd.DataFrame(data, copy=False)
+    
+    def formatters(self):
+        """Display formatter of every column stored in a parsed form, e.g. for table_model.DataFrameModel"""
+        if 'DocumentNumber' not in self.df:
+            return {}
+        return {'DocumentNumber': data_storage.document_number_formatter(self.document_number_format)}
+    
+    def memory_report(self):
+        """
+        Footprint per column in bytes: 'plain' is the ledger as object strings
+        and float64 (as read without conversion), 'compact' the current frame.
+        """
+        rows = []
+        for column in self.df.columns:
+            values = self.df[column]
+            compact = values.memory_usage(deep=True, index=False)
+            if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.dtype != object:
+                plain = len(values) * values.cat.categories.dtype.itemsize
+            elif isinstance(values.dtype, pd.CategoricalDtype):
+                # one pointer per row plus one string object per row
+                counts = values.value_counts(sort=False)
+                sizes = np.array([sys.getsizeof(str(c)) for c in counts.index], dtype=np.int64)
+                plain = 8 * len(values) + int((counts.to_numpy() * sizes).sum()) + 16 * int(values.isna().sum())
+            elif column == 'DocumentNumber' and self.document_number_format is not None:
+                prefix, width = self.document_number_format
+                plain = len(values) * (8 + sys.getsizeof(prefix + '0' * width))
+            elif column in aggregates.NUMERIC_FIELDS:
+                plain = 8 * len(values)
+            else:
+                plain = compact
+            rows.append({'column': column, 'dtype': str(values.dtype), 'plain': plain, 'compact': compact})
+        report = pd.DataFrame(rows).set_index('column')
+        report.loc['Total'] = ['', report['plain'].sum(), report['compact'].sum()]
+        report['ratio'] = report['plain'] / report['compact']
+        return report
+        
+    @profiling.profiled(rows=profiling.frame_rows)
     def basic_statistics(self):
         """Basic statistics"""
+        df = self.frame(self.REPORT_COLUMNS['basic_statistics'])
         stats = {
-            'total_records': len(self.df),
+            'total_records': len(df),
             'time_period': {
-                'start': self.df['PostingDate'].min(),
-                'end': self.df['PostingDate'].max()
+                'start': df['PostingDate'].min(),
+                'end': df['PostingDate'].max()
             },
             'numeric_fields': {
                 'Quantity': {
-                    'mean': self.df['Quantity'].mean(),
-                    'median': self.df['Quantity'].median(),
-                    'std': self.df['Quantity'].std(),
-                    'min': self.df['Quantity'].min(),
-                    'max': self.df['Quantity'].max()
+                    'mean': df['Quantity'].mean(),
+                    'median': df['Quantity'].median(),
+                    'std': df['Quantity'].std(),
+                    'min': df['Quantity'].min(),
+                    'max': df['Quantity'].max()
                 },
                 'Amount': {
-                    'mean': self.df['Amount'].mean(),
-                    'median': self.df['Amount'].median(),
-                    'std': self.df['Amount'].std(),
-                    'min': self.df['Amount'].min(),
-                    'max': self.df['Amount'].max()
+                    'mean': df['Amount'].mean(),
+                    'median': df['Amount'].median(),
+                    'std': df['Amount'].std(),
+                    'min': df['Amount'].min(),
+                    'max': df['Amount'].max()
                 }
             },
             'categorical_counts': {
-                'CompanyCode': self.df['CompanyCode'].value_counts().to_dict(),
-                'DocumentType': self.df['DocumentType'].value_counts().to_dict(),
-                'Plant': self.df['Plant'].value_counts().to_dict()
+                'CompanyCode': df['CompanyCode'].value_counts().to_dict(),
+                'DocumentType': df['DocumentType'].value_counts().to_dict(),
+                'Plant': df['Plant'].value_counts().to_dict()
             }
         }
         return stats
     
+    @profiling.profiled(rows=profiling.frame_rows)
     def time_series_analysis(self):
         """Time series analysis of amounts"""
-        ts_df = self.df.set_index('PostingDate').sort_index()
-        monthly = ts_df.resample('M')['Amount'].agg(['sum', 'mean', 'count'])
+        ts_df = self.frame(self.REPORT_COLUMNS['time_series']).set_index('PostingDate').sort_index()
+        monthly = ts_df.resample(aggregates.TIME_SERIES_FREQ)['Amount'].agg(['sum', 'mean', 'count'])
         
         # Trend analysis
-        monthly['rolling_avg'] = monthly['sum'].rolling(window=3).mean()
-        
-        return monthly
+        return aggregates.monthly_trend(monthly)
     
+    @profiling.profiled(rows=profiling.frame_rows)
     def cost_center_analysis(self):
         """Cost center analysis"""
-        cc_analysis = self.df.groupby('CostCenter')['Amount'].agg(['sum', 'mean', 'count'])
+        cc_analysis = self.frame(self.REPORT_COLUMNS['cost_centers']).groupby('CostCenter', observed=True)['Amount'].agg(['sum', 'mean', 'count'])
         cc_analysis['percentage'] = cc_analysis['sum'] / cc_analysis['sum'].sum() * 100
         return cc_analysis.sort_values('sum', ascending=False)
     
+    @profiling.profiled(rows=profiling.frame_rows)
     def material_analysis(self):
         """Material valuation (ABC analysis)"""
-        material_value = self.df.groupby('Material')['Amount'].sum().reset_index()
-        material_value = material_value.sort_values('Amount', ascending=False)
-        material_value['cumulative_percentage'] = material_value['Amount'].cumsum() / material_value['Amount'].sum() * 100
+        material_value = self.frame(self.REPORT_COLUMNS['material_analysis']).groupby('Material', observed=True)['Amount'].sum().to_frame()
         
         # ABC classification
-        material_value['ABC_Class'] = np.where(
-            material_value['cumulative_percentage'] <= 80, 'A',
-            np.where(material_value['cumulative_percentage'] <= 95, 'B', 'C')
-        )
-        
-        return material_value.set_index('Material')
+        return aggregates.abc_classification(material_value)
     
+    @profiling.profiled(rows=profiling.frame_rows)
     def correlation_analysis(self):
         """Correlation analysis between quantity and amount"""
-        return self.df[['Quantity', 'Amount']].corr()
+        return self.frame(['Quantity', 'Amount']).corr()
     
+    @profiling.profiled(rows=profiling.frame_rows)
     def document_type_analysis(self):
         """Document type analysis"""
-        doc_analysis = self.df.groupby('DocumentType')['Amount'].agg(['sum', 'mean', 'count'])
+        doc_analysis = self.frame(self.REPORT_COLUMNS['document_types']).groupby('DocumentType', observed=True)['Amount'].agg(['sum', 'mean', 'count'])
         doc_analysis['percentage'] = doc_analysis['sum'] / doc_analysis['sum'].sum() * 100
         return doc_analysis.sort_values('sum', ascending=False)
     
-    def generate_all_reports(self):
-        """Generate all analysis reports"""
-        reports = {
-            'basic_statistics': self.basic_statistics(),
-            'time_series': self.time_series_analysis(),
-            'cost_centers': self.cost_center_analysis(),
-            'material_analysis': self.material_analysis(),
-            'correlation': self.correlation_analysis(),
-            'document_types': self.document_type_analysis()
-        }
-        return reports
+    @profiling.profiled(rows=profiling.frame_rows)
+    def generate_all_reports(self, engine='fused'):
+        """
+        Generate all analysis reports whose columns were loaded.
+        
+        engine='fused' computes every report in one pass of bincount reductions
+        over factorized codes (aggregates.fused_reports); engine='methods' runs
+        the report methods below, each of which scans self.df on its own.
+        """
+        if engine == 'fused' and all(column in self.df for column in StreamingSAPDataAnalyzer.COLUMNS):
+            return aggregates.fused_reports(self.frame(StreamingSAPDataAnalyzer.COLUMNS))
+        return dict(self.iter_reports())
     
+    def iter_reports(self):
+        """Yield (name, report) of every report whose columns were loaded, one at a time"""
+        for name, method in self.REPORT_METHODS.items():
+            if all(column in self.df for column in self.REPORT_COLUMNS[name]):
+                yield name, getattr(self, method)()
+    
+    def build_cube(self, dimensions=olap_cube.DIMENSIONS, measure='Amount'):
+        """Pre-aggregated OLAP cube of the loaded data for slice/dice/drill-down queries"""
+        return olap_cube.OLAPCube.from_frame(self.frame(list(dimensions) + [measure]), dimensions, measure)
+    
+    @profiling.profiled(rows=profiling.frame_rows)
+    def build_time_series(self, dimensions=time_series.DIMENSIONS, granularities=tuple(time_series.GRANULARITIES)):
+        """Period aggregates (day, week, month, fiscal period) overall and per dimension, see time_series"""
+        periods = time_series.PeriodAggregates(dimensions, granularities)
+        return periods.update(self.frame(periods.columns))
+    
+    @profiling.profiled(rows=profiling.frame_rows)
+    def detect_anomalies(self, group_columns=anomalies.GROUP_COLUMNS, threshold=anomalies.Z_THRESHOLD):
+        """Outlier postings, unusual period totals per group and duplicate document numbers, see anomalies"""
+        columns = list(group_columns) + ['Amount', 'PostingDate', 'FiscalYear', 'FiscalPeriod', 'DocumentNumber']
+        results = anomalies.detect_anomalies(self.frame(columns), group_columns, threshold=threshold)
+        # the scans work on the parsed numbers, the few flagged ones are shown in their original form
+        for table in results.values():
+            if 'DocumentNumber' in table:
+                table['DocumentNumber'] = data_storage.format_document_numbers(table['DocumentNumber'],
+                                                                               self.document_number_format)
+        return results
+    
+    @profiling.profiled(rows=profiling.frame_rows)
     def plot_time_series(self):
         """Visualize time series data"""
+        import matplotlib.pyplot as plt
+        
         ts_data = self.time_series_analysis()
         
         plt.figure(figsize=(12, 6))
         plt.plot(ts_data.index, ts_data['sum'], label='Monthly total amount')
-        plt.plot(ts_data.index, ts_data['rolling_avg'], label='3-month moving average')
+        plt.plot(ts_data.index, ts_data['rolling_avg'], label=f'{aggregates.ROLLING_WINDOW}-month moving average')
         plt.title('Monthly amounts over time')
         plt.xlabel('Date')
         plt.ylabel('Amount (EUR)')
@@ -124,8 +337,12 @@ class SAPDataAnalyzer:
         plt.tight_layout()
         return plt
     
+    @profiling.profiled(rows=profiling.frame_rows)
     def plot_cost_centers(self):
         """Visualize top cost centers"""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         cc_data = self.cost_center_analysis().head(10)
         
         plt.figure(figsize=(12, 6))
@@ -137,8 +354,11 @@ class SAPDataAnalyzer:
         plt.tight_layout()
         return plt
     
+    @profiling.profiled(rows=profiling.frame_rows)
     def plot_material_abc(self):
         """Visualize material ABC analysis"""
+        import matplotlib.pyplot as plt
+        
         mat_data = self.material_analysis()
         
         plt.figure(figsize=(12, 6))
@@ -152,4 +372,130 @@ class SAPDataAnalyzer:
         plt.legend()
         plt.grid(True)
         plt.tight_layout()
-        return plt
\ No newline at end of file
+        return plt
+
+# %%
+
+class StreamingSAPDataAnalyzer:
+    """
+    Out-of-core and incremental analyzer for ledgers larger than RAM.
+
+    The input is read in chunks and folded into an aggregates.ReportState,
+    so memory stays flat at roughly one chunk. The reports match
+    SAPDataAnalyzer.generate_all_reports, except that medians are
+    approximate (relative error alpha).
+    
+    With a state_path the aggregate state is kept on disk: append() folds a
+    new period's file into it and refreshes the reports from the small
+    aggregate tables without touching the history again. With periods=True
+    the state also keeps time_series.PeriodAggregates, so the period series
+    (build_time_series) grow with every append as well.
+    """
+    COLUMNS = sorted({column for columns in SAPDataAnalyzer.REPORT_COLUMNS.values() for column in columns}
+                     | set(aggregates.GROUP_FIELDS))
+    
+    def __init__(self, data_path=None, filters=None, chunksize=1_000_000, alpha=0.005, state_path=None,
+                 periods=False):
+        self.filters = filters
+        self.chunksize = chunksize
+        self.state_path = state_path
+        if state_path is not None and os.path.exists(state_path):
+            self.state = aggregates.ReportState.load(state_path)
+        else:
+            self.state = aggregates.ReportState(alpha, time_series.PeriodAggregates() if periods else None)
+        if data_path is not None and self._source_id(data_path) not in self.state.sources:
+            self.append(data_path)
+    
+    @staticmethod
+    def _source_id(data_path):
+        """Identity of an input file, to refuse appending the same rows twice"""
+        stat = os.stat(data_path)
+        return (os.path.abspath(data_path), stat.st_size, stat.st_mtime_ns)
+    
+    @profiling.profiled()
+    def append(self, data_path):
+        """Fold the rows of another file into the state, persist it and return the reports"""
+        source = self._source_id(data_path)
+        if source in self.state.sources:
+            raise ValueError(f"{data_path} is already part of the analysis state")
+        
+        columns = self.COLUMNS
+        if self.state.periods is not None:
+            columns = sorted(set(columns) | set(self.state.periods.columns))
+        for chunk in data_storage.iter_chunks(data_path, columns, self.filters, self.chunksize):
+            self.state.update(chunk)
+        self.state.sources.append(source)
+        
+        if self.state_path is not None:
+            self.state.save(self.state_path)
+        return self.generate_all_reports()
+    
+    @profiling.profiled()
+    def generate_all_reports(self):
+        """Generate all analysis reports from the aggregate state"""
+        return self.state.reports()
+    
+    def build_time_series(self):
+        """Period aggregates of every appended file, see SAPDataAnalyzer.build_time_series"""
+        if self.state.periods is None:
+            raise ValueError("The analysis state keeps no period aggregates, create it with periods=True")
+        return self.state.periods
+
+# %%
+
+def create_analyzer(data_path, backend='pandas', **options):
+    """
+    Analyzer for data_path on the chosen backend.
+    
+    'pandas' loads the data into a SAPDataAnalyzer, 'streaming' folds it
+    chunk-wise into a StreamingSAPDataAnalyzer and 'duckdb' runs the reports
+    as SQL on the files in place (sql_backend.DuckDBSAPAnalyzer). All of them
+    return the same reports from generate_all_reports.
+    """
+    if backend == 'pandas':
+        return SAPDataAnalyzer(data_path, **options)
+    if backend == 'streaming':
+        return StreamingSAPDataAnalyzer(data_path, **options)
+    if backend == 'duckdb':
+        import sql_backend
+        return sql_backend.DuckDBSAPAnalyzer(data_path, **options)
+    raise ValueError(f"Unknown analyzer backend: {backend}")
+
+
+def report_key(data_path, columns=None, filters=None, engine='fused'):
+    """Cache key of the reports for data_path and every parameter that shapes them"""
+    # equivalent filters share a key: a single value equals a one-element list, order is irrelevant
+    normalized = data_storage.normalize_filters(filters)
+    for column, (kind, value) in normalized.items():
+        if kind == 'in':
+            normalized[column] = (kind, sorted(set(value), key=str))
+    params = {
+        'columns': sorted(columns) if columns is not None else None,
+        'filters': normalized or None,
+        'engine': engine,
+        'abc_thresholds': aggregates.ABC_THRESHOLDS,
+        'time_series_freq': aggregates.TIME_SERIES_FREQ,
+        'rolling_window': aggregates.ROLLING_WINDOW
+    }
+    return report_cache.cache_key(data_path, params)
+
+
+@profiling.profiled()
+def cached_reports(data_path, cache=None, columns=None, filters=None, engine='fused', analyzer=None):
+    """
+    generate_all_reports through a report_cache.ReportCache.
+    
+    The key is the content fingerprint of data_path plus every parameter that
+    shapes the reports, so an unchanged file is answered from the cache
+    without being parsed. analyzer can pass an already loaded SAPDataAnalyzer
+    for the data_path/columns/filters combination to use on a miss.
+    """
+    cache = cache or report_cache.ReportCache()
+    
+    def compute():
+        nonlocal analyzer
+        if analyzer is None:
+            analyzer = SAPDataAnalyzer(data_path, columns=columns, filters=filters)
+        return analyzer.generate_all_reports(engine=engine)
+    
+    return cache.get_or_compute(report_key(data_path, columns, filters, engine), compute)
@@ -8,63 +8,187 @@ Created on Sat Jul  5 11:43:51 2025
 # %%
 
 import pandas as pd
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-import random
+
+import data_storage
 
 # %%
 
-def generate_sap_like_data(num_records=1000, days = 730):
-
-    companies = ['COMP_A', 'COMP_B', 'COMP_C', 'COMP_D']
-    plants = ['PLANT_{}'.format(i) for i in range(1, 6)]
-    materials = ['MAT_{:05d}'.format(i) for i in range(1, 101)]
-    cost_centers = ['CC_{:04d}'.format(i) for i in range(1001, 1021)]
-    profit_centers = ['PC_{:03d}'.format(i) for i in range(101, 111)]
-    gl_accounts = ['G/L_{:05d}'.format(i) for i in range(40000, 40100)]
-    vendors = ['VEND_{:05d}'.format(i) for i in range(10001, 10101)]
-    customers = ['CUST_{:05d}'.format(i) for i in range(50001, 50101)]
-    
-    end_date = datetime.now()
+COMPANIES = ['COMP_A', 'COMP_B', 'COMP_C', 'COMP_D']
+PLANTS = ['PLANT_{}'.format(i) for i in range(1, 6)]
+MATERIALS = ['MAT_{:05d}'.format(i) for i in range(1, 101)]
+COST_CENTERS = ['CC_{:04d}'.format(i) for i in range(1001, 1021)]
+PROFIT_CENTERS = ['PC_{:03d}'.format(i) for i in range(101, 111)]
+GL_ACCOUNTS = ['G/L_{:05d}'.format(i) for i in range(40000, 40100)]
+VENDORS = ['VEND_{:05d}'.format(i) for i in range(10001, 10101)]
+CUSTOMERS = ['CUST_{:05d}'.format(i) for i in range(50001, 50101)]
+CURRENCIES = ['EUR']
+DOCUMENT_TYPES = ['INV', 'PO', 'SO', 'GR', 'GI']
+
+# document types that carry a vendor / customer reference
+VENDOR_MASK = np.isin(DOCUMENT_TYPES, ['INV', 'PO', 'GR'])
+CUSTOMER_MASK = np.isin(DOCUMENT_TYPES, ['INV', 'SO', 'GI'])
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# %%
+
+def _date_tables(days, end_date=None):
+    """Posting date strings and fiscal year/period for every day offset"""
+    end_date = end_date or datetime.now()
     start_date = end_date - timedelta(days)
-    date_range = [start_date + timedelta(days=x) for x in range(0, days)]
-    
-    data = []
-    for _ in range(num_records):
-        record_date = random.choice(date_range)
-        quantity = round(random.uniform(1, 1000), 2)
-        amount = round(random.uniform(10, 10000), 2)
-        currency = 'EUR'
-        doc_type = random.choice(['INV', 'PO', 'SO', 'GR', 'GI'])
-        
-        record = {
-            'CompanyCode': random.choice(companies),
-            'Plant': random.choice(plants),
-            'Material': random.choice(materials),
-            'Quantity': quantity,
-            'Amount': amount,
-            'Currency': currency,
-            'DocumentType': doc_type,
-            'PostingDate': record_date.strftime('%Y-%m-%d'),
-            'CostCenter': random.choice(cost_centers),
-            'ProfitCenter': random.choice(profit_centers),
-            'GLAccount': random.choice(gl_accounts),
-            'Vendor': random.choice(vendors) if doc_type in ['INV', 'PO', 'GR'] else '',
-            'Customer': random.choice(customers) if doc_type in ['INV', 'SO', 'GI'] else '',
-            'FiscalYear': record_date.year,
-            'FiscalPeriod': record_date.month,
-            'DocumentNumber': 'DOC_{:08d}'.format(random.randint(1, 99999999))
-        }
-        data.append(record)
-    
-    df = pd.DataFrame(data)
-    return df
-
-def save_data(df, filename='sap_data.csv'):
-    df.to_csv(filename, index=False)
+    dates = pd.date_range(start_date.date(), periods=days, freq='D')
+    return dates.strftime('%Y-%m-%d'), dates.year.to_numpy(np.int64), dates.month.to_numpy(np.int64)
+
+
+def _format_numbers(prefix, numbers, width):
+    """Format integers as zero-padded strings with a prefix without a Python loop"""
+    digits = (numbers[:, None] // 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)) % 10
+    buf = np.empty((len(numbers), len(prefix) + width), dtype=np.uint8)
+    buf[:, :len(prefix)] = np.frombuffer(prefix.encode('ascii'), dtype=np.uint8)
+    buf[:, len(prefix):] = digits + ord('0')
+    return buf.view('S{}'.format(buf.shape[1])).ravel().astype(str)
+
+
+def _categorical(rng, categories, size):
+    """Uniformly drawn categorical column"""
+    return pd.Categorical.from_codes(rng.integers(0, len(categories), size), categories)
+
+
+def _optional_categorical(rng, categories, mask, size):
+    """Categorical column that is empty wherever mask is False"""
+    codes = np.where(mask, rng.integers(0, len(categories), size), len(categories))
+    return pd.Categorical.from_codes(codes, categories + [''])
+
+
+def _generate_block(rng, size, date_tables):
+    """Draw one block of records column by column from a NumPy Generator"""
+    dates, years, periods = date_tables
+    day = rng.integers(0, len(dates), size)
+    doc_type = rng.integers(0, len(DOCUMENT_TYPES), size)
+
+    return pd.DataFrame({
+        'CompanyCode': _categorical(rng, COMPANIES, size),
+        'Plant': _categorical(rng, PLANTS, size),
+        'Material': _categorical(rng, MATERIALS, size),
+        'Quantity': np.round(rng.uniform(1, 1000, size), 2),
+        'Amount': np.round(rng.uniform(10, 10000, size), 2),
+        'Currency': pd.Categorical.from_codes(np.zeros(size, dtype=np.int8), CURRENCIES),
+        'DocumentType': pd.Categorical.from_codes(doc_type, DOCUMENT_TYPES),
+        'PostingDate': pd.Categorical.from_codes(day, dates),
+        'CostCenter': _categorical(rng, COST_CENTERS, size),
+        'ProfitCenter': _categorical(rng, PROFIT_CENTERS, size),
+        'GLAccount': _categorical(rng, GL_ACCOUNTS, size),
+        'Vendor': _optional_categorical(rng, VENDORS, VENDOR_MASK[doc_type], size),
+        'Customer': _optional_categorical(rng, CUSTOMERS, CUSTOMER_MASK[doc_type], size),
+        'FiscalYear': years[day],
+        'FiscalPeriod': periods[day],
+        'DocumentNumber': _format_numbers('DOC_', rng.integers(1, 100000000, size), 8)
+    })
+
+
+def _block_seeds(seed, num_records, chunk_size):
+    """One independent SeedSequence per block of chunk_size records"""
+    num_blocks = max(1, -(-num_records // chunk_size))
+    return np.random.SeedSequence(seed).spawn(num_blocks)
+
+
+def generate_sap_like_data_chunks(num_records=1000, days=730, chunk_size=DEFAULT_CHUNK_SIZE,
+                                  seed=None, end_date=None):
+    """
+    Yield synthetic SAP records as DataFrames of at most chunk_size rows.
+
+    Every block draws from its own child of SeedSequence(seed), so the output
+    for a given seed and chunk_size is reproducible and memory stays bounded
+    by a single chunk. String dimensions are returned as categoricals.
+    """
+    date_tables = _date_tables(days, end_date)
+    for block, block_seed in enumerate(_block_seeds(seed, num_records, chunk_size)):
+        size = min(chunk_size, num_records - block * chunk_size)
+        yield _generate_block(np.random.default_rng(block_seed), size, date_tables)
+
+
+def generate_sap_like_data(num_records=1000, days=730, seed=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Generate synthetic SAP records as a single DataFrame"""
+    chunks = generate_sap_like_data_chunks(num_records, days, chunk_size, seed)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _write_block(task):
+    """Generate one block and write it as part file(s), split by fiscal period"""
+    block, block_seed, size, date_tables, out_dir, partition, file_format = task
+    df = _generate_block(np.random.default_rng(block_seed), size, date_tables)
+    name = 'part-{:05d}.{}'.format(block, file_format)
+
+    if not partition:
+        path = os.path.join(out_dir, name)
+        save_data(df, path, verbose=False)
+        return [path]
+
+    paths = []
+    for (year, period), part in df.groupby(['FiscalYear', 'FiscalPeriod'], sort=True):
+        part_dir = os.path.join(out_dir, f'FiscalYear={year}', f'FiscalPeriod={period}')
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, name)
+        if file_format == 'parquet':
+            # hive convention: the partition keys live in the directory names only
+            part = part.drop(columns=data_storage.PARTITION_COLUMNS)
+        save_data(part, path, verbose=False)
+        paths.append(path)
+    return paths
+
+
+def generate_sap_like_data_parallel(num_records, out_dir, days=730, workers=None, seed=None,
+                                    chunk_size=DEFAULT_CHUNK_SIZE, partition=True, file_format='csv'):
+    """
+    Generate synthetic SAP records on a process pool and write them as part files.
+
+    The record count is split into blocks of chunk_size, and block i always
+    draws from the i-th child of SeedSequence(seed). The set of written files
+    and their contents therefore depend only on seed and chunk_size, never on
+    the number of workers. With partition=True the files are laid out as
+    FiscalYear=YYYY/FiscalPeriod=M/part-NNNNN.<file_format>, where
+    file_format is 'csv' or 'parquet'.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    date_tables = _date_tables(days)
+    block_seeds = _block_seeds(seed, num_records, chunk_size)
+    tasks = [
+        (block, block_seed, min(chunk_size, num_records - block * chunk_size),
+         date_tables, out_dir, partition, file_format)
+        for block, block_seed in enumerate(block_seeds)
+    ]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        paths = [path for block_paths in executor.map(_write_block, tasks) for path in block_paths]
+
+    print(f"Data saved in {len(paths)} files under {out_dir}")
+    return sorted(paths)
+
+def save_data(df, filename='sap_data.csv', verbose=True):
+    """Save as CSV, or as typed Parquet/Feather for .parquet/.feather file names"""
+    if data_storage.storage_format(filename) == 'csv':
+        df.to_csv(filename, index=False)
+    else:
+        data_storage.write_table(df, filename)
+    if verbose:
+        print(f"Data saved in {filename}")
+
+def save_data_chunks(chunks, filename='sap_data.csv'):
+    """Stream DataFrame chunks into one file without holding them in memory"""
+    if data_storage.storage_format(filename) == 'csv':
+        with open(filename, 'w', newline='') as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=i == 0)
+    else:
+        data_storage.write_table_chunks(chunks, filename)
     print(f"Data saved in {filename}")
 
 # %%
 
 if __name__ == "__main__":
     df = generate_sap_like_data(5000)
-    save_data(df)
\ No newline at end of file
+    save_data(df)
@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 09:14:02 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# %%
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+FEATHER_EXTENSIONS = ('.feather', '.arrow', '.ipc')
+# metadata file marking a directory as a memory-mapped column store (see column_store)
+STORE_META = 'meta.json'
+
+DIMENSION_COLUMNS = ['CompanyCode', 'Plant', 'Material', 'Currency', 'DocumentType', 'CostCenter',
+                     'ProfitCenter', 'GLAccount', 'Vendor', 'Customer']
+PARTITION_COLUMNS = ['FiscalYear', 'FiscalPeriod']
+NUMERIC_DTYPES = {'Quantity': 'float64', 'Amount': 'float64'}
+
+COLUMNS = ['CompanyCode', 'Plant', 'Material', 'Quantity', 'Amount', 'Currency', 'DocumentType',
+           'PostingDate', 'CostCenter', 'ProfitCenter', 'GLAccount', 'Vendor', 'Customer',
+           'FiscalYear', 'FiscalPeriod', 'DocumentNumber']
+
+# %%
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet/Feather files: pip install pyarrow")
+
+
+def sap_schema(columns=None):
+    """Arrow schema of the SAP ledger, optionally restricted to some columns"""
+    _require_pyarrow()
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    types = {
+        'Quantity': pa.float64(),
+        'Amount': pa.float64(),
+        'PostingDate': pa.date32(),
+        'FiscalYear': pa.int16(),
+        'FiscalPeriod': pa.int16(),
+        'DocumentNumber': pa.string(),
+    }
+    types.update({name: dictionary for name in DIMENSION_COLUMNS})
+    return pa.schema([(name, types[name]) for name in COLUMNS if columns is None or name in columns])
+
+
+def storage_format(path):
+    """'parquet', 'feather', 'columns' or 'csv', judging by the extension or the files in a directory"""
+    if os.path.basename(path) == STORE_META or os.path.isfile(os.path.join(path, STORE_META)):
+        return 'columns'
+    if os.path.isdir(path):
+        if glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True):
+            return 'parquet'
+        return 'csv'
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PARQUET_EXTENSIONS:
+        return 'parquet'
+    if ext in FEATHER_EXTENSIONS:
+        return 'feather'
+    return 'csv'
+
+
+def to_arrow_table(df):
+    """Convert a ledger DataFrame to an Arrow table with the typed SAP schema"""
+    df = df.copy()
+    if 'PostingDate' in df.columns:
+        df['PostingDate'] = pd.to_datetime(df['PostingDate'])
+    for name in DIMENSION_COLUMNS:
+        # empty vendor/customer references are stored as nulls, as read_csv does
+        if name not in df.columns:
+            continue
+        if not isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype(object).replace('', None)
+        elif '' in df[name].cat.categories:
+            df[name] = df[name].cat.remove_categories([''])
+    return pa.Table.from_pandas(df, schema=sap_schema(df.columns), preserve_index=False)
+
+
+def _grow_categories(chunk, categories):
+    """
+    The dimensions of a chunk as categoricals over categories that only
+    grow from chunk to chunk, so every dictionary extends the previous one
+    (an IPC file accepts dictionary deltas, but no replaced dictionaries).
+    """
+    chunk = chunk.copy()
+    for name in DIMENSION_COLUMNS:
+        if name not in chunk.columns:
+            continue
+        values = chunk[name].astype(object).replace('', None)
+        known = categories.get(name, pd.Index([], dtype=object))
+        categories[name] = known.append(pd.Index(values.dropna().unique()).difference(known, sort=False))
+        chunk[name] = pd.Categorical(values, categories=categories[name])
+    return chunk
+
+
+def write_table(df, path, row_group_size=1_000_000):
+    """Write a ledger DataFrame as Parquet or Feather, depending on the extension"""
+    _require_pyarrow()
+    table = to_arrow_table(df)
+    if storage_format(path) == 'feather':
+        feather.write_feather(table, path)
+    else:
+        pq.write_table(table, path, row_group_size=row_group_size)
+
+
+def write_table_chunks(chunks, path):
+    """Stream DataFrame chunks into one Parquet (one row group per chunk) or Feather file"""
+    _require_pyarrow()
+    writer = None
+    categories = {}
+    try:
+        for chunk in chunks:
+            table = to_arrow_table(_grow_categories(chunk, categories))
+            if writer is None:
+                if storage_format(path) == 'feather':
+                    options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+                    writer = pa.ipc.new_file(path, table.schema, options=options)
+                else:
+                    writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def normalize_filters(filters):
+    """
+    Normalize row filters to {column: (kind, value)}.
+
+    'PostingDate' takes an inclusive (start, end) tuple, either end may be
+    None. Every other column takes a single value or a list of values.
+    """
+    normalized = {}
+    for column, value in (filters or {}).items():
+        if column == 'PostingDate':
+            start, end = value
+            normalized[column] = ('range', (None if start is None else pd.Timestamp(start),
+                                            None if end is None else pd.Timestamp(end)))
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            normalized[column] = ('in', list(value))
+        else:
+            normalized[column] = ('in', [value])
+    return normalized
+
+
+def filter_mask(df, filters):
+    """Boolean row mask of normalized filters; PostingDate must already be parsed"""
+    mask = pd.Series(True, index=df.index)
+    for column, (kind, value) in filters.items():
+        if kind == 'range':
+            start, end = value
+            if start is not None:
+                mask &= df[column] >= start
+            if end is not None:
+                mask &= df[column] <= end
+        else:
+            mask &= df[column].isin(value)
+    return mask
+
+
+def _arrow_filter(filters):
+    """Arrow dataset expression for normalized filters, used for row-group/partition pruning"""
+    expression = None
+    for column, (kind, value) in filters.items():
+        field = ds.field(column)
+        if kind == 'range':
+            start, end = value
+            conditions = []
+            if start is not None:
+                conditions.append(field >= pa.scalar(start.date(), pa.date32()))
+            if end is not None:
+                conditions.append(field <= pa.scalar(end.date(), pa.date32()))
+        else:
+            conditions = [field.isin(value)]
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _partition_values(path):
+    """{key: value} of the key=value directory names in a part file path"""
+    parts = os.path.normpath(path).split(os.sep)
+    return dict(part.split('=', 1) for part in parts[:-1] if '=' in part)
+
+
+def _csv_files(path, filters=None):
+    if not os.path.isdir(path):
+        return [path]
+    files = sorted(glob.glob(os.path.join(path, '**', '*.csv'), recursive=True))
+    # skip part files whose FiscalYear=/FiscalPeriod= directories cannot match
+    for column, (kind, value) in (filters or {}).items():
+        if kind != 'in':
+            continue
+        wanted = {str(v) for v in value}
+        files = [f for f in files
+                 if _partition_values(f).get(column) in wanted or column not in _partition_values(f)]
+    return files
+
+
+def _dataset(path):
+    """Arrow dataset over a file or a FiscalYear=/FiscalPeriod= partitioned directory"""
+    fmt = storage_format(path)
+    if fmt == 'feather':
+        return ds.dataset(path, format='ipc')
+    if os.path.isdir(path):
+        partitioning = ds.partitioning(sap_schema(PARTITION_COLUMNS), flavor='hive')
+        return ds.dataset(path, format='parquet', partitioning=partitioning)
+    return ds.dataset(path, format='parquet')
+
+
+def _csv_reader_options(columns, filters):
+    wanted = None if columns is None else set(columns) | set(filters)
+    # dimensions are parsed straight into categoricals, never held as object strings
+    dtype = dict(NUMERIC_DTYPES, **{name: 'category' for name in DIMENSION_COLUMNS})
+    return {'usecols': None if wanted is None else (lambda name: name in wanted), 'dtype': dtype}
+
+
+def concat_frames(frames):
+    """Concatenate chunks; categoricals stay categorical even if the chunks saw different categories"""
+    frames = list(frames)
+    if len(frames) > 1:
+        for name in frames[0].columns:
+            if not all(isinstance(f[name].dtype, pd.CategoricalDtype) for f in frames):
+                continue
+            categories = frames[0][name].cat.categories
+            for f in frames[1:]:
+                categories = categories.union(f[name].cat.categories)
+            for f in frames:
+                f[name] = f[name].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def parse_document_numbers(values):
+    """
+    Document numbers like 'DOC_00001234' as int64 (1234).
+
+    Equally formatted numbers (same prefix, zero-padded digits) are parsed
+    on their bytes without a Python loop; anything else goes through a
+    regex and becomes <NA> where no trailing digits exist.
+    Missing values do not break the fast path, they become <NA> (Int64).
+    Returns (numbers, (prefix, width)) with the format of the fast path or None.
+    """
+    present = values.notna().to_numpy()
+    strings = values.to_numpy()[present]
+    try:
+        raw = strings.astype('S') if len(strings) else None
+    except (UnicodeEncodeError, ValueError, TypeError):
+        raw = None
+    if raw is not None and raw.dtype.itemsize > 0:
+        width = raw.dtype.itemsize
+        buf = raw.view(np.uint8).reshape(len(raw), width)
+        # the trailing byte positions that are digits in every row hold the number
+        all_digits = ((buf >= ord('0')) & (buf <= ord('9'))).all(axis=0)
+        suffix = width if all_digits.all() else int(np.argmin(all_digits[::-1]))
+        prefix_length = width - suffix
+        prefix = buf[0, :prefix_length]
+        if 0 < width - prefix_length <= 18 and (buf[:, :prefix_length] == prefix).all():
+            powers = 10 ** np.arange(width - prefix_length - 1, -1, -1, dtype=np.int64)
+            parsed = (buf[:, prefix_length:].astype(np.int64) - ord('0')) @ powers
+            if present.all():
+                numbers = pd.Series(parsed, index=values.index, name=values.name)
+            else:
+                numbers = pd.Series(pd.NA, index=values.index, name=values.name, dtype='Int64')
+                numbers[present] = parsed
+            return numbers, (prefix.tobytes().decode(), width - prefix_length)
+    numbers = pd.to_numeric(values.astype('string').str.extract(r'(\d+)$', expand=False), errors='coerce')
+    return numbers.astype('Int64'), None
+
+
+def format_document_numbers(numbers, number_format):
+    """
+    Inverse of parse_document_numbers: the numbers as text in their
+    (prefix, width) format, missing numbers stay missing. Without a format
+    the numbers are returned unchanged.
+    """
+    if number_format is None:
+        return numbers
+    prefix, width = number_format
+    text = prefix + numbers.astype('Int64').astype('string').str.zfill(width)
+    return text.astype(object).where(text.notna(), None)
+
+
+def document_number_formatter(number_format):
+    """format_document_numbers for a single number, e.g. to format only the visible cells of a table"""
+    if number_format is None:
+        return str
+    prefix, width = number_format
+    return lambda number: str(number) if pd.isna(number) else f'{prefix}{int(number):0{width}d}'
+
+
+def _project(df, columns):
+    return df if columns is None else df[[name for name in df.columns if name in set(columns)]]
+
+
+def _arrow_columns(dataset, columns):
+    names = [name for name in COLUMNS if name in dataset.schema.names]
+    return names if columns is None else [name for name in names if name in set(columns)]
+
+
+def iter_chunks(path, columns=None, filters=None, chunksize=1_000_000):
+    """
+    Yield the ledger as DataFrames of at most chunksize rows with parsed PostingDate.
+
+    Projection and filters are pushed down as in read_data; memory use is
+    bounded by a single chunk whatever the size of the input.
+    """
+    return _iter_chunks(path, columns, normalize_filters(filters), chunksize)
+
+
+def _iter_chunks(path, columns, filters, chunksize):
+    if storage_format(path) == 'columns':
+        import column_store
+        wanted = None if columns is None else set(columns) | set(filters)
+        df = column_store.open_store(path, wanted)
+        for start in range(0, len(df), chunksize):
+            chunk = df.iloc[start:start + chunksize]
+            yield _project(chunk[filter_mask(chunk, filters)] if filters else chunk, columns)
+        return
+    if storage_format(path) == 'csv':
+        options = _csv_reader_options(columns, filters)
+        for f in _csv_files(path, filters):
+            for chunk in pd.read_csv(f, chunksize=chunksize, **options):
+                if 'PostingDate' in chunk:
+                    chunk['PostingDate'] = pd.to_datetime(chunk['PostingDate'])
+                yield _project(chunk[filter_mask(chunk, filters)], columns)
+        return
+
+    _require_pyarrow()
+    dataset = _dataset(path)
+    batches = dataset.to_batches(columns=_arrow_columns(dataset, columns), filter=_arrow_filter(filters),
+                                 batch_size=chunksize)
+    for batch in batches:
+        yield batch.to_pandas(date_as_object=False)
+
+
+def read_data(path, columns=None, filters=None, chunksize=1_000_000):
+    """
+    Read a ledger from CSV, Parquet, Feather, a directory of part files or
+    a column store.
+
+    Only the given columns are materialized and the row filters (see
+    normalize_filters) are pushed down to the reader: CSV files are parsed
+    with usecols in chunks and filtered chunk by chunk, partitioned CSV
+    directories skip non-matching FiscalYear/FiscalPeriod files, and
+    columnar files prune row groups and partitions through Arrow. A column
+    store is memory-mapped and returned without a copy unless filtered.
+    """
+    filters = normalize_filters(filters)
+    if storage_format(path) == 'columns':
+        import column_store
+        df = column_store.open_store(path, None if columns is None else set(columns) | set(filters))
+        if not filters:
+            return df
+        df = _project(df[filter_mask(df, filters)].reset_index(drop=True), columns)
+    elif storage_format(path) == 'csv' and filters:
+        df = concat_frames(_iter_chunks(path, columns, filters, chunksize))
+    elif storage_format(path) == 'csv':
+        options = _csv_reader_options(columns, filters)
+        df = concat_frames(pd.read_csv(f, **options) for f in _csv_files(path))
+        df = _project(df, columns)
+    else:
+        _require_pyarrow()
+        dataset = _dataset(path)
+        table = dataset.to_table(columns=_arrow_columns(dataset, columns), filter=_arrow_filter(filters))
+        df = table.to_pandas(date_as_object=False)
+
+    # dictionaries still list values that the filters removed
+    for name in df.columns:
+        if isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].cat.remove_unused_categories()
+    return df
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 15:42:08 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+import data_storage
+import report_cache
+
+# %%
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser('~'), '.sap_analytics_index')
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+INDEX_COLUMNS = ['CompanyCode', 'Plant', 'DocumentType', 'CostCenter', 'Material']
+
+# bump when the file layout changes, so old index files are rebuilt
+INDEX_VERSION = 2
+
+# %%
+
+def _codes(values):
+    """Integer codes (-1 = missing) and labels of a column"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int32), values.cat.categories
+    codes, labels = pd.factorize(values)
+    return codes.astype(np.int32), labels
+
+
+class LedgerIndex:
+    """
+    Secondary indexes over the rows of a loaded ledger.
+
+    PostingDate is indexed as the stable sort order of the dates, so a date
+    range becomes two binary searches and one slice. Each key column keeps
+    a row-id list per value in CSR form (rows grouped by value, plus
+    offsets), so the rows of a value list are gathered without a scan. A
+    query starts from the most selective indexed filter and checks the
+    remaining filters on those candidate rows only.
+    """
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.n_rows = int(arrays['n_rows'])
+        self.source = str(arrays['source'])
+        self.columns = [c for c in INDEX_COLUMNS if f'{c}.codes' in arrays]
+        self.labels = {c: pd.Index(arrays[f'{c}.labels']) for c in self.columns}
+
+    @classmethod
+    def build(cls, df, source=''):
+        """Index the PostingDate and key columns present in df; source is the fingerprint of the indexed file"""
+        arrays = {'version': INDEX_VERSION, 'n_rows': len(df), 'source': source}
+        if 'PostingDate' in df:
+            dates = df['PostingDate'].to_numpy().astype('datetime64[ns]')
+            order = np.argsort(dates, kind='stable')
+            arrays['date.values'] = dates
+            arrays['date.order'] = order
+            arrays['date.sorted'] = dates[order]
+            arrays['date.count'] = np.count_nonzero(~np.isnat(dates))
+        for column in INDEX_COLUMNS:
+            if column not in df:
+                continue
+            codes, labels = _codes(df[column])
+            valid = codes >= 0
+            order = np.argsort(np.where(valid, codes, len(labels)), kind='stable')[:valid.sum()]
+            offsets = np.zeros(len(labels) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(codes[valid], minlength=len(labels)), out=offsets[1:])
+            arrays[f'{column}.codes'] = codes
+            arrays[f'{column}.labels'] = np.asarray(labels.astype(str), dtype=str)
+            arrays[f'{column}.order'] = order
+            arrays[f'{column}.offsets'] = offsets
+        return cls(arrays)
+
+    def save(self, path):
+        """Write the index as an .npz file (atomically)"""
+        tmp_path = path + '.tmp{}.npz'.format(os.getpid())
+        np.savez(tmp_path, **self.arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        if int(arrays['version']) != INDEX_VERSION:
+            raise ValueError(f"{path} was written by another index version")
+        return cls(arrays)
+
+    def _date_range(self, start, end):
+        """(lo, hi) into the sorted dates; NaT sorts last and is never inside a range"""
+        sorted_dates = self.arrays['date.sorted']
+        lo = 0 if start is None else np.searchsorted(sorted_dates, start.to_datetime64(), side='left')
+        if end is None:
+            hi = int(self.arrays['date.count'])
+        else:
+            hi = np.searchsorted(sorted_dates, end.to_datetime64(), side='right')
+        return int(lo), int(max(lo, hi))
+
+    def _value_codes(self, column, values):
+        codes = self.labels[column].get_indexer([str(v) for v in values])
+        return codes[codes >= 0]
+
+    def _estimate(self, column, kind, value):
+        """Number of rows an indexed filter selects"""
+        if column == 'PostingDate':
+            lo, hi = self._date_range(*value)
+            return hi - lo
+        offsets = self.arrays[f'{column}.offsets']
+        codes = self._value_codes(column, value)
+        return int((offsets[codes + 1] - offsets[codes]).sum())
+
+    def _rows(self, column, kind, value):
+        """Sorted row ids of one indexed filter"""
+        if column == 'PostingDate':
+            lo, hi = self._date_range(*value)
+            return np.sort(self.arrays['date.order'][lo:hi])
+        offsets, order = self.arrays[f'{column}.offsets'], self.arrays[f'{column}.order']
+        codes = self._value_codes(column, value)
+        rows = [order[offsets[code]:offsets[code + 1]] for code in codes]
+        return np.sort(np.concatenate(rows)) if len(rows) > 1 else (rows[0] if rows else np.zeros(0, dtype=np.int64))
+
+    def _check(self, column, kind, value, rows):
+        """Which of the candidate rows also satisfy an indexed filter"""
+        if column == 'PostingDate':
+            dates = self.arrays['date.values'][rows]
+            start, end = value
+            keep = ~np.isnat(dates)
+            if start is not None:
+                keep &= dates >= start.to_datetime64()
+            if end is not None:
+                keep &= dates <= end.to_datetime64()
+            return keep
+        return np.isin(self.arrays[f'{column}.codes'][rows], self._value_codes(column, value))
+
+    def indexed(self, column):
+        return column in self.columns or (column == 'PostingDate' and 'date.order' in self.arrays)
+
+    def rows(self, filters, df=None):
+        """
+        Sorted row positions matching filters (see data_storage.normalize_filters).
+
+        Filters on columns without an index are evaluated on the candidate
+        rows of df, which is then required.
+        """
+        filters = data_storage.normalize_filters(filters)
+        indexed = {c: f for c, f in filters.items() if self.indexed(c)}
+        residual = {c: f for c, f in filters.items() if c not in indexed}
+
+        if indexed:
+            first = min(indexed, key=lambda c: self._estimate(c, *indexed[c]))
+            rows = self._rows(first, *indexed.pop(first))
+        else:
+            rows = np.arange(self.n_rows)
+        for column, (kind, value) in indexed.items():
+            rows = rows[self._check(column, kind, value, rows)]
+
+        if residual:
+            if df is None:
+                raise ValueError(f"No index on {sorted(residual)}; pass the DataFrame to filter them")
+            candidates = pd.DataFrame({column: df[column].take(rows) for column in residual})
+            rows = rows[data_storage.filter_mask(candidates, residual).to_numpy()]
+        return rows
+
+# %%
+
+def index_path(data_path, columns=None, filters=None, index_dir=DEFAULT_INDEX_DIR):
+    """Index file of a dataset, keyed by its content fingerprint and how it was loaded"""
+    params = {'columns': sorted(columns) if columns is not None else None, 'filters': filters, 'version': INDEX_VERSION}
+    return os.path.join(index_dir, report_cache.cache_key(data_path, params) + '.npz')
+
+
+def _entries(index_dir):
+    """(last use, size in bytes, path) of every stored index"""
+    entries = []
+    for path in glob.glob(os.path.join(index_dir, '*.npz')):
+        if '.tmp' in os.path.basename(path):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def load_or_build(df, data_path=None, columns=None, filters=None, index_dir=DEFAULT_INDEX_DIR,
+                  max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Index of df, read from index_dir when data_path was indexed before, built and stored otherwise.
+
+    A stored index is only used if the full content fingerprint of data_path
+    it was built from (see report_cache.file_fingerprint, re-hashed whenever
+    size or mtime change) and its row count still match. Like the report
+    cache, index_dir is kept below max_bytes by removing the least recently
+    used indexes.
+    """
+    if data_path is None:
+        return LedgerIndex.build(df)
+    fingerprint = report_cache.file_fingerprint(data_path)
+    path = index_path(data_path, columns, filters, index_dir)
+    if os.path.exists(path):
+        try:
+            index = LedgerIndex.load(path)
+            if index.source == fingerprint and index.n_rows == len(df):
+                os.utime(path)  # mark as recently used
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+    index = LedgerIndex.build(df, source=fingerprint)
+    os.makedirs(index_dir, exist_ok=True)
+    index.save(path)
+    report_cache.evict_lru(_entries(index_dir), max_bytes)
+    return index
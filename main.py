@@ -7,32 +7,97 @@ Created on Sat Jul  5 11:49:59 2025
 
 # %%
 
-import data_generator
-import data_analysis
-from sap_analytics_app import AnalysisApp
-from PySide6.QtWidgets import QApplication
+import os
 import sys
+import argparse
+import profiling
+
+# the GUI, analysis and plotting modules are imported inside the functions
+# below, so the window is shown before the analysis stack is loaded
 
 # %%
 
-def main():
-    print("Generate SAP-Data...")
-    df = data_generator.generate_sap_like_data(5000)
-    data_generator.save_data(df, "sap_data.csv")
+# fixed, so a regenerated sample ledger has the same content and the same cache key
+SAMPLE_SEED = 42
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SAP analytics tool")
+    parser.add_argument('--fast-start', action='store_true',
+                        help="Only open the window, without creating and analysing the sample data")
+    parser.add_argument('--profile', action='store_true',
+                        help="Time every analysis and GUI step and print a breakdown at exit")
+    parser.add_argument('--profile-output', default=None, metavar='PREFIX',
+                        help="With --profile: write PREFIX.prof (cProfile) and PREFIX.folded (flamegraph stacks)")
+    return parser.parse_args()
+
+
+def report_profile(output=None):
+    """Print the span breakdown and write the profile files"""
+    profiling.disable()
+    print("\nProfile:")
+    profiling.print_summary()
+    if output:
+        profiling.dump_cprofile(output + '.prof')
+        profiling.dump_collapsed(output + '.folded')
+        print(f"Profile saved in {output}.prof and {output}.folded")
+
+
+def sample_data_task(file_path="sap_data.csv"):
+    """Creates the sample ledger if missing and prints its statistics (run on the thread pool)"""
+    import data_generator
+    import data_analysis
+    import report_cache
+    
+    # an existing file keeps its fingerprint, so its reports come from the cache
+    if not os.path.exists(file_path):
+        print("Generate SAP-Data...")
+        df = data_generator.generate_sap_like_data(5000, seed=SAMPLE_SEED)
+        data_generator.save_data(df, file_path)
     
     print("\nAnalysze Data...")
-    analyzer = data_analysis.SAPDataAnalyzer("sap_data.csv")
-    reports = analyzer.generate_all_reports()
+    cache = report_cache.ReportCache()
+    reports = data_analysis.cached_reports(file_path, cache)
+    print(f"Report cache: {cache.hits} hits, {cache.misses} misses")
     
     print("\nGeneral Statistics:")
     print(f"Amount of datasets: {reports['basic_statistics']['total_records']}")
     print(f"Average value: {reports['basic_statistics']['numeric_fields']['Amount']['mean']:.2f} EUR")
+    yield 'sample_data', reports
+
+
+def start_gui(argv=None):
+    """Creates the application and paints the main window before any data work"""
+    from PySide6.QtWidgets import QApplication
+    from sap_analytics_app import AnalysisApp
     
-    print("\nStart GUI...")
-    app = QApplication(sys.argv)
+    app = QApplication.instance() or QApplication(argv if argv is not None else sys.argv)
     window = AnalysisApp()
     window.show()
-    sys.exit(app.exec())
+    app.processEvents()
+    return app, window
+
+
+def main():
+    args = parse_args()
+    if args.profile:
+        profiling.enable(cprofile=args.profile_output is not None)
+    
+    print("Start GUI...")
+    app, window = start_gui(sys.argv)
+    
+    if not args.fast_start:
+        import workers
+        from PySide6.QtCore import QThreadPool
+        worker = workers.TaskWorker(sample_data_task, "sap_data.csv")
+        worker.signals.error.connect(lambda message: print(f"Sample data failed: {message}"))
+        QThreadPool.globalInstance().start(worker)
+    
+    exit_code = app.exec()
+    
+    if args.profile:
+        report_profile(args.profile_output)
+    sys.exit(exit_code)
 
 # %%
 
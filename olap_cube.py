@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 14:48:30 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+from itertools import product
+import numpy as np
+import pandas as pd
+
+import data_storage
+
+# %%
+
+DIMENSIONS = ['CompanyCode', 'Plant', 'ProfitCenter', 'CostCenter', 'GLAccount', 'FiscalYear', 'FiscalPeriod']
+
+# dimension hierarchies, from the top level down
+HIERARCHIES = {
+    'organization': ['CompanyCode', 'Plant'],
+    'controlling': ['ProfitCenter', 'CostCenter'],
+    'account': ['GLAccount'],
+    'time': ['FiscalYear', 'FiscalPeriod']
+}
+
+MEASURES = ['sum', 'count', 'min', 'max']
+ROLLUP = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+# %%
+
+def _aggregate_rows(df, dimensions, measure):
+    """Posting rows -> one cell per observed dimension combination"""
+    grouped = df.groupby(dimensions, observed=True, sort=False, dropna=False)[measure]
+    return grouped.agg(MEASURES).reset_index()
+
+
+def _rollup(cells, dimensions):
+    """Aggregate cells of a finer cuboid to the given dimensions"""
+    if not dimensions:
+        return cells[MEASURES].agg(ROLLUP).to_frame().T
+    return cells.groupby(list(dimensions), sort=False)[MEASURES].agg(ROLLUP).reset_index()
+
+
+class OLAPCube:
+    """
+    Sparse pre-aggregated cube of one measure over the SAP dimensions.
+
+    The rows are aggregated once into base cells holding sum/count/min/max
+    per observed combination of integer-coded dimensions. Every coarser
+    cuboid is rolled up from the smallest cuboid already materialized that
+    contains its dimensions and is kept for later queries, so slice, dice,
+    drill-down and roll-up never go back to the posting rows.
+    """
+    def __init__(self, cells, dimensions=DIMENSIONS, measure='Amount'):
+        self.dimensions = list(dimensions)
+        self.measure = measure
+        self.labels = {}
+        base = {}
+        for dim in self.dimensions:
+            codes, self.labels[dim] = pd.factorize(cells[dim], sort=True, use_na_sentinel=False)
+            base[dim] = codes.astype(np.int32)
+        for name in MEASURES:
+            base[name] = cells[name].to_numpy()
+        self._cuboids = {frozenset(self.dimensions): pd.DataFrame(base)}
+
+    @classmethod
+    def from_frame(cls, df, dimensions=DIMENSIONS, measure='Amount'):
+        """Build the cube from posting rows in memory"""
+        return cls(_aggregate_rows(df, list(dimensions), measure), dimensions, measure)
+
+    @classmethod
+    def from_file(cls, data_path, dimensions=DIMENSIONS, measure='Amount', filters=None, chunksize=1_000_000):
+        """Build the cube chunk by chunk, reading only the dimension and measure columns"""
+        dimensions = list(dimensions)
+        chunks = data_storage.iter_chunks(data_path, dimensions + [measure], filters, chunksize)
+        cells = pd.concat([_aggregate_rows(chunk, dimensions, measure) for chunk in chunks], ignore_index=True)
+        for dim in dimensions:
+            # chunk dictionaries differ, so merge the partial cells on plain labels
+            cells[dim] = cells[dim].astype(object)
+        cells = cells.groupby(dimensions, sort=False, dropna=False)[MEASURES].agg(ROLLUP).reset_index()
+        return cls(cells, dimensions, measure)
+
+    @property
+    def size(self):
+        """Number of base cells"""
+        return len(self._cuboids[frozenset(self.dimensions)])
+
+    def _smallest_parent(self, dimensions):
+        parents = [key for key in self._cuboids if dimensions <= key]
+        return min(parents, key=lambda key: len(self._cuboids[key]))
+
+    def cuboid(self, dimensions):
+        """Cells aggregated to the given dimensions, materialized on first use"""
+        key = frozenset(dimensions)
+        if key not in self._cuboids:
+            parent = self._cuboids[self._smallest_parent(key)]
+            self._cuboids[key] = _rollup(parent, [dim for dim in self.dimensions if dim in key])
+        return self._cuboids[key]
+
+    def materialize(self, hierarchies=HIERARCHIES):
+        """Pre-compute every combination of hierarchy levels, finest first"""
+        levels = [[hierarchy[:depth] for depth in range(len(hierarchy), -1, -1)] for hierarchy in hierarchies.values()]
+        for combination in product(*levels):
+            self.cuboid([dim for level in combination for dim in level if dim in self.dimensions])
+        return self
+
+    def _codes(self, dim, values):
+        if not isinstance(values, (list, tuple, set, frozenset, np.ndarray, pd.Index)):
+            values = [values]
+        codes = self.labels[dim].get_indexer(list(values))
+        return codes[codes >= 0]
+
+    def query(self, by=(), where=None):
+        """
+        sum/count/min/max/mean of the measure grouped by `by`, restricted to
+        where={dimension: value or list of values}.
+        """
+        by = [dim for dim in self.dimensions if dim in by]
+        where = where or {}
+        key = frozenset(by) | frozenset(where)
+        # an exact cuboid is reused; otherwise filter the smallest parent before aggregating
+        cells = self._cuboids[key] if key in self._cuboids else self._cuboids[self._smallest_parent(key)]
+
+        if where:
+            mask = np.ones(len(cells), dtype=bool)
+            for dim, values in where.items():
+                mask &= np.isin(cells[dim].to_numpy(), self._codes(dim, values))
+            cells = cells[mask]
+
+        result = _rollup(cells, by)
+        if by:
+            index = [self.labels[dim].take(result[dim].to_numpy()) for dim in by]
+            result.index = pd.MultiIndex.from_arrays(index, names=by) if len(by) > 1 else pd.Index(index[0], name=by[0])
+            result = result[MEASURES].sort_index()
+        else:
+            result.index = ['Total']
+        result['count'] = result['count'].astype('int64')
+        result['mean'] = result['sum'] / result['count']
+        return result
+
+    def slice(self, dimension, value, by=()):
+        """Fix one dimension to a single value"""
+        return self.query(by, {dimension: [value]})
+
+    def dice(self, where, by=()):
+        """Restrict several dimensions to value lists"""
+        return self.query(by, where)
+
+    def _hierarchy(self, dimension):
+        for levels in HIERARCHIES.values():
+            if dimension in levels:
+                return levels
+        return [dimension]
+
+    def drill_down(self, by, dimension, where=None):
+        """Add the level below dimension in its hierarchy to the grouping"""
+        levels = self._hierarchy(dimension)
+        position = levels.index(dimension)
+        if position + 1 >= len(levels):
+            raise ValueError(f"{dimension} is the lowest level of its hierarchy")
+        return self.query(list(by) + [levels[position + 1]], where)
+
+    def roll_up(self, by, dimension, where=None):
+        """Remove dimension and every level below it from the grouping"""
+        levels = self._hierarchy(dimension)
+        below = set(levels[levels.index(dimension):])
+        return self.query([dim for dim in by if dim not in below], where)
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 16:21:54 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import contextlib
+
+# %%
+
+ENABLED = False
+
+_records = []
+_lock = threading.Lock()
+_local = threading.local()
+_profiler = None
+_cprofile_threads = False
+# finished cProfile runs of worker threads, merged into the dump
+_thread_profiles = []
+
+# %%
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # no /proc: fall back to the lifetime peak (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def enable(cprofile=False):
+    """
+    Start recording spans, optionally with cProfile on the calling thread
+    and on every task run inside thread_profile() (the GUI's worker threads)
+    """
+    global ENABLED, _profiler, _cprofile_threads
+    ENABLED = True
+    if cprofile and _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+        _cprofile_threads = True
+
+
+def disable():
+    global ENABLED, _cprofile_threads
+    ENABLED = False
+    _cprofile_threads = False
+    if _profiler is not None:
+        _profiler.disable()
+
+
+def reset():
+    global _profiler
+    with _lock:
+        _records.clear()
+        _thread_profiles.clear()
+    _profiler = None
+
+
+@contextlib.contextmanager
+def thread_profile():
+    """
+    cProfile the enclosed block on the current thread while cProfile is
+    enabled; the result is merged into dump_cprofile. cProfile only sees the
+    thread it was enabled on, so tasks on worker threads need their own.
+    """
+    if not _cprofile_threads:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler is active (Python 3.12+ allows only one at a time)
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _lock:
+            _thread_profiles.append(profiler)
+
+
+def records():
+    """Finished spans as dicts: path, seconds, rows, memory_delta_mb, thread"""
+    with _lock:
+        return list(_records)
+
+# %%
+
+class span:
+    """
+    Context manager timing a block as a named span:
+
+        with profiling.span('read_data') as s:
+            df = ...
+            s.rows = len(df)
+
+    Spans nest per thread, so the recorded path shows where a block ran.
+    Does nothing but set attributes while profiling is disabled.
+    """
+    __slots__ = ('name', 'rows', '_start', '_rss', '_path')
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self._start = None
+
+    def __enter__(self):
+        if ENABLED:
+            stack = getattr(_local, 'stack', None)
+            if stack is None:
+                stack = _local.stack = []
+            stack.append(self.name)
+            self._path = tuple(stack)
+            self._rss = rss_bytes()
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is None:
+            return
+        seconds = time.perf_counter() - self._start
+        _local.stack.pop()
+        record = {
+            'path': self._path,
+            'seconds': seconds,
+            'rows': self.rows,
+            'memory_delta_mb': (rss_bytes() - self._rss) / 1e6,
+            'thread': threading.current_thread().name
+        }
+        with _lock:
+            _records.append(record)
+
+
+def profiled(name=None, rows=None):
+    """
+    Decorator recording every call as a span named name (default: the
+    function's qualified name). rows(*args, **kwargs) is called with the
+    function's arguments after the call and gives the rows it processed.
+    While profiling is disabled the wrapper only checks one flag.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with span(span_name) as s:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    s.rows = rows(*args, **kwargs)
+            return result
+        return wrapper
+    return decorator
+
+
+def frame_rows(obj, *args, **kwargs):
+    """rows callback for methods of objects holding their data in obj.df"""
+    df = getattr(obj, 'df', None)
+    return None if df is None else len(df)
+
+# %% output
+
+def summary():
+    """Per span path: calls, total and self seconds, rows and memory delta, in call order"""
+    table = {}
+    for record in records():
+        entry = table.setdefault(record['path'], {'calls': 0, 'seconds': 0.0, 'child_seconds': 0.0,
+                                                  'rows': 0, 'memory_delta_mb': 0.0})
+        entry['calls'] += 1
+        entry['seconds'] += record['seconds']
+        entry['rows'] += record['rows'] or 0
+        entry['memory_delta_mb'] += record['memory_delta_mb']
+    for path, entry in table.items():
+        if len(path) > 1 and path[:-1] in table:
+            table[path[:-1]]['child_seconds'] += entry['seconds']
+    for entry in table.values():
+        entry['self_seconds'] = max(entry['seconds'] - entry.pop('child_seconds'), 0.0)
+    return table
+
+
+def print_summary(file=None):
+    """Print the span breakdown as an indented tree"""
+    file = file or sys.stdout
+    table = summary()
+    if not table:
+        print("No profiling spans recorded", file=file)
+        return
+    print(f"{'span':<52}{'calls':>7}{'total s':>10}{'self s':>10}{'rows':>12}{'mem MB':>10}", file=file)
+    # parents print before their children: sort paths by the first-seen order of each prefix
+    first_seen = {}
+    for path in table:
+        for depth in range(1, len(path) + 1):
+            first_seen.setdefault(path[:depth], len(first_seen))
+    order = sorted(table, key=lambda path: [first_seen[path[:depth]] for depth in range(1, len(path) + 1)])
+    for path in order:
+        entry = table[path]
+        label = '  ' * (len(path) - 1) + path[-1]
+        print(f"{label:<52}{entry['calls']:>7}{entry['seconds']:>10.3f}{entry['self_seconds']:>10.3f}"
+              f"{entry['rows']:>12,}{entry['memory_delta_mb']:>10.1f}", file=file)
+
+
+def dump_collapsed(path):
+    """Write the spans as collapsed stacks ('a;b;c <microseconds>'), the input format of flamegraph.pl and speedscope"""
+    with open(path, 'w') as f:
+        for stack, entry in summary().items():
+            f.write(f"{';'.join(stack)} {int(entry['self_seconds'] * 1e6)}\n")
+
+
+def dump_cprofile(path):
+    """Write the cProfile statistics of all profiled threads (pstats format, e.g. for snakeviz or flameprof)"""
+    if _profiler is None:
+        raise RuntimeError("cProfile was not enabled, call profiling.enable(cprofile=True)")
+    stats = pstats.Stats(_profiler)
+    with _lock:
+        for profiler in _thread_profiles:
+            stats.add(profiler)
+    stats.dump_stats(path)
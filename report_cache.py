@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 12:05:11 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import json
+import glob
+import pickle
+import shutil
+import hashlib
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+# %%
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.sap_analytics_cache')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+INDEX_COLUMN = '__index__'
+
+# bump when the report layout changes, so stale entries are never served
+CACHE_VERSION = 2
+
+# %%
+
+# file -> (size, mtime_ns, digest), persisted so a restart does not rehash unchanged files
+FINGERPRINT_FILE = os.path.join(DEFAULT_CACHE_DIR, 'fingerprints.json')
+
+_fingerprints = None
+
+
+def _load_fingerprints():
+    global _fingerprints
+    if _fingerprints is None:
+        try:
+            with open(FINGERPRINT_FILE, encoding='utf-8') as f:
+                _fingerprints = {path: tuple(entry) for path, entry in json.load(f).items()}
+        except (OSError, ValueError):
+            _fingerprints = {}
+    return _fingerprints
+
+
+def _save_fingerprints():
+    """Write the memo atomically, dropping files that no longer exist"""
+    fingerprints = {path: entry for path, entry in _load_fingerprints().items() if os.path.exists(path)}
+    tmp_file = FINGERPRINT_FILE + '.tmp{}'.format(os.getpid())
+    try:
+        os.makedirs(os.path.dirname(FINGERPRINT_FILE), exist_ok=True)
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(fingerprints, f)
+        os.replace(tmp_file, FINGERPRINT_FILE)
+    except OSError:
+        # the memo only saves time, a read-only cache directory must not fail the analysis
+        pass
+
+
+def _file_digest(path, block_size):
+    """(digest, whether it had to be computed) of a single file"""
+    fingerprints = _load_fingerprints()
+    real_path = os.path.realpath(path)
+    stat = os.stat(real_path)
+    entry = fingerprints.get(real_path)
+    if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+        return entry[2], False
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(stat.st_size).encode('ascii'))
+    with open(real_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    fingerprints[real_path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return digest.hexdigest(), True
+
+
+def file_fingerprint(path, block_size=1024 * 1024):
+    """
+    Content fingerprint of a file or of all part files in a directory.
+
+    Every byte is streamed through blake2b, so any edit changes the key;
+    hashing runs at disk speed, far below the cost of parsing the file.
+    The digests are kept in FINGERPRINT_FILE, keyed by the real path, and
+    reused across runs as long as size and modification time are unchanged.
+    """
+    if not os.path.isdir(path):
+        fingerprint, computed = _file_digest(path, block_size)
+        if computed:
+            _save_fingerprints()
+        return fingerprint
+
+    digest = hashlib.blake2b(digest_size=16)
+    computed = False
+    for f in sorted(glob.glob(os.path.join(path, '**', '*'), recursive=True)):
+        if os.path.isfile(f):
+            part, part_computed = _file_digest(f, block_size)
+            digest.update(os.path.relpath(f, path).encode('utf-8'))
+            digest.update(part.encode('ascii'))
+            computed |= part_computed
+    if computed:
+        _save_fingerprints()
+    return digest.hexdigest()
+
+
+def cache_key(data_path, params):
+    """Key of a report set: content fingerprint of the input plus the analysis parameters"""
+    payload = json.dumps({'version': CACHE_VERSION, 'params': params}, sort_keys=True, default=str)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(file_fingerprint(data_path).encode('ascii'))
+    digest.update(payload.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def evict_lru(entries, max_bytes):
+    """Remove the least recently used of (last use, size in bytes, path) entries until the rest fits into max_bytes"""
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+
+# %%
+
+class ReportCache:
+    """
+    Size-bounded LRU cache of report dicts on disk.
+
+    DataFrames are stored as Arrow IPC (Feather) files when pyarrow is
+    available, everything else is pickled. The least recently used entries
+    are evicted once the cache grows beyond max_bytes.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    @staticmethod
+    def _write_frame(df, path):
+        index_info = {'name': df.index.name, 'freq': getattr(df.index, 'freqstr', None)}
+        if feather is None:
+            df.to_pickle(path + '.pkl')
+        else:
+            feather.write_feather(df.reset_index(names=INDEX_COLUMN), path + '.arrow')
+        return index_info
+
+    @staticmethod
+    def _read_frame(path, index_info):
+        if os.path.exists(path + '.pkl'):
+            return pd.read_pickle(path + '.pkl')
+        df = feather.read_feather(path + '.arrow').set_index(INDEX_COLUMN).rename_axis(index_info['name'])
+        if index_info['freq'] is not None:
+            df.index = pd.DatetimeIndex(df.index, freq=index_info['freq'])
+        return df
+
+    def get(self, key):
+        """Cached reports for key, or None"""
+        entry = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry, 'meta.pkl'), 'rb') as f:
+                meta = pickle.load(f)
+            reports = dict(meta['values'])
+            for name, index_info in meta['frames'].items():
+                reports[name] = self._read_frame(os.path.join(entry, name), index_info)
+        except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        os.utime(entry)  # mark as recently used
+        self.hits += 1
+        return {name: reports[name] for name in meta['order']}
+
+    def put(self, key, reports):
+        """Store a report dict and evict old entries beyond max_bytes"""
+        entry = self._entry_dir(key)
+        tmp_entry = entry + '.tmp{}'.format(os.getpid())
+        os.makedirs(tmp_entry, exist_ok=True)
+        meta = {'order': list(reports), 'values': {}, 'frames': {}}
+        for name, value in reports.items():
+            if isinstance(value, pd.DataFrame):
+                meta['frames'][name] = self._write_frame(value, os.path.join(tmp_entry, name))
+            else:
+                meta['values'][name] = value
+        with open(os.path.join(tmp_entry, 'meta.pkl'), 'wb') as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # another process stored the same key first
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        """Cached reports for key, computing and storing them on a miss"""
+        reports = self.get(key)
+        if reports is None:
+            reports = compute()
+            self.put(key, reports)
+        return reports
+
+    def _entries(self):
+        """(last use, size in bytes, path) of every complete entry"""
+        entries = []
+        for entry in glob.glob(os.path.join(self.cache_dir, '*')):
+            if not os.path.isdir(entry) or '.tmp' in os.path.basename(entry):
+                continue
+            size = sum(os.path.getsize(f) for f in glob.glob(os.path.join(entry, '*')))
+            entries.append((os.path.getmtime(entry), size, entry))
+        return sorted(entries)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits into max_bytes"""
+        evict_lru(self._entries(), self.max_bytes)
+
+    def clear(self):
+        for _, _, entry in self._entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def stats(self):
+        """Hit/miss counters of this instance and the current cache size"""
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes
+        }
@@ -2,15 +2,60 @@
 # %% imports
 
 import sys
+import functools
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                               QLabel, QPushButton, QFileDialog, QTabWidget, QTextEdit, 
-                              QComboBox, QTableWidget, QTableWidgetItem, QHeaderView)
-from matplotlib.figure import Figure
+                              QComboBox, QTableView, QHeaderView, QProgressBar)
+from PySide6.QtCore import QThreadPool, Qt
 import pandas as pd
 import io
-import data_analysis
+import profiling
+import workers
 
-from canvas import MplCanvas
+from table_model import DataFrameModel
+
+# matplotlib (canvas), data_analysis and report_cache are imported on first
+# use, so the window shows without waiting for them
+
+ABC_COLORS = {'A': 'green', 'B': 'orange', 'C': 'red'}
+
+# %% background tasks, run on the thread pool by workers.TaskWorker
+
+def load_task(file_path, cache):
+    """
+    Yields the cached reports of an unchanged file without parsing it,
+    otherwise parses the file into an analyzer.
+    """
+    import data_analysis
+    reports = cache.get(data_analysis.report_key(file_path, engine='methods'))
+    if reports is not None:
+        yield from reports.items()
+    else:
+        yield 'analyzer', data_analysis.SAPDataAnalyzer(file_path)
+
+
+def analysis_task(file_path, analyzer, cache):
+    """Yields the reports one by one, straight from the cache if the file is unchanged"""
+    import data_analysis
+    if analyzer is None:
+        # the file was answered from the cache when it was loaded, the anomaly scan needs its rows
+        analyzer = data_analysis.SAPDataAnalyzer(file_path)
+        yield 'analyzer', analyzer
+    
+    key = data_analysis.report_key(file_path, engine='methods')
+    reports = cache.get(key)
+    if reports is not None:
+        yield from reports.items()
+    else:
+        reports = {}
+        for name, report in analyzer.iter_reports():
+            reports[name] = report
+            yield name, report
+        cache.put(key, reports)
+    
+    # the anomaly scan reads the loaded rows themselves, it is not cached
+    import anomalies
+    yield 'anomalies', anomalies.top_anomalies(analyzer.detect_anomalies())
 
 # %%
 
@@ -21,10 +66,25 @@ class AnalysisApp(QMainWindow):
         self.setGeometry(100, 100, 1200, 800)
         
         self.analyzer = None
+        self.file_path = None
         self.reports = None
+        self.report_cache = None
+        
+        self.thread_pool = QThreadPool.globalInstance()
+        self.worker = None
+        self.worker_error = ""
         
         self.init_ui()
         
+        # tabs that are drawn as soon as their report arrives
+        self.report_renderers = {
+            'basic_statistics': self.display_summary,
+            'time_series': self.plot_time_series,
+            'cost_centers': self.plot_cost_centers,
+            'material_analysis': self.plot_material_analysis,
+            'anomalies': self.display_anomalies
+        }
+        
     def init_ui(self):
         """Initialisiert die Benutzeroberfläche"""
         main_widget = QWidget()
@@ -43,6 +103,17 @@ class AnalysisApp(QMainWindow):
         analyze_button = QPushButton("Analyse durchführen")
         analyze_button.clicked.connect(self.run_analysis)
         
+        # Progress of background work
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        self.progress_bar.setFormat("Bereit")
+        self.cancel_button = QPushButton("Abbrechen")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_worker)
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_button)
+        
         # Tabs for diverse Analysen
         self.tabs = QTabWidget()
         
@@ -57,32 +128,41 @@ class AnalysisApp(QMainWindow):
         
         # Time-series Tab
         self.time_series_tab = QWidget()
-        self.time_series_plot = MplCanvas(self.time_series_tab, width=10, height=6, dpi=100)
-        time_series_layout = QVBoxLayout()
-        time_series_layout.addWidget(self.time_series_plot)
-        self.time_series_tab.setLayout(time_series_layout)
+        self.time_series_plot = None
+        self.time_series_tab.setLayout(QVBoxLayout())
         self.tabs.addTab(self.time_series_tab, "Zeitreihen")
         
         # Cost Tab
         self.cost_center_tab = QWidget()
-        self.cost_center_plot = MplCanvas(self.cost_center_tab, width=10, height=6, dpi=100)
-        cost_center_layout = QVBoxLayout()
-        cost_center_layout.addWidget(self.cost_center_plot)
-        self.cost_center_tab.setLayout(cost_center_layout)
+        self.cost_center_plot = None
+        self.cost_center_tab.setLayout(QVBoxLayout())
         self.tabs.addTab(self.cost_center_tab, "Kostenstellen")
         
         # Materialanalysis Tab
         self.material_tab = QWidget()
-        self.material_plot = MplCanvas(self.material_tab, width=10, height=6, dpi=100)
-        material_layout = QVBoxLayout()
-        material_layout.addWidget(self.material_plot)
-        self.material_tab.setLayout(material_layout)
+        self.material_plot = None
+        self.material_tab.setLayout(QVBoxLayout())
         self.tabs.addTab(self.material_tab, "Materialanalyse")
         
+        # Anomalies Tab
+        self.anomaly_tab = QWidget()
+        self.anomaly_model = DataFrameModel()
+        self.anomaly_table = QTableView()
+        self.anomaly_table.setModel(self.anomaly_model)
+        self.anomaly_table.setSortingEnabled(True)
+        self.anomaly_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        anomaly_layout = QVBoxLayout()
+        anomaly_layout.addWidget(self.anomaly_table)
+        self.anomaly_tab.setLayout(anomaly_layout)
+        self.tabs.addTab(self.anomaly_tab, "Anomalien")
+        
         # Tabular view
         self.table_tab = QWidget()
-        self.data_table = QTableWidget()
-        self.data_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table_model = DataFrameModel()
+        self.data_table = QTableView()
+        self.data_table.setModel(self.table_model)
+        self.data_table.setSortingEnabled(True)
+        self.data_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         table_layout = QVBoxLayout()
         table_layout.addWidget(self.data_table)
         self.table_tab.setLayout(table_layout)
@@ -94,13 +174,15 @@ class AnalysisApp(QMainWindow):
             "Zeitreihenanalyse",
             "Kostenstellenanalyse",
             "Materialanalyse",
-            "Dokumenttypenanalyse"
+            "Dokumenttypenanalyse",
+            "Anomalien"
         ])
         self.report_combo.currentTextChanged.connect(self.update_report_view)
         
         # Mainlayout 
         main_layout.addLayout(file_layout)
         main_layout.addWidget(analyze_button)
+        main_layout.addLayout(progress_layout)
         main_layout.addWidget(QLabel("Bericht auswählen:"))
         main_layout.addWidget(self.report_combo)
         main_layout.addWidget(self.tabs)
@@ -110,53 +192,123 @@ class AnalysisApp(QMainWindow):
         
     def load_data(self):
         """Lädt die Daten aus einer CSV-Datei"""
-        file_path, _ = QFileDialog.getOpenFileName(self, "Daten auswählen", "", "CSV Files (*.csv)")
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Daten auswählen", "",
+            "SAP-Daten (*.csv *.parquet *.feather *.arrow meta.json);;CSV Files (*.csv);;Parquet/Feather (*.parquet *.feather *.arrow);;"
+            "Spaltenspeicher (meta.json)")
         if file_path:
             self.file_label.setText(file_path)
-            try:
-                self.analyzer = data_analysis.SAPDataAnalyzer(file_path)
-                self.show_data_preview(file_path)
-            except Exception as e:
-                self.summary_text.setText(f"Fehler beim Laden der Daten: {str(e)}")
+            self.file_path = file_path
+            self.analyzer = None
+            self.reports = {}
+            self.start_worker(load_task, file_path, self.cache(), total=0, message="Daten werden geladen...",
+                              error="Fehler beim Laden der Daten")
+    
+    def cache(self):
+        """Berichtscache; report_cache wird erst bei der ersten Verwendung geladen"""
+        if self.report_cache is None:
+            import report_cache
+            self.report_cache = report_cache.ReportCache()
+        return self.report_cache
+    
+    def start_worker(self, task, *args, total=0, message="", error=""):
+        """Startet eine Hintergrundaufgabe; eine laufende Aufgabe wird abgebrochen"""
+        self.cancel_worker()
+        self.worker = worker = workers.TaskWorker(task, *args)
+        # every slot learns which worker sent the signal: a cancelled worker's
+        # already queued signals still arrive and must not touch the new state
+        worker.signals.partial.connect(functools.partial(self.on_partial_result, worker))
+        worker.signals.progress.connect(functools.partial(self.on_progress, worker))
+        worker.signals.error.connect(functools.partial(self.on_worker_error, worker))
+        worker.signals.finished.connect(functools.partial(self.on_worker_finished, worker))
+        self.worker_error = error
+        
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat(message)
+        self.cancel_button.setEnabled(True)
+        self.thread_pool.start(self.worker)
+    
+    def cancel_worker(self):
+        """Bricht die laufende Hintergrundaufgabe ab"""
+        if self.worker is None:
+            return
+        self.worker.cancel()
+        self.worker = None
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("Abgebrochen")
+        self.cancel_button.setEnabled(False)
+    
+    def on_partial_result(self, worker, name, value):
+        """Übernimmt ein Teilergebnis und zeichnet den zugehörigen Tab"""
+        if worker is not self.worker:
+            return
+        if name == 'analyzer':
+            self.analyzer = value
+            self.show_data_preview()
+            return
+        self.reports[name] = value
+        if name in self.report_renderers:
+            self.report_renderers[name]()
+    
+    def on_progress(self, worker, done, name):
+        if worker is self.worker and self.progress_bar.maximum() > 0:
+            self.progress_bar.setValue(done)
+            self.progress_bar.setFormat(f"%v/%m Berichte ({name})")
     
-    def show_data_preview(self, file_path):
+    def on_worker_error(self, worker, message):
+        if worker is not self.worker:
+            return
+        self.worker = None
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setFormat("Fehler")
+        self.cancel_button.setEnabled(False)
+        self.summary_text.setText(f"{self.worker_error}: {message}")
+    
+    def on_worker_finished(self, worker):
+        if worker is not self.worker:
+            return
+        self.worker = None
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(1)
+        self.progress_bar.setFormat("Fertig")
+        self.cancel_button.setEnabled(False)
+    
+    def closeEvent(self, event):
+        self.cancel_worker()
+        super().closeEvent(event)
+    
+    def show_data_preview(self):
         """Zeigt eine Vorschau der geladenen Daten"""
-        df = pd.read_csv(file_path)
-        self.display_data_table(df.head(20))
+        self.display_data_table(self.analyzer.frame(), self.analyzer.formatters())
         
-    def display_data_table(self, data):
-        """Zeigt Daten in der Tabellenansicht"""
+    @profiling.profiled(rows=lambda self, data, formatters=None: len(data))
+    def display_data_table(self, data, formatters=None):
+        """Zeigt Daten in der Tabellenansicht; formatters wandeln geparste Spalten (Belegnummern) zurück in Text"""
         if isinstance(data, pd.DataFrame):
             df = data
         else:
             df = pd.DataFrame(data)
             
-        self.data_table.setRowCount(df.shape[0])
-        self.data_table.setColumnCount(df.shape[1])
-        self.data_table.setHorizontalHeaderLabels(df.columns)
-        
-        for row in range(df.shape[0]):
-            for col in range(df.shape[1]):
-                item = QTableWidgetItem(str(df.iloc[row, col]))
-                self.data_table.setItem(row, col, item)
-        
-        self.data_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # the model formats only the visible cells, so the whole frame can be browsed
+        self.data_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table_model.set_frame(df, formatters)
     
     def run_analysis(self):
         """Führt die Analyse durch und zeigt die Ergebnisse"""
-        if self.analyzer is None:
+        if self.file_path is None:
             self.summary_text.setText("Bitte zuerst Daten laden!")
             return
-            
-        try:
-            self.reports = self.analyzer.generate_all_reports()
-            self.display_summary()
-            self.plot_time_series()
-            self.plot_cost_centers()
-            self.plot_material_analysis()
-        except Exception as e:
-            self.summary_text.setText(f"Fehler bei der Analyse: {str(e)}")
+        
+        import data_analysis
+        self.reports = {}
+        # without an analyzer the task parses the file first and yields it as an extra step
+        self.start_worker(analysis_task, self.file_path, self.analyzer, self.cache(),
+                          total=len(data_analysis.SAPDataAnalyzer.REPORT_COLUMNS) + 1 + (self.analyzer is None),
+                          message="Analyse läuft...", error="Fehler bei der Analyse")
     
+    @profiling.profiled()
     def display_summary(self):
         """Zeigt die Analyse-Zusammenfassung"""
         if not self.reports:
@@ -183,67 +335,72 @@ class AnalysisApp(QMainWindow):
         
         self.summary_text.setText(text.getvalue())
     
+    def chart(self, name):
+        """Diagramm eines Tabs; matplotlib wird erst beim ersten Diagramm geladen"""
+        canvas = getattr(self, name)
+        if canvas is None:
+            from canvas import MplCanvas
+            tab = {'time_series_plot': self.time_series_tab, 'cost_center_plot': self.cost_center_tab,
+                   'material_plot': self.material_tab}[name]
+            canvas = MplCanvas(tab, width=10, height=6, dpi=100)
+            tab.layout().addWidget(canvas)
+            setattr(self, name, canvas)
+        return canvas
+    
+    @profiling.profiled()
     def plot_time_series(self):
         """Zeigt die Zeitreihenanalyse"""
         if not self.reports:
             return
-            
-        fig = Figure(figsize=(10, 6))
-        ax = fig.add_subplot(111)
         
         ts_data = self.reports['time_series']
-        ax.plot(ts_data.index, ts_data['sum'], label='Monatlicher Gesamtbetrag')
+        canvas = self.chart('time_series_plot')
+        canvas.set_line('sum', ts_data.index, ts_data['sum'], label='Monatlicher Gesamtbetrag')
         if 'rolling_avg' in ts_data.columns:
-            ax.plot(ts_data.index, ts_data['rolling_avg'], label='Gleitender Durchschnitt (3 Monate)')
-        ax.set_title('Monatliche Beträge über die Zeit')
-        ax.set_xlabel('Datum')
-        ax.set_ylabel('Betrag (EUR)')
-        ax.legend()
-        ax.grid(True)
-        
-        self.time_series_plot.figure = fig
-        self.time_series_plot.draw()
+            canvas.set_line('rolling_avg', ts_data.index, ts_data['rolling_avg'],
+                            label='Gleitender Durchschnitt (3 Monate)')
+        else:
+            canvas.clear_artists(keep=['sum'])
+        canvas.set_labels('Monatliche Beträge über die Zeit', 'Datum', 'Betrag (EUR)', legend=True, grid=True)
+        canvas.refresh()
     
+    @profiling.profiled()
     def plot_cost_centers(self):
         """Zeigt die Kostenstellenanalyse"""
         if not self.reports:
             return
-            
-        fig = Figure(figsize=(10, 6))
-        ax = fig.add_subplot(111)
         
         cc_data = self.reports['cost_centers'].head(10)
-        ax.bar(cc_data.index, cc_data['sum'])
-        ax.set_title('Top 10 Kostenstellen nach Gesamtbetrag')
-        ax.set_xlabel('Kostenstelle')
-        ax.set_ylabel('Gesamtbetrag (EUR)')
-        
-        self.cost_center_plot.figure = fig
-        self.cost_center_plot.draw()
+        canvas = self.chart('cost_center_plot')
+        canvas.set_bars('top', cc_data.index, cc_data['sum'])
+        canvas.set_labels('Top 10 Kostenstellen nach Gesamtbetrag', 'Kostenstelle', 'Gesamtbetrag (EUR)')
+        canvas.refresh()
     
+    @profiling.profiled()
     def plot_material_analysis(self):
         """Zeigt die Materialanalyse"""
         if not self.reports:
             return
-            
-        fig = Figure(figsize=(10, 6))
-        ax = fig.add_subplot(111)
         
-        mat_data = self.reports['material_analysis']
-        colors = {'A': 'green', 'B': 'orange', 'C': 'red'}
-        
-        for abc_class, color in colors.items():
-            subset = mat_data[mat_data['ABC_Class'] == abc_class]
-            ax.scatter(subset.index, subset['Amount'], label=f'Klasse {abc_class}', color=color)
-        
-        ax.set_title('ABC-Analyse der Materialien')
-        ax.set_xlabel('Materialnummer')
-        ax.set_ylabel('Gesamtbetrag (EUR)')
-        ax.legend()
-        ax.grid(True)
+        import numpy as np
+        from matplotlib.lines import Line2D
         
-        self.material_plot.figure = fig
-        self.material_plot.draw()
+        mat_data = self.reports['material_analysis']
+        canvas = self.chart('material_plot')
+        # one scatter call: integer x positions, colour looked up per point
+        colors = mat_data['ABC_Class'].map(ABC_COLORS).fillna('gray').to_numpy()
+        canvas.set_scatter('materials', np.arange(len(mat_data)), mat_data['Amount'], colors)
+        canvas.set_tick_formatter(mat_data.index)
+        canvas.set_labels('ABC-Analyse der Materialien', 'Materialnummer', 'Gesamtbetrag (EUR)',
+                          legend=[Line2D([], [], marker='o', linestyle='', color=color, label=f'Klasse {abc_class}')
+                                  for abc_class, color in ABC_COLORS.items()], grid=True)
+        canvas.refresh()
+    
+    @profiling.profiled()
+    def display_anomalies(self):
+        """Listet die stärksten Anomalien je Art (Buchungen, Kombinationen, Duplikate)"""
+        self.anomaly_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.anomaly_model.set_frame(self.reports['anomalies'])
     
     def update_report_view(self, report_name):
         """Aktualisiert die Ansicht basierend auf dem ausgewählten Report"""
@@ -256,7 +413,9 @@ class AnalysisApp(QMainWindow):
             self.tabs.setCurrentWidget(self.cost_center_tab)
         elif report_name == "Materialanalyse":
             self.tabs.setCurrentWidget(self.material_tab)
-        elif report_name == "Dokumenttypenanalyse":
+        elif report_name == "Anomalien":
+            self.tabs.setCurrentWidget(self.anomaly_tab)
+        elif report_name == "Dokumenttypenanalyse" and 'document_types' in self.reports:
             self.display_data_table(self.reports['document_types'])
 
 # %%
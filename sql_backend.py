@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 15:10:37 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+import aggregates
+import data_storage
+from data_analysis import SAPDataAnalyzer
+
+# %%
+
+CSV_TYPES = {'Quantity': 'DOUBLE', 'Amount': 'DOUBLE', 'PostingDate': 'DATE',
+             'FiscalYear': 'SMALLINT', 'FiscalPeriod': 'SMALLINT'}
+
+
+def _require_duckdb():
+    if duckdb is None:
+        raise ImportError("The SQL backend needs duckdb (pip install duckdb)")
+
+
+def _quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _source_sql(data_path, filters=None):
+    """Table function that scans data_path in place"""
+    fmt = data_storage.storage_format(data_path)
+    if fmt == 'csv':
+        files = data_storage._csv_files(data_path, filters)
+        types = '{' + ', '.join(f"{_quote(k)}: {_quote(v)}" for k, v in CSV_TYPES.items()) + '}'
+        return f"read_csv([{', '.join(_quote(f) for f in files)}], header=true, types={types})"
+    if fmt == 'parquet':
+        if os.path.isdir(data_path):
+            pattern = os.path.join(data_path, '**', '*.parquet')
+            return f"read_parquet({_quote(pattern)}, hive_partitioning=true, hive_types={{'FiscalYear': SMALLINT, 'FiscalPeriod': SMALLINT}})"
+        return f"read_parquet({_quote(data_path)})"
+    return None
+
+# %%
+
+class DuckDBSAPAnalyzer:
+    """
+    SAPDataAnalyzer backend that runs every report as SQL in DuckDB.
+
+    The files are queried in place: nothing is loaded into pandas except the
+    small report tables. DuckDB scans and aggregates on all cores and spills
+    large aggregates to temp_directory once memory_limit is reached. Feather
+    files are scanned through an Arrow dataset, CSV and Parquet natively.
+    CSV input is parsed once into a temporary DuckDB table (materialize),
+    columnar input is scanned directly by every report query.
+    """
+    REPORT_COLUMNS = SAPDataAnalyzer.REPORT_COLUMNS
+    REPORT_METHODS = SAPDataAnalyzer.REPORT_METHODS
+
+    def __init__(self, data_path, columns=None, filters=None, threads=None, memory_limit=None, temp_directory=None,
+                 materialize=None):
+        _require_duckdb()
+        config = {}
+        if threads is not None:
+            config['threads'] = threads
+        if memory_limit is not None:
+            config['memory_limit'] = memory_limit
+        if temp_directory is not None:
+            config['temp_directory'] = temp_directory
+        self.con = duckdb.connect(':memory:', config=config)
+
+        filters = data_storage.normalize_filters(filters)
+        source = _source_sql(data_path, filters)
+        if source is None and data_storage.storage_format(data_path) == 'columns':
+            # memory-mapped column store: DuckDB scans the zero-copy frame
+            self.con.register('ledger_arrow', data_storage.read_data(data_path))
+            source = 'ledger_arrow'
+        elif source is None:
+            self.con.register('ledger_arrow', data_storage._dataset(data_path))
+            source = 'ledger_arrow'
+        self.con.execute(f"CREATE VIEW ledger_source AS SELECT * FROM {source}")
+
+        available = [row[0] for row in self.con.execute("DESCRIBE ledger_source").fetchall()]
+        self.columns = [c for c in available if columns is None or c in columns]
+        self.where, self.params = self._where(filters)
+
+        if materialize is None:
+            materialize = data_storage.storage_format(data_path) == 'csv'
+        if materialize:
+            # parse once into DuckDB's compressed columnar storage instead of once per report
+            wanted = {column for names in self.REPORT_COLUMNS.values() for column in names}
+            projection = ', '.join(f'"{c}"' for c in self.columns if c in wanted)
+            self.con.execute(f"CREATE TEMP TABLE ledger AS SELECT {projection} FROM ledger_source{self.where}", self.params)
+            self.con.execute("DROP VIEW ledger_source")
+            self.con.execute("ALTER TABLE ledger RENAME TO ledger_source")
+            self.where, self.params = '', []
+
+    @staticmethod
+    def _where(filters):
+        """WHERE clause and parameters of normalized filters"""
+        clauses, params = [], []
+        for column, (kind, value) in filters.items():
+            if kind == 'range':
+                start, end = value
+                if start is not None:
+                    clauses.append(f'"{column}" >= ?')
+                    params.append(start.to_pydatetime())
+                if end is not None:
+                    clauses.append(f'"{column}" <= ?')
+                    params.append(end.to_pydatetime())
+            else:
+                clauses.append(f'"{column}" IN ({", ".join("?" * len(value))})')
+                params.extend(value)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, select, tail=''):
+        """Run SELECT select FROM the filtered ledger, returning a DataFrame"""
+        sql = f"SELECT {select} FROM ledger_source{self.where} {tail}"
+        return self.con.execute(sql, self.params).df()
+
+    def _group(self, column, select, having=''):
+        return self.query(f'"{column}", {select}', f'GROUP BY "{column}" HAVING "{column}" IS NOT NULL {having}').set_index(column)
+
+    def basic_statistics(self):
+        """Basic statistics"""
+        numeric = ', '.join(
+            f'avg("{f}"), median("{f}"), stddev_samp("{f}"), min("{f}"), max("{f}")' for f in aggregates.NUMERIC_FIELDS
+        )
+        row = self.query(f'count(*), min("PostingDate"), max("PostingDate"), {numeric}').iloc[0].tolist()
+        stats = {
+            'total_records': int(row[0]),
+            'time_period': {'start': pd.Timestamp(row[1]), 'end': pd.Timestamp(row[2])},
+            'numeric_fields': {},
+            'categorical_counts': {}
+        }
+        for i, field in enumerate(aggregates.NUMERIC_FIELDS):
+            values = [np.nan if pd.isna(v) else float(v) for v in row[3 + 5 * i:8 + 5 * i]]
+            stats['numeric_fields'][field] = dict(zip(['mean', 'median', 'std', 'min', 'max'], values))
+        for field in aggregates.COUNT_FIELDS:
+            counts = self._group(field, 'count(*) AS count', 'ORDER BY count DESC')['count']
+            stats['categorical_counts'][field] = counts.astype('int64').to_dict()
+        return stats
+
+    def time_series_analysis(self):
+        """Time series analysis of amounts"""
+        table = self.query(
+            'last_day("PostingDate") AS month, coalesce(sum("Amount"), 0) AS sum, count("Amount") AS count',
+            'GROUP BY month HAVING month IS NOT NULL ORDER BY month'
+        )
+        table = table.set_index(pd.DatetimeIndex(table.pop('month')))
+        full_range = pd.date_range(table.index.min(), table.index.max(), freq=aggregates.TIME_SERIES_FREQ, name='PostingDate')
+        monthly = table.reindex(full_range, fill_value=0)
+        monthly = monthly.assign(mean=monthly['sum'] / monthly['count'])[['sum', 'mean', 'count']]
+        monthly['count'] = monthly['count'].astype('int64')
+        return aggregates.monthly_trend(monthly)
+
+    def _share_report(self, field):
+        return aggregates.share_table(self._group(field, 'coalesce(sum("Amount"), 0) AS sum, count("Amount") AS count'))
+
+    def cost_center_analysis(self):
+        """Cost center analysis"""
+        return self._share_report('CostCenter')
+
+    def material_analysis(self):
+        """Material valuation (ABC analysis)"""
+        return aggregates.abc_classification(self._group('Material', 'coalesce(sum("Amount"), 0) AS "Amount"'))
+
+    def correlation_analysis(self):
+        """Correlation analysis between quantity and amount"""
+        r = float(self.query('corr("Quantity", "Amount")').iloc[0, 0])
+        fields = aggregates.NUMERIC_FIELDS
+        return pd.DataFrame([[1.0, r], [r, 1.0]], index=fields, columns=fields)
+
+    def document_type_analysis(self):
+        """Document type analysis"""
+        return self._share_report('DocumentType')
+
+    def iter_reports(self):
+        """Yield (name, report) of every report whose columns are available, one at a time"""
+        for name, method in self.REPORT_METHODS.items():
+            if all(column in self.columns for column in self.REPORT_COLUMNS[name]):
+                yield name, getattr(self, method)()
+
+    def generate_all_reports(self, engine='sql'):
+        """Generate all analysis reports whose columns are available"""
+        return dict(self.iter_reports())
+
+    def close(self):
+        self.con.close()
+
+# %% parity with the pandas backend
+
+def _compare_values(name, expected, actual, rtol):
+    if isinstance(expected, dict):
+        if set(expected) != set(actual):
+            return [f"{name}: keys differ ({sorted(map(str, expected))} vs {sorted(map(str, actual))})"]
+        return [m for key in expected for m in _compare_values(f"{name}.{key}", expected[key], actual[key], rtol)]
+    if isinstance(expected, pd.DataFrame):
+        if list(expected.columns) != list(actual.columns) or list(expected.index) != list(actual.index):
+            return [f"{name}: layout differs"]
+        return [m for column in expected.columns
+                for m in _compare_values(f"{name}.{column}", expected[column].to_numpy(), actual[column].to_numpy(), rtol)]
+    expected, actual = np.asarray(expected), np.asarray(actual)
+    if expected.dtype.kind in 'fi' and actual.dtype.kind in 'fi':
+        if not np.allclose(expected.astype(float), actual.astype(float), rtol=rtol, atol=0, equal_nan=True):
+            return [f"{name}: {expected} != {actual}"]
+    elif not np.array_equal(expected, actual):
+        return [f"{name}: {expected} != {actual}"]
+    return []
+
+
+def compare_reports(expected, actual, rtol=1e-9):
+    """List of differences between two report dicts, empty when they match within rtol"""
+    if list(expected) != list(actual):
+        return [f"reports differ: {list(expected)} vs {list(actual)}"]
+    return [m for name in expected for m in _compare_values(name, expected[name], actual[name], rtol)]
+
+
+def check_parity(data_path, filters=None, rtol=1e-9):
+    """Run the pandas and the DuckDB backend on data_path and compare their reports"""
+    expected = SAPDataAnalyzer(data_path, filters=filters).generate_all_reports(engine='methods')
+    analyzer = DuckDBSAPAnalyzer(data_path, filters=filters)
+    try:
+        return compare_reports(expected, analyzer.generate_all_reports(), rtol)
+    finally:
+        analyzer.close()
+
+# %%
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the DuckDB backend against the pandas backend")
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--rtol', type=float, default=1e-9)
+    args = parser.parse_args()
+    failed = False
+    for path in args.paths:
+        differences = check_parity(path, rtol=args.rtol)
+        print(f"{path}: {'OK' if not differences else 'MISMATCH'}")
+        for difference in differences:
+            print("  " + difference)
+        failed = failed or bool(differences)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 14:02:51 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pandas as pd
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+# %%
+
+class DataFrameModel(QAbstractTableModel):
+    """
+    Read-only Qt table model backed directly by a DataFrame.
+
+    Nothing is copied into Qt items: a cell is formatted from the column
+    array only when the view paints it. Rows are handed to the view in
+    batches through fetchMore, and sorting is done by pandas as a row
+    permutation, so the frame itself is never reordered or copied.
+    """
+    def __init__(self, df=None, batch_size=10_000, parent=None):
+        super().__init__(parent)
+        self.batch_size = batch_size
+        self.set_frame(pd.DataFrame() if df is None else df)
+
+    def set_frame(self, df, formatters=None):
+        """Show another DataFrame; formatters maps column names to a function turning a value into its text"""
+        self.beginResetModel()
+        self._df = df
+        self._columns = [df.iloc[:, i].array for i in range(df.shape[1])]
+        self._formatters = [(formatters or {}).get(name, str) for name in df.columns]
+        self._numeric = [pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes]
+        self._order = None
+        self._loaded = min(len(df), self.batch_size)
+        self.endResetModel()
+
+    def _row(self, row):
+        return row if self._order is None else self._order[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._df)
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(self.batch_size, len(self._df) - self._loaded)
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self._formatters[index.column()](self._columns[index.column()][self._row(index.row())])
+        if role == Qt.TextAlignmentRole and self._numeric[index.column()]:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return str(self._df.columns[section])
+        return str(self._df.index[self._row(section)])
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Sort by a column with pandas; only the row permutation is kept"""
+        if self._df.empty:
+            return
+        self.layoutAboutToBeChanged.emit()
+        if column < 0:
+            # no sort column: back to the frame's own order
+            self._order = None
+            self.layoutChanged.emit()
+            return
+        values = self._df.iloc[:, column].reset_index(drop=True)
+        ordered = values.sort_values(ascending=order == Qt.AscendingOrder, kind='stable', na_position='last')
+        self._order = ordered.index.to_numpy(dtype=np.int64)
+        self.layoutChanged.emit()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:48:22 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import aggregates
+import data_generator
+import data_storage
+from data_analysis import SAPDataAnalyzer, StreamingSAPDataAnalyzer
+
+# %%
+
+ROWS = 30_000
+SEED = 3
+ALPHA = 0.005
+
+
+@pytest.fixture(scope='module')
+def csv_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('ledger') / 'ledger.csv')
+    data_generator.save_data(data_generator.generate_sap_like_data(ROWS, seed=SEED), path, verbose=False)
+    return path
+
+
+def chunks(path, chunksize):
+    return list(data_storage.iter_chunks(path, StreamingSAPDataAnalyzer.COLUMNS, chunksize=chunksize))
+
+
+def assert_reports_close(expected, actual, rtol=1e-9, median_rtol=1e-9):
+    """Same report tables and statistics; medians within median_rtol"""
+    for name in ['time_series', 'cost_centers', 'material_analysis', 'document_types', 'correlation']:
+        left, right = expected[name], actual[name]
+        assert list(left.columns) == list(right.columns), name
+        assert list(map(str, left.index)) == list(map(str, right.index)), name
+        for column in left.columns:
+            if left[column].dtype.kind in 'fi':
+                np.testing.assert_allclose(left[column].to_numpy(float), right[column].to_numpy(float),
+                                           rtol=rtol, err_msg=f'{name}.{column}')
+            else:
+                assert (left[column].to_numpy() == right[column].to_numpy()).all(), f'{name}.{column}'
+    left, right = expected['basic_statistics'], actual['basic_statistics']
+    assert left['total_records'] == right['total_records']
+    assert left['time_period'] == right['time_period']
+    assert left['categorical_counts'] == right['categorical_counts']
+    for field, statistics in left['numeric_fields'].items():
+        for statistic, value in statistics.items():
+            np.testing.assert_allclose(right['numeric_fields'][field][statistic], value,
+                                       rtol=median_rtol if statistic == 'median' else rtol,
+                                       err_msg=f'{field}.{statistic}')
+
+# %% accumulators
+
+def test_moments_match_numpy():
+    rng = np.random.default_rng(0)
+    values = rng.normal(1e6, 250.0, 10_001)
+    values[::97] = np.nan
+    moments = aggregates.Moments()
+    for part in np.array_split(values, [1, 10, 3_000, 3_001]):
+        moments.update(part)
+    valid = values[~np.isnan(values)]
+    assert moments.count == len(valid)
+    np.testing.assert_allclose(moments.mean, valid.mean(), rtol=1e-12)
+    np.testing.assert_allclose(moments.std, valid.std(ddof=1), rtol=1e-9)
+    assert (moments.min, moments.max) == (valid.min(), valid.max())
+
+
+def test_comoments_match_pandas():
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=5_000)
+    y = 0.3 * x + rng.normal(size=5_000)
+    x[::50] = np.nan
+    y[7::61] = np.nan
+    left, right = aggregates.Comoments(), aggregates.Comoments()
+    left.update(x[:1_234], y[:1_234])
+    right.update(x[1_234:], y[1_234:])
+    left.merge(right)
+    np.testing.assert_allclose(left.correlation, pd.Series(x).corr(pd.Series(y)), rtol=1e-9)
+
+
+@pytest.mark.parametrize('values', [
+    np.random.default_rng(2).lognormal(8, 1.5, 20_001),
+    np.random.default_rng(3).normal(0, 1_000, 20_001),
+    np.concatenate([np.zeros(5_000), np.random.default_rng(4).normal(-50, 10, 5_000)])
+])
+def test_sketch_quantiles_within_alpha(values):
+    sketch = aggregates.QuantileSketch(ALPHA)
+    for part in np.array_split(values, 7):
+        sketch.update(part)
+    for q in (0.05, 0.25, 0.5, 0.75, 0.95):
+        true = np.quantile(values, q, method='lower')
+        assert abs(sketch.quantile(q) - true) <= ALPHA * abs(true) * (1 + 1e-9), q
+
+# %% report states
+
+def test_streaming_matches_in_memory(csv_path):
+    expected = SAPDataAnalyzer(csv_path).generate_all_reports(engine='methods')
+    actual = StreamingSAPDataAnalyzer(csv_path, chunksize=4_000, alpha=ALPHA).generate_all_reports()
+    # everything is exact except the medians, which are within the sketch's relative error
+    assert_reports_close(expected, actual, median_rtol=ALPHA)
+
+
+def test_merge_of_split_states_equals_single_state(csv_path):
+    parts = chunks(csv_path, 2_500)
+    single = aggregates.ReportState(ALPHA)
+    for chunk in parts:
+        single.update(chunk)
+
+    merged = aggregates.ReportState(ALPHA)
+    for group in (parts[:1], parts[1:5], [], parts[5:]):
+        state = aggregates.ReportState(ALPHA)
+        for chunk in group:
+            state.update(chunk)
+        merged.merge(state)
+    # the sketches merge by adding bucket counts, so even the medians are identical
+    assert_reports_close(single.reports(), merged.reports(), median_rtol=0)
+
+
+def test_empty_state_reports():
+    reports = aggregates.ReportState(ALPHA).reports()
+    assert reports['basic_statistics']['total_records'] == 0
+    for name in ['time_series', 'cost_centers', 'material_analysis', 'document_types']:
+        assert reports[name].empty, name
+
+
+def test_streaming_with_no_matching_rows(csv_path):
+    filters = {'CompanyCode': ['NOPE']}
+    expected = SAPDataAnalyzer(csv_path, filters=filters).generate_all_reports(engine='methods')
+    actual = StreamingSAPDataAnalyzer(csv_path, filters=filters, chunksize=4_000).generate_all_reports()
+    assert actual['basic_statistics']['total_records'] == 0
+    for name, report in expected.items():
+        if isinstance(report, pd.DataFrame):
+            assert list(actual[name].columns) == list(report.columns), name
+            assert len(actual[name]) == len(report), name
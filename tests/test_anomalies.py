@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:12:37 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pandas as pd
+
+import anomalies
+
+# %%
+
+def ledger(combinations, months, rng):
+    """Postings of every (CostCenter, GLAccount, amount per posting) in the given months since 2024-01 (12 postings each)"""
+    rows = []
+    for cost_center, account, amount in combinations:
+        for month in months:
+            for day in range(1, 13):
+                date = pd.Timestamp(2024 + month // 12, month % 12 + 1, day)
+                rows.append((cost_center, account, date, amount * rng.uniform(0.95, 1.05)))
+    df = pd.DataFrame(rows, columns=['CostCenter', 'GLAccount', 'PostingDate', 'Amount'])
+    df['FiscalYear'] = df['PostingDate'].dt.year
+    df['FiscalPeriod'] = df['PostingDate'].dt.month
+    return df
+
+
+def test_steady_combination_is_not_flagged():
+    rng = np.random.default_rng(0)
+    df = ledger([('CC_1', 'G/L_1', 1000.0)], range(24), rng)
+    assert anomalies.combination_outliers(df).empty
+
+
+def test_sparse_combination_is_not_flagged():
+    # posts in 2 of 24 periods: the empty periods must not count as zeros that make every posting an outlier
+    rng = np.random.default_rng(1)
+    df = ledger([('CC_1', 'G/L_1', 1000.0)], range(24), rng)
+    df = pd.concat([df, ledger([('CC_2', 'G/L_2', 500.0)], [5, 17], rng)], ignore_index=True)
+    assert anomalies.combination_outliers(df).empty
+
+
+def test_spike_is_flagged():
+    rng = np.random.default_rng(2)
+    df = ledger([('CC_1', 'G/L_1', 1000.0), ('CC_2', 'G/L_2', 500.0)], range(24), rng)
+    spike = (df['CostCenter'] == 'CC_2') & (df['FiscalYear'] == 2025) & (df['FiscalPeriod'] == 7)
+    df.loc[spike, 'Amount'] *= 10
+    result = anomalies.combination_outliers(df)
+    assert len(result) == 1
+    assert (result.loc[0, 'CostCenter'], result.loc[0, 'GLAccount']) == ('CC_2', 'G/L_2')
+    assert result.loc[0, 'period'] == pd.Period('2025-07', freq='M')
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 02:47:51 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import json
+import pandas as pd
+import pytest
+
+import aggregates
+import batch_runner
+import data_generator
+from data_analysis import SAPDataAnalyzer, StreamingSAPDataAnalyzer
+from test_aggregates import assert_reports_close
+
+# %%
+
+ROWS = 24_000
+SEED = 31
+ALPHA = 0.005
+COMPANIES = ['COMP_A', 'COMP_B', 'COMP_C', 'COMP_D']
+
+
+@pytest.fixture(scope='module')
+def extracts(tmp_path_factory):
+    """The ledger as one file and as two extracts per company code in sub-directories"""
+    root = tmp_path_factory.mktemp('extracts')
+    ledger = data_generator.generate_sap_like_data(ROWS, seed=SEED)
+    data_generator.save_data(ledger, str(root / 'ledger.csv'), verbose=False)
+    for company in COMPANIES:
+        rows = ledger[ledger['CompanyCode'] == company]
+        for part, half in enumerate([rows.iloc[:len(rows) // 2], rows.iloc[len(rows) // 2:]]):
+            os.makedirs(root / f'part{part}', exist_ok=True)
+            data_generator.save_data(half, str(root / f'part{part}' / f'{company}.csv'), verbose=False)
+    return root
+
+
+@pytest.fixture(scope='module')
+def batch(extracts, tmp_path_factory):
+    output = str(tmp_path_factory.mktemp('reports'))
+    summary = batch_runner.run_batch([str(extracts / 'part*' / '*.csv')], output, processes=2, chunksize=2_000,
+                                     alpha=ALPHA, frame_format='json', group_pattern=r'(COMP_[A-Z])', verbose=False)
+    return output, summary
+
+
+def single_pass(path, filters=None):
+    return SAPDataAnalyzer(path, filters=filters).generate_all_reports(engine='methods')
+
+# %% run
+
+def test_summary(batch):
+    output, summary = batch
+    assert summary['files'] == 2 * len(COMPANIES) and summary['failed'] == 0
+    assert summary['rows'] == ROWS
+    assert summary['consolidated'] == {company: 2 for company in COMPANIES}
+    with open(os.path.join(output, batch_runner.SUMMARY_FILE)) as f:
+        assert json.load(f)['rows'] == ROWS
+    names = [os.path.basename(record['output']) for record in summary['records']]
+    assert names == [f'part{part}__{company}.csv' for part in range(2) for company in COMPANIES]
+
+
+def test_each_input_equals_single_pass(extracts, batch):
+    output, summary = batch
+    for record in summary['records']:
+        assert record['status'] == 'ok'
+        assert sorted(record['files']) == sorted(name + '.json' for name in aggregates.ReportState(ALPHA).reports())
+        state = aggregates.ReportState.load(os.path.join(record['output'], batch_runner.STATE_FILE))
+        assert_reports_close(single_pass(record['path']), state.reports(), median_rtol=ALPHA)
+
+
+def test_written_reports_equal_state(batch):
+    output, summary = batch
+    directory = summary['records'][0]['output']
+    reports = aggregates.ReportState.load(os.path.join(directory, batch_runner.STATE_FILE)).reports()
+    cost_centers = pd.read_json(os.path.join(directory, 'cost_centers.json'), orient='table')
+    pd.testing.assert_frame_equal(cost_centers, reports['cost_centers'], check_index_type=False,
+                                  check_dtype=False, check_names=False)
+    with open(os.path.join(directory, 'basic_statistics.json')) as f:
+        assert json.load(f)['total_records'] == reports['basic_statistics']['total_records']
+
+# %% consolidate
+
+def test_groups_equal_single_pass(extracts, batch):
+    output, summary = batch
+    for company in COMPANIES:
+        state = aggregates.ReportState.load(os.path.join(output, batch_runner.CONSOLIDATED_DIR, company,
+                                                         batch_runner.STATE_FILE))
+        expected = single_pass(str(extracts / 'ledger.csv'), filters={'CompanyCode': [company]})
+        assert_reports_close(expected, state.reports(), median_rtol=ALPHA)
+
+
+def test_consolidate_all_equals_streaming_the_ledger(extracts, batch):
+    output, summary = batch
+    # the consolidated directory of the run is not merged again
+    assert batch_runner.consolidate(output, frame_format='json') == {'all': 2 * len(COMPANIES)}
+    state = aggregates.ReportState.load(os.path.join(output, batch_runner.CONSOLIDATED_DIR, 'all',
+                                                     batch_runner.STATE_FILE))
+    ledger = str(extracts / 'ledger.csv')
+    assert_reports_close(single_pass(ledger), state.reports(), median_rtol=ALPHA)
+    # merged sketches hold the same buckets as one sketch over the whole ledger
+    streamed = StreamingSAPDataAnalyzer(ledger, chunksize=5_000, alpha=ALPHA).generate_all_reports()
+    assert_reports_close(streamed, state.reports(), median_rtol=0)
+
+
+def test_failed_input_is_reported_and_skipped(extracts, tmp_path):
+    broken = tmp_path / 'broken.parquet'
+    broken.write_bytes(b'not a parquet file')
+    output = str(tmp_path / 'reports')
+    summary = batch_runner.run_batch([str(extracts / 'part0' / '*.csv'), str(broken)], output, processes=1,
+                                     frame_format='json', verbose=False)
+    assert summary['failed'] == 1
+    failed = [record for record in summary['records'] if record['status'] == 'error']
+    assert failed[0]['path'] == str(broken) and failed[0]['error']
+    assert summary['consolidated'] == {'all': len(COMPANIES)}
+    assert not os.path.exists(os.path.join(failed[0]['output'], batch_runner.STATE_FILE))
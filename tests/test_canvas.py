@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 01:52:10 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pytest
+
+pytest.importorskip('matplotlib')
+pytest.importorskip('PySide6')
+canvas = pytest.importorskip('canvas')
+
+# %%
+
+def signal(n, seed=0, gaps=False):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(0.5, 1.5, n))
+    y = np.cumsum(rng.normal(size=n))
+    y[rng.integers(0, n, 5)] += rng.choice([-50.0, 50.0], 5)
+    if gaps:
+        y[rng.integers(0, n, n // 20)] = np.nan
+    return x, y
+
+
+def lttb_reference(x, y, threshold):
+    """Largest-Triangle-Three-Buckets as published, one point at a time"""
+    n = len(y)
+    every = (n - 2) / (threshold - 2)
+    keep, a = [0], 0
+    for i in range(threshold - 2):
+        avg_start, avg_end = int(np.floor((i + 1) * every)) + 1, min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x, avg_y = x[avg_start:avg_end].mean(), y[avg_start:avg_end].mean()
+        best, best_area = None, -1.0
+        for j in range(int(np.floor(i * every)) + 1, int(np.floor((i + 1) * every)) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    return np.array(keep + [n - 1])
+
+# %% min/max
+
+@pytest.mark.parametrize('n, max_points', [(10_000, 2_000), (1_000, 300), (1_001, 10), (99_999, 64)])
+def test_minmax_keeps_every_bucket_extreme(n, max_points):
+    x, y = signal(n, seed=n)
+    kept_x, kept_y = canvas.minmax_downsample(x, y, max_points)
+    assert len(kept_y) <= max_points + 2
+    keep = np.searchsorted(x, kept_x)
+    assert (np.diff(keep) > 0).all() and keep[0] == 0 and keep[-1] == n - 1
+    np.testing.assert_array_equal(kept_y, y[keep])
+    # the extremes of every bucket, the last (shorter) one included
+    size = -(-n // (max_points // 2))
+    for start in range(0, n, size):
+        bucket = y[start:start + size]
+        assert bucket.min() in kept_y and bucket.max() in kept_y
+
+
+def test_minmax_ignores_gaps():
+    x, y = signal(5_000, gaps=True)
+    kept_x, kept_y = canvas.minmax_downsample(x, y, 500)
+    assert np.nanmax(kept_y) == np.nanmax(y) and np.nanmin(kept_y) == np.nanmin(y)
+
+
+def test_short_lines_are_unchanged():
+    x, y = signal(100)
+    for downsample in canvas.DOWNSAMPLERS.values():
+        kept_x, kept_y = downsample(x, y, 100)
+        assert kept_x is x and kept_y is y
+
+# %% LTTB
+
+@pytest.mark.parametrize('n, max_points', [(10_000, 2_000), (1_000, 300), (5_003, 17), (500, 3)])
+def test_lttb_matches_reference(n, max_points):
+    x, y = signal(n, seed=n)
+    kept_x, kept_y = canvas.lttb_downsample(x, y, max_points)
+    keep = lttb_reference(x, y, max_points)
+    assert len(kept_y) == max_points
+    np.testing.assert_array_equal(kept_x, x[keep])
+    np.testing.assert_array_equal(kept_y, y[keep])
+
+
+def test_lttb_keeps_spike():
+    x = np.arange(20_000, dtype=np.float64)
+    y = np.sin(x / 500)
+    y[12_345] = 40.0
+    kept_x, kept_y = canvas.lttb_downsample(x, y, 200)
+    assert 12_345 in kept_x and kept_y.max() == 40.0
+
+
+def test_lttb_with_gaps():
+    x, y = signal(5_000, gaps=True)
+    kept_x, kept_y = canvas.lttb_downsample(x, y, 400)
+    assert len(kept_x) == 400 and (np.diff(kept_x) > 0).all()
+    assert not np.isnan(kept_y[1:-1]).any()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 02:31:08 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+import column_store
+import data_generator
+import data_storage
+
+# %%
+
+ROWS = 12_000
+SEED = 29
+
+
+@pytest.fixture(scope='module')
+def csv_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('csv') / 'ledger.csv')
+    data_generator.save_data(data_generator.generate_sap_like_data(ROWS, seed=SEED), path, verbose=False)
+    return path
+
+
+@pytest.fixture(scope='module')
+def store(csv_path, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('store') / 'ledger.columns')
+    column_store.convert(csv_path, path, chunksize=5_000)
+    return path
+
+
+def comparable(df):
+    """Ledger with plain values, document numbers formatted as in the source file"""
+    df = df.copy()
+    for name in df.columns:
+        if name == 'PostingDate':
+            df[name] = pd.to_datetime(df[name].astype(object))
+        elif name == 'DocumentNumber' and 'document_number_format' in df.attrs:
+            df[name] = data_storage.format_document_numbers(df[name], df.attrs['document_number_format'])
+        elif name in data_storage.PARTITION_COLUMNS:
+            df[name] = df[name].astype(np.int64)
+        elif df[name].dtype == object or isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype(object).where(df[name].notna(), None)
+    df.attrs = {}
+    return df
+
+
+def buffer(values):
+    """The numpy array holding the data of a column"""
+    array = values.array
+    if isinstance(array, pd.Categorical):
+        return array.codes
+    return array._data if isinstance(array, pd.arrays.IntegerArray) else array.to_numpy()
+
+
+def mapped_file(values):
+    """File of the memory map an array is a view of, None if it owns its data"""
+    while values is not None:
+        if isinstance(values, np.memmap) and values.filename:
+            return values.filename
+        values = values.base
+    return None
+
+# %% round trip
+
+def test_round_trip(csv_path, store):
+    df = column_store.open_store(store)
+    assert df.attrs['document_number_format'] == ('DOC_', 8)
+    pd.testing.assert_frame_equal(comparable(df), comparable(data_storage.read_data(csv_path)))
+    # read_data opens a store as well, through the directory or its meta.json
+    pd.testing.assert_frame_equal(comparable(data_storage.read_data(store)), comparable(df))
+    pd.testing.assert_frame_equal(comparable(column_store.open_store(os.path.join(store, data_storage.STORE_META))),
+                                  comparable(df))
+
+
+def test_column_layout(store):
+    meta = column_store.read_meta(store)
+    assert meta['n_rows'] == ROWS
+    assert [spec['name'] for spec in meta['columns']] == data_storage.COLUMNS
+    df = column_store.open_store(store)
+    for name in column_store.CODED_COLUMNS:
+        categories = df[name].cat.categories
+        assert list(categories) == sorted(categories)
+        assert df[name].cat.codes.dtype == np.int8
+    assert df['DocumentNumber'].dtype == np.int64
+    assert df['PostingDate'].dtype == 'datetime64[ns]'
+
+
+def test_open_columns(store):
+    df = column_store.open_store(store, columns=['Amount', 'CostCenter'])
+    assert list(df.columns) == ['Amount', 'CostCenter']
+    assert 'document_number_format' not in df.attrs
+
+# %% zero-copy
+
+def test_open_maps_the_column_files(store):
+    df = column_store.open_store(store)
+    meta = column_store.read_meta(store)
+    for spec in meta['columns']:
+        values = buffer(df[spec['name']])
+        path = os.path.join(store, spec['name'] + '.bin')
+        # the column is the mapped file itself, not a copy of it
+        assert os.path.samefile(mapped_file(values), path)
+        assert not values.flags.writeable
+        np.testing.assert_array_equal(values, np.fromfile(path, dtype=spec['dtype']))
+
+
+def test_analysis_does_not_copy_the_columns(store):
+    df = column_store.open_store(store)
+    before = {name: buffer(df[name]) for name in df.columns}
+    df.groupby('CostCenter', observed=True)['Amount'].sum()
+    df[df['CompanyCode'] == 'COMP_A']
+    for name, values in before.items():
+        assert buffer(df[name]) is values or np.shares_memory(buffer(df[name]), values)
+
+# %% conversion
+
+def test_chunked_conversion_equals_single_chunk(csv_path, store, tmp_path):
+    single = str(tmp_path / 'single.columns')
+    column_store.convert(csv_path, single, chunksize=ROWS)
+    pd.testing.assert_frame_equal(comparable(column_store.open_store(single)),
+                                  comparable(column_store.open_store(store)))
+
+
+def test_missing_document_numbers_and_new_values(tmp_path):
+    df = data_generator.generate_sap_like_data(3_000, seed=SEED).astype({'DocumentNumber': object, 'CostCenter': object})
+    df.loc[5, 'DocumentNumber'] = None
+    # a cost center that only appears in the last chunk
+    df.loc[2_990:, 'CostCenter'] = 'CC_0000'
+    path = str(tmp_path / 'ledger.csv')
+    data_generator.save_data(df, path, verbose=False)
+    column_store.convert(path, str(tmp_path / 'ledger.columns'), chunksize=1_000)
+    store = column_store.open_store(str(tmp_path / 'ledger.columns'))
+    # one missing number keeps the format of the others
+    assert store['DocumentNumber'].dtype == 'Int64'
+    assert store.attrs['document_number_format'] == ('DOC_', 8)
+    assert store['DocumentNumber'].isna().tolist() == df['DocumentNumber'].isna().tolist()
+    assert store['CostCenter'].cat.categories[0] == 'CC_0000'
+    pd.testing.assert_frame_equal(comparable(store), comparable(data_storage.read_data(path)))
+
+
+def test_empty_store(csv_path, tmp_path):
+    path = str(tmp_path / 'empty.columns')
+    meta = column_store.convert(csv_path, path, filters={'CompanyCode': ['NOPE']})
+    assert meta['n_rows'] == 0
+    df = column_store.open_store(path)
+    assert df.empty and list(df.columns) == data_storage.COLUMNS
+
+
+def test_other_store_version(store, tmp_path):
+    with open(os.path.join(store, data_storage.STORE_META)) as f:
+        meta = json.load(f)
+    meta['version'] = column_store.STORE_VERSION + 1
+    os.makedirs(tmp_path / 'old.columns')
+    with open(tmp_path / 'old.columns' / data_storage.STORE_META, 'w') as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError):
+        column_store.open_store(str(tmp_path / 'old.columns'))
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 22:31:09 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import anomalies
+import column_store
+import data_generator
+import data_storage
+from data_analysis import SAPDataAnalyzer
+
+# %%
+
+ROWS = 20_000
+SEED = 5
+
+
+@pytest.fixture(scope='module')
+def csv_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('ledger') / 'ledger.csv')
+    data_generator.save_data(data_generator.generate_sap_like_data(ROWS, seed=SEED), path, verbose=False)
+    return path
+
+# %% engines
+
+@pytest.mark.parametrize('filters', [None, {'CompanyCode': ['COMP_A', 'COMP_C'], 'DocumentType': 'INV'}])
+def test_fused_reports_equal_methods(csv_path, filters):
+    analyzer = SAPDataAnalyzer(csv_path, filters=filters)
+    expected = analyzer.generate_all_reports(engine='methods')
+    reports = analyzer.generate_all_reports()
+    assert list(reports) == list(expected)
+    for name, report in expected.items():
+        if isinstance(report, pd.DataFrame):
+            pd.testing.assert_frame_equal(reports[name], report, obj=name)
+        else:
+            assert reports[name] == report, name
+
+
+def test_fused_reports_of_empty_selection(csv_path):
+    analyzer = SAPDataAnalyzer(csv_path, filters={'CompanyCode': ['NOPE']})
+    expected = analyzer.generate_all_reports(engine='methods')
+    reports = analyzer.generate_all_reports()
+    assert reports['basic_statistics']['total_records'] == 0
+    for name, report in expected.items():
+        if isinstance(report, pd.DataFrame):
+            assert list(reports[name].columns) == list(report.columns), name
+            assert list(reports[name].dtypes) == list(report.dtypes), name
+            assert len(reports[name]) == len(report), name
+
+# %% compact storage
+
+@pytest.mark.parametrize('numeric', SAPDataAnalyzer.NUMERIC_STORAGE)
+def test_compact_frame_round_trip(csv_path, numeric):
+    raw = data_storage.read_data(csv_path)
+    analyzer = SAPDataAnalyzer(csv_path, numeric=numeric)
+    assert analyzer.document_number_format == ('DOC_', 8)
+    df = analyzer.frame(formatted=True)
+    for column in data_storage.DIMENSION_COLUMNS:
+        assert isinstance(analyzer.df[column].dtype, pd.CategoricalDtype), column
+        pd.testing.assert_series_equal(df[column].astype(object), raw[column].astype(object), check_names=False)
+    for column in ['Quantity', 'Amount']:
+        assert df[column].dtype == np.float64
+        # cents are exact for the generator's two decimals, float32 keeps about 7 digits
+        np.testing.assert_allclose(df[column], raw[column], rtol=1e-7 if numeric == 'float32' else 1e-15)
+    assert analyzer.df['DocumentNumber'].dtype == np.int64
+    pd.testing.assert_series_equal(df['DocumentNumber'], raw['DocumentNumber'])
+    assert analyzer.frame()['DocumentNumber'].dtype == np.int64
+
+
+def test_column_store_keeps_document_number_format(csv_path, tmp_path):
+    store = str(tmp_path / 'ledger.columns')
+    column_store.convert(csv_path, store, chunksize=7_000)
+    analyzer = SAPDataAnalyzer(store, filters={'CompanyCode': ['COMP_A']})
+    assert analyzer.document_number_format == ('DOC_', 8)
+    expected = SAPDataAnalyzer(csv_path, filters={'CompanyCode': ['COMP_A']}).frame(['DocumentNumber'], formatted=True)
+    pd.testing.assert_frame_equal(analyzer.frame(['DocumentNumber'], formatted=True), expected)
+
+
+def test_anomalies_show_document_numbers(csv_path):
+    analyzer = SAPDataAnalyzer(csv_path)
+    df = analyzer.df.copy()
+    df.loc[len(df) - 1, 'DocumentNumber'] = df.loc[0, 'DocumentNumber']
+    duplicated = SAPDataAnalyzer.from_frame(df)
+    duplicated.document_number_format = analyzer.document_number_format
+    results = duplicated.detect_anomalies()
+    assert results['duplicates']['DocumentNumber'].tolist() == [data_storage.read_data(csv_path)['DocumentNumber'][0]]
+    top = anomalies.top_anomalies(results)
+    numbers = top['DocumentNumber'].dropna()
+    assert len(numbers) and numbers.str.fullmatch(r'DOC_\d{8}').all()
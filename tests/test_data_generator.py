@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 22:02:45 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import pytest
+
+import data_generator
+
+# %%
+
+def read_files(root):
+    """{relative path: bytes} of every file below root"""
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+@pytest.mark.parametrize('partition, file_format', [(True, 'csv'), (False, 'csv'), (True, 'parquet')])
+def test_parallel_output_independent_of_workers(tmp_path, partition, file_format):
+    if file_format == 'parquet':
+        pytest.importorskip('pyarrow')
+    outputs = {}
+    for workers in (1, 3):
+        out_dir = str(tmp_path / f'workers_{workers}')
+        data_generator.generate_sap_like_data_parallel(10_000, out_dir, workers=workers, seed=11, chunk_size=1_500,
+                                                       partition=partition, file_format=file_format)
+        outputs[workers] = read_files(out_dir)
+    assert len(outputs[1]) >= 7
+    assert outputs[1] == outputs[3]
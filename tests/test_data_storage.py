@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 00:46:13 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import column_store
+import data_generator
+import data_storage
+
+# %%
+
+ROWS = 12_000
+SEED = 21
+
+
+@pytest.fixture(scope='module')
+def ledger():
+    return data_generator.generate_sap_like_data(ROWS, seed=SEED)
+
+
+@pytest.fixture(scope='module')
+def csv_path(ledger, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('csv') / 'ledger.csv')
+    data_generator.save_data(ledger, path, verbose=False)
+    return path
+
+
+def normalized(df):
+    """Ledger with one representation per value, whatever format it was read from"""
+    df = df.copy()
+    for name in df.columns:
+        if name == 'PostingDate':
+            df[name] = pd.to_datetime(df[name].astype(object))
+        elif name in data_storage.PARTITION_COLUMNS:
+            df[name] = df[name].astype(np.int64)
+        elif name in data_storage.DIMENSION_COLUMNS or name == 'DocumentNumber':
+            # empty references are missing values in every format
+            df[name] = df[name].astype(object).replace('', None).where(df[name].notna(), None)
+    return df
+
+
+def assert_ledger_equal(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(normalized(actual), normalized(expected))
+
+# %% columnar storage
+
+@pytest.mark.parametrize('name', ['ledger.parquet', 'ledger.feather'])
+def test_columnar_round_trip(ledger, csv_path, tmp_path, name):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / name)
+    data_generator.save_data(ledger, path, verbose=False)
+    df = data_storage.read_data(path)
+    assert_ledger_equal(df, data_storage.read_data(csv_path))
+    assert_ledger_equal(df, ledger)
+    # dimensions come back as categoricals and dates typed, nothing is parsed from text
+    assert all(isinstance(df[c].dtype, pd.CategoricalDtype) for c in data_storage.DIMENSION_COLUMNS)
+    assert pd.api.types.is_datetime64_any_dtype(df['PostingDate'])
+
+
+def test_parquet_schema(ledger, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'ledger.parquet')
+    data_generator.save_data(ledger, path, verbose=False)
+    schema = pq.read_schema(path)
+    assert schema.remove_metadata().equals(data_storage.sap_schema())
+    assert str(schema.field('CostCenter').type) == 'dictionary<values=string, indices=int32, ordered=0>'
+    assert str(schema.field('PostingDate').type) == 'date32[day]'
+    assert str(schema.field('FiscalPeriod').type) == 'int16'
+    assert data_storage.sap_schema(['Amount', 'PostingDate']).names == ['Amount', 'PostingDate']
+
+
+@pytest.mark.parametrize('name', ['ledger.parquet', 'ledger.feather'])
+def test_chunked_write_equals_single_write(ledger, tmp_path, name):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / name)
+    chunks = [ledger.iloc[i:i + 5_000] for i in range(0, ROWS, 5_000)]
+    data_storage.write_table_chunks(chunks, path)
+    if name.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        assert pq.ParquetFile(path).num_row_groups == len(chunks)
+    assert_ledger_equal(data_storage.read_data(path), ledger)
+
+
+@pytest.mark.parametrize('name', ['ledger.parquet', 'ledger.feather'])
+def test_chunks_with_new_dimension_values(ledger, tmp_path, name):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / name)
+    first = ledger.iloc[:100].astype({'CostCenter': object})
+    second = ledger.iloc[100:200].astype({'CostCenter': object}).assign(CostCenter='CC_NEW', Vendor='')
+    data_storage.write_table_chunks([first, second], path)
+    df = data_storage.read_data(path)
+    assert df['CostCenter'].iloc[100:].eq('CC_NEW').all()
+    assert df['Vendor'].iloc[100:].isna().all()
+    assert_ledger_equal(df, pd.concat([first, second], ignore_index=True))
+
+def test_storage_format(tmp_path):
+    assert data_storage.storage_format('a/ledger.PARQUET') == 'parquet'
+    assert data_storage.storage_format('ledger.arrow') == 'feather'
+    assert data_storage.storage_format('ledger.csv') == 'csv'
+    (tmp_path / 'parts' / 'FiscalYear=2024').mkdir(parents=True)
+    assert data_storage.storage_format(str(tmp_path / 'parts')) == 'csv'
+    (tmp_path / 'parts' / 'FiscalYear=2024' / 'part-0.parquet').touch()
+    assert data_storage.storage_format(str(tmp_path / 'parts')) == 'parquet'
+
+# %% projection and filter pushdown
+
+@pytest.fixture(scope='module')
+def sources(ledger, csv_path, tmp_path_factory):
+    """The same ledger in every layout read_data accepts"""
+    root = tmp_path_factory.mktemp('sources')
+    paths = {'csv': csv_path}
+    data_generator.generate_sap_like_data_parallel(ROWS, str(root / 'csv_parts'), workers=1, seed=SEED,
+                                                   chunk_size=ROWS, file_format='csv')
+    paths['csv_parts'] = str(root / 'csv_parts')
+    paths['columns'] = str(root / 'ledger.columns')
+    column_store.convert(csv_path, paths['columns'], chunksize=5_000)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return paths
+    for name in ['ledger.parquet', 'ledger.feather']:
+        paths[name] = str(root / name)
+        data_generator.save_data(ledger, paths[name], verbose=False)
+    data_generator.generate_sap_like_data_parallel(ROWS, str(root / 'parquet_parts'), workers=1, seed=SEED,
+                                                   chunk_size=ROWS, file_format='parquet')
+    paths['parquet_parts'] = str(root / 'parquet_parts')
+    return paths
+
+
+PUSHDOWN_CASES = [
+    (None, {'CompanyCode': ['COMP_A', 'COMP_C']}),
+    (['Amount', 'CostCenter'], {'DocumentType': 'INV', 'Plant': ['PLANT_2', 'NOPE']}),
+    (['Amount', 'PostingDate'], {'PostingDate': ('2025-03-01', '2025-09-30')}),
+    (['Amount', 'Material'], {'PostingDate': (None, '2025-01-31'), 'Material': ['MAT_00001', 'MAT_00002']}),
+    (['Amount', 'FiscalPeriod'], {'FiscalYear': [2025], 'FiscalPeriod': [2, 3]}),
+    (['Quantity'], {'CompanyCode': ['NOPE']}),
+    (['Amount', 'Vendor'], None),
+]
+
+
+@pytest.mark.parametrize('source', ['csv', 'csv_parts', 'columns', 'ledger.parquet', 'ledger.feather', 'parquet_parts'])
+@pytest.mark.parametrize('columns, filters', PUSHDOWN_CASES)
+def test_pushdown_equals_filtering_after_full_load(sources, source, columns, filters):
+    if source not in sources:
+        pytest.skip('pyarrow is not installed')
+    path = sources[source]
+    full = normalized(data_storage.read_data(path))
+    expected = full[data_storage.filter_mask(full, data_storage.normalize_filters(filters)).to_numpy()]
+    if columns is not None:
+        expected = expected[[name for name in full.columns if name in columns]]
+    actual = data_storage.read_data(path, columns=columns, filters=filters)
+    pd.testing.assert_frame_equal(normalized(actual), expected.reset_index(drop=True))
+
+    chunks = list(data_storage.iter_chunks(path, columns=columns, filters=filters, chunksize=3_000))
+    assert all(len(chunk) <= 3_000 for chunk in chunks)
+    pd.testing.assert_frame_equal(normalized(data_storage.concat_frames(chunks)).reset_index(drop=True),
+                                  expected.reset_index(drop=True))
+
+# %% document numbers
+
+@pytest.mark.parametrize('values, expected, number_format', [
+    (['DOC_00000012', 'DOC_00123456', 'DOC_99999999'], [12, 123456, 99999999], ('DOC_', 8)),
+    (['000120', '999999'], [120, 999999], ('', 6)),
+    (['BEL-7'], [7], ('BEL-', 1)),
+])
+def test_parse_document_numbers_fast_path(values, expected, number_format):
+    values = pd.Series(values, name='DocumentNumber')
+    numbers, parsed_format = data_storage.parse_document_numbers(values)
+    assert numbers.dtype == 'int64'
+    assert numbers.tolist() == expected
+    assert parsed_format == number_format
+    pd.testing.assert_series_equal(data_storage.format_document_numbers(numbers, parsed_format), values)
+    formatter = data_storage.document_number_formatter(parsed_format)
+    assert [formatter(number) for number in numbers] == values.tolist()
+
+
+@pytest.mark.parametrize('values, expected', [
+    (['DOC_0001', 'INV_0002'], [1, 2]),
+    (['DOC_0001', 'DOC_02', None], [1, 2, None]),
+    (['A1', 'B', 'Ü12'], [1, None, 12]),
+    ([], []),
+])
+def test_parse_document_numbers_without_common_format(values, expected):
+    numbers, number_format = data_storage.parse_document_numbers(pd.Series(values, dtype=object))
+    assert number_format is None
+    assert numbers.dtype == 'Int64'
+    assert [None if pd.isna(n) else n for n in numbers] == expected
+    # without a format the numbers are shown as they are
+    assert data_storage.format_document_numbers(numbers, None) is numbers
+
+
+def test_format_keeps_missing_numbers():
+    numbers = pd.Series([5, None, 12], dtype='Int64')
+    assert data_storage.format_document_numbers(numbers, ('DOC_', 4)).tolist() == ['DOC_0005', None, 'DOC_0012']
+    assert data_storage.document_number_formatter(('DOC_', 4))(pd.NA) == '<NA>'
+
+
+def test_parse_keeps_format_with_missing_numbers():
+    values = pd.Series(['DOC_0005', None, 'DOC_0012'], dtype=object, name='DocumentNumber')
+    numbers, number_format = data_storage.parse_document_numbers(values)
+    assert number_format == ('DOC_', 4)
+    assert numbers.dtype == 'Int64' and numbers.isna().tolist() == [False, True, False]
+    assert data_storage.format_document_numbers(numbers, number_format).tolist() == values.tolist()
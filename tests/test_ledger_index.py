@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 23:41:26 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_generator
+import data_storage
+import ledger_index
+import report_cache
+
+# %%
+
+ROWS = 5_000
+SEED = 13
+
+
+@pytest.fixture(scope='module')
+def ledger():
+    """Generated ledger with missing dates and keys, one key column stored as plain strings"""
+    df = data_generator.generate_sap_like_data(ROWS, seed=SEED)
+    df['PostingDate'] = pd.to_datetime(df['PostingDate'].astype(str))
+    df.loc[::37, 'PostingDate'] = pd.NaT
+    df.loc[5::41, 'CompanyCode'] = np.nan
+    df['Plant'] = df['Plant'].astype(object)
+    df.loc[3::29, 'Plant'] = np.nan
+    return df
+
+
+def dates(ledger, q):
+    return ledger['PostingDate'].quantile(q)
+
+
+def expected_rows(df, filters):
+    return np.flatnonzero(data_storage.filter_mask(df, data_storage.normalize_filters(filters)).to_numpy())
+
+
+def write_ledger(path, seed):
+    data_generator.save_data(data_generator.generate_sap_like_data(ROWS, seed=seed), path, verbose=False)
+    return data_storage.read_data(path)
+
+# %% queries
+
+@pytest.mark.parametrize('make_filters', [
+    lambda df: {},
+    lambda df: {'PostingDate': (dates(df, 0.2), dates(df, 0.6))},
+    lambda df: {'PostingDate': (None, dates(df, 0.3))},
+    lambda df: {'PostingDate': (dates(df, 0.9), None)},
+    lambda df: {'CompanyCode': ['COMP_A', 'NOPE']},
+    lambda df: {'Plant': ['PLANT_1', 'PLANT_3'], 'DocumentType': 'INV'},
+    lambda df: {'PostingDate': (dates(df, 0.1), dates(df, 0.5)), 'CostCenter': ['CC_1001', 'CC_1007'],
+                'Material': ['MAT_00001', 'MAT_00002', 'MAT_00003', 'MAT_00042']},
+    lambda df: {'Currency': 'EUR', 'CompanyCode': 'COMP_B'},
+    lambda df: {'Vendor': ['VEND_10001', 'VEND_10002', ''], 'PostingDate': (dates(df, 0.5), None)},
+    lambda df: {'CompanyCode': ['NOPE']},
+    lambda df: {'CompanyCode': 'COMP_A', 'DocumentType': ['NOPE']},
+    lambda df: {'PostingDate': (pd.Timestamp('1990-01-01'), pd.Timestamp('1990-12-31')), 'Plant': 'PLANT_1'},
+])
+def test_rows_equal_filter_mask(ledger, make_filters):
+    filters = make_filters(ledger)
+    rows = ledger_index.LedgerIndex.build(ledger).rows(filters, ledger)
+    np.testing.assert_array_equal(rows, expected_rows(ledger, filters))
+
+
+def test_residual_filters_need_the_frame(ledger):
+    index = ledger_index.LedgerIndex.build(ledger)
+    with pytest.raises(ValueError):
+        index.rows({'Currency': 'EUR'})
+
+# %% stored indexes
+
+def test_stored_index_rebuilt_when_source_changes(tmp_path):
+    path, index_dir = str(tmp_path / 'ledger.csv'), str(tmp_path / 'index')
+    df = write_ledger(path, SEED)
+    fingerprint = report_cache.file_fingerprint(path)
+
+    # an index file at the right place, built from other content, is not trusted
+    os.makedirs(index_dir)
+    ledger_index.LedgerIndex.build(df.iloc[::-1], source='stale').save(ledger_index.index_path(path, index_dir=index_dir))
+    index = ledger_index.load_or_build(df, path, index_dir=index_dir)
+    assert index.source == fingerprint
+    assert ledger_index.load_or_build(df, path, index_dir=index_dir).source == fingerprint
+
+    # new content with the same number of rows gets its own index
+    df = write_ledger(path, SEED + 1)
+    index = ledger_index.load_or_build(df, path, index_dir=index_dir)
+    assert index.source == report_cache.file_fingerprint(path) != fingerprint
+    filters = {'CompanyCode': 'COMP_A', 'DocumentType': ['GR', 'PO']}
+    np.testing.assert_array_equal(index.rows(filters), expected_rows(df, filters))
+
+
+def test_least_recently_used_index_is_evicted(tmp_path):
+    path, index_dir = str(tmp_path / 'ledger.csv'), str(tmp_path / 'index')
+    df = write_ledger(path, SEED)
+    variants = [{'CompanyCode': code} for code in ['COMP_A', 'COMP_B', 'COMP_C', 'COMP_D']]
+    paths = [ledger_index.index_path(path, filters=filters, index_dir=index_dir) for filters in variants]
+    for i, filters in enumerate(variants[:3]):
+        ledger_index.load_or_build(df, path, filters=filters, index_dir=index_dir)
+        os.utime(paths[i], (i + 1, i + 1))
+    size = os.path.getsize(paths[0])
+
+    ledger_index.load_or_build(df, path, filters=variants[0], index_dir=index_dir)  # used again
+    ledger_index.load_or_build(df, path, filters=variants[3], index_dir=index_dir, max_bytes=int(3.5 * size))
+    assert [os.path.exists(p) for p in paths] == [True, False, True, True]
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 02:13:45 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pytest
+
+import data_generator
+from data_analysis import SAPDataAnalyzer
+from olap_cube import OLAPCube, DIMENSIONS
+
+# %%
+
+ROWS = 20_000
+SEED = 23
+
+
+@pytest.fixture(scope='module')
+def ledger():
+    """Generated ledger with a few missing amounts and plants"""
+    df = data_generator.generate_sap_like_data(ROWS, seed=SEED)
+    df.loc[::61, 'Amount'] = np.nan
+    df['Plant'] = df['Plant'].astype(object)
+    df.loc[7::89, 'Plant'] = np.nan
+    return df
+
+
+@pytest.fixture(scope='module')
+def csv_path(ledger, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('ledger') / 'ledger.csv')
+    data_generator.save_data(ledger, path, verbose=False)
+    return path
+
+
+@pytest.fixture(scope='module', params=['frame', 'file', 'analyzer', 'materialized'])
+def cube(request, ledger, csv_path):
+    if request.param == 'frame':
+        return OLAPCube.from_frame(ledger)
+    if request.param == 'file':
+        return OLAPCube.from_file(csv_path, chunksize=3_000)
+    if request.param == 'analyzer':
+        return SAPDataAnalyzer(csv_path).build_cube()
+    return OLAPCube.from_frame(ledger).materialize()
+
+
+def reference(df, by=(), where=None):
+    """The query as a groupby over the posting rows"""
+    for dim, values in (where or {}).items():
+        df = df[df[dim].isin(values if isinstance(values, list) else [values])]
+    if not by:
+        result = df['Amount'].agg(['sum', 'count', 'min', 'max']).to_frame('Total').T
+    else:
+        result = df.groupby(list(by), observed=True, dropna=False)['Amount'].agg(['sum', 'count', 'min', 'max'])
+    result['mean'] = result['sum'] / result['count']
+    return result
+
+
+def assert_query_equal(actual, expected):
+    assert list(actual.columns) == ['sum', 'count', 'min', 'max', 'mean']
+    assert sorted(map(str, actual.index)) == sorted(map(str, expected.index))
+    expected = expected.set_axis(list(map(str, expected.index))).loc[list(map(str, actual.index))]
+    np.testing.assert_allclose(actual.to_numpy(float), expected[actual.columns].to_numpy(float), rtol=1e-9)
+
+
+QUERIES = [
+    ((), None),
+    (['CompanyCode'], None),
+    (['Plant'], None),
+    (['CostCenter', 'FiscalYear'], {'CompanyCode': 'COMP_A'}),
+    (['GLAccount'], {'FiscalYear': [2025], 'FiscalPeriod': [1, 2, 3]}),
+    (['ProfitCenter', 'CostCenter', 'FiscalPeriod'], {'CompanyCode': ['COMP_B', 'COMP_C'], 'Plant': 'PLANT_2'}),
+    ((), {'CompanyCode': ['COMP_A', 'NOPE']}),
+]
+
+# %% queries
+
+@pytest.mark.parametrize('by, where', QUERIES)
+def test_query_matches_groupby(cube, ledger, by, where):
+    assert_query_equal(cube.query(by, where), reference(ledger, by, where))
+
+
+def test_unknown_values_select_nothing(cube):
+    assert cube.query(['CompanyCode'], {'CompanyCode': 'NOPE'}).empty
+
+
+def test_slice_and_dice(cube, ledger):
+    assert_query_equal(cube.slice('FiscalYear', 2025, by=['CompanyCode']),
+                       reference(ledger, ['CompanyCode'], {'FiscalYear': 2025}))
+    where = {'CompanyCode': ['COMP_A', 'COMP_D'], 'FiscalPeriod': [6, 12]}
+    assert_query_equal(cube.dice(where, by=['Plant']), reference(ledger, ['Plant'], where))
+
+# %% hierarchies
+
+def test_drill_down_and_roll_up(cube, ledger):
+    assert_query_equal(cube.drill_down(['CompanyCode'], 'CompanyCode'), reference(ledger, ['CompanyCode', 'Plant']))
+    assert_query_equal(cube.drill_down(['FiscalYear'], 'FiscalYear', where={'ProfitCenter': 'PC_101'}),
+                       reference(ledger, ['FiscalYear', 'FiscalPeriod'], {'ProfitCenter': 'PC_101'}))
+    assert_query_equal(cube.roll_up(['CompanyCode', 'Plant', 'FiscalYear'], 'CompanyCode'),
+                       reference(ledger, ['FiscalYear']))
+    with pytest.raises(ValueError):
+        cube.drill_down(['Plant'], 'Plant')
+
+
+def test_base_cells_and_materialized_cuboids(ledger):
+    cube = OLAPCube.from_frame(ledger)
+    assert cube.size == len(ledger.groupby(DIMENSIONS, observed=True, dropna=False))
+    cube.materialize()
+    # 3 * 3 * 2 * 3 combinations of hierarchy levels
+    assert len(cube._cuboids) == 54
+    assert len(cube.cuboid(['CompanyCode'])) == ledger['CompanyCode'].nunique()
+    assert_query_equal(cube.query(['CompanyCode']), reference(ledger, ['CompanyCode']))
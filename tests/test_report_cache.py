@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 23:12:40 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import json
+import pandas as pd
+import pytest
+
+import data_generator
+import report_cache
+from data_analysis import report_key
+
+# %%
+
+ROWS = 2_000
+SEED = 9
+
+
+@pytest.fixture(autouse=True)
+def fingerprint_file(tmp_path, monkeypatch):
+    """Every test starts with an empty fingerprint memo in its own directory"""
+    path = str(tmp_path / 'fingerprints.json')
+    monkeypatch.setattr(report_cache, 'FINGERPRINT_FILE', path)
+    monkeypatch.setattr(report_cache, '_fingerprints', None)
+    return path
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / 'ledger.csv')
+    data_generator.save_data(data_generator.generate_sap_like_data(ROWS, seed=SEED), path, verbose=False)
+    return path
+
+
+def reports(value):
+    return {'table': pd.DataFrame({'sum': [value, 2.0 * value]}, index=pd.Index(['a', 'b'], name='key')),
+            'total': value}
+
+# %% keys
+
+def test_report_key_is_stable(csv_path):
+    key = report_key(csv_path)
+    assert report_key(csv_path) == key
+    assert report_key(csv_path, columns=['Amount', 'Quantity']) == report_key(csv_path, columns=['Quantity', 'Amount'])
+    assert report_key(csv_path, filters={'CompanyCode': ['COMP_B', 'COMP_A'], 'DocumentType': 'INV'}) == \
+        report_key(csv_path, filters={'DocumentType': ['INV'], 'CompanyCode': ('COMP_A', 'COMP_B', 'COMP_A')})
+    assert report_key(csv_path, filters={'PostingDate': ('2024-01-01', None)}) == \
+        report_key(csv_path, filters={'PostingDate': (pd.Timestamp('2024-01-01'), None)})
+    assert report_key(csv_path, filters={'CompanyCode': 'COMP_A'}) != key
+    assert report_key(csv_path, engine='methods') != key
+
+
+def test_fingerprint_persisted_across_processes(csv_path, fingerprint_file):
+    fingerprint = report_cache.file_fingerprint(csv_path)
+    with open(fingerprint_file, encoding='utf-8') as f:
+        stored = json.load(f)
+    assert stored[os.path.realpath(csv_path)][2] == fingerprint
+
+    # a new process reads the memo and does not rehash the unchanged file
+    stored[os.path.realpath(csv_path)][2] = 'from disk'
+    with open(fingerprint_file, 'w', encoding='utf-8') as f:
+        json.dump(stored, f)
+    report_cache._fingerprints = None
+    assert report_cache.file_fingerprint(csv_path) == 'from disk'
+
+
+def test_fingerprint_follows_real_path(csv_path, tmp_path):
+    link = str(tmp_path / 'link.csv')
+    os.symlink(csv_path, link)
+    assert report_cache.file_fingerprint(link) == report_cache.file_fingerprint(csv_path)
+    assert list(report_cache._fingerprints) == [os.path.realpath(csv_path)]
+
+
+def test_edit_invalidates_key(csv_path):
+    key = report_key(csv_path)
+    stat = os.stat(csv_path)
+    with open(csv_path, 'r+b') as f:
+        f.seek(stat.st_size // 2)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(b'7' if byte != b'7' else b'8')
+    # same size, new modification time: the file is rehashed
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert report_key(csv_path) != key
+
+# %% cache
+
+def test_round_trip_and_stats(tmp_path):
+    cache = report_cache.ReportCache(str(tmp_path / 'cache'))
+    assert cache.get('missing') is None
+    cache.put('key', reports(1.0))
+    cached = cache.get('key')
+    assert list(cached) == ['table', 'total']
+    pd.testing.assert_frame_equal(cached['table'], reports(1.0)['table'])
+    assert cached['total'] == 1.0
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = report_cache.ReportCache(str(tmp_path / 'cache'))
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, reports(1.0))
+        os.utime(cache._entry_dir(key), (i + 1, i + 1))
+    entry_size = cache.stats()['bytes'] / 3
+
+    cache.get('a')  # a becomes the most recently used entry, b the least
+    cache.max_bytes = int(3.5 * entry_size)
+    cache.put('d', reports(1.0))
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in ['a', 'c', 'd'])
+    assert cache.stats()['entries'] == 3
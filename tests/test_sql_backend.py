@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:31:18 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import os
+import pytest
+
+import data_generator
+from data_analysis import SAPDataAnalyzer
+
+pytest.importorskip('duckdb')
+sql_backend = pytest.importorskip('sql_backend')
+
+# %%
+
+ROWS = 20_000
+SEED = 7
+
+
+@pytest.fixture(scope='module')
+def ledger():
+    return data_generator.generate_sap_like_data(ROWS, seed=SEED)
+
+
+@pytest.fixture(scope='module')
+def csv_path(ledger, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('csv') / 'ledger.csv')
+    data_generator.save_data(ledger, path, verbose=False)
+    return path
+
+
+@pytest.fixture(scope='module')
+def parquet_path(ledger, tmp_path_factory):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path_factory.mktemp('parquet') / 'ledger.parquet')
+    data_generator.save_data(ledger, path, verbose=False)
+    return path
+
+
+@pytest.fixture(scope='module')
+def partitioned_path(tmp_path_factory):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path_factory.mktemp('partitioned') / 'ledger')
+    data_generator.generate_sap_like_data_parallel(ROWS, path, workers=2, seed=SEED, chunk_size=5_000,
+                                                   file_format='parquet')
+    return path
+
+# %%
+
+def test_parity_csv(csv_path):
+    assert sql_backend.check_parity(csv_path) == []
+
+
+def test_parity_parquet(parquet_path):
+    assert sql_backend.check_parity(parquet_path) == []
+
+
+def test_parity_partitioned(partitioned_path):
+    assert os.path.isdir(partitioned_path)
+    assert sql_backend.check_parity(partitioned_path) == []
+
+
+def test_parity_filtered(ledger, csv_path, parquet_path):
+    # the generator's dates end today, so the date window is taken from the data
+    dates = ledger['PostingDate'].astype(str).sort_values().to_numpy()
+    window = (dates[len(dates) // 4], dates[len(dates) // 2])
+    filters = {'PostingDate': window, 'CompanyCode': ['COMP_A', 'COMP_B']}
+    assert 0 < len(SAPDataAnalyzer(csv_path, filters=filters).df) < ROWS
+    assert sql_backend.check_parity(csv_path, filters=filters) == []
+    assert sql_backend.check_parity(parquet_path, filters=filters) == []
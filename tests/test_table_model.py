@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 01:24:37 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pandas as pd
+import pytest
+
+QtCore = pytest.importorskip('PySide6.QtCore')
+table_model = pytest.importorskip('table_model')
+
+Qt = QtCore.Qt
+DataFrameModel = table_model.DataFrameModel
+
+# %%
+
+ROWS = 2_500
+BATCH = 1_000
+
+
+@pytest.fixture(scope='module', autouse=True)
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(4)
+    amount = rng.normal(100, 50, ROWS).round(2)
+    amount[::17] = np.nan
+    return pd.DataFrame({
+        'CostCenter': pd.Categorical(rng.choice(['CC_1', 'CC_2', 'CC_3'], ROWS)),
+        'Amount': amount,
+        'DocumentNumber': rng.integers(0, 10_000, ROWS)
+    }, index=pd.RangeIndex(ROWS).map(lambda i: f'r{i}'))
+
+
+def column_text(model, column):
+    return [model.data(model.index(row, column)) for row in range(model.rowCount())]
+
+
+def fetch_all(model):
+    while model.canFetchMore():
+        model.fetchMore()
+
+# %% batches
+
+def test_rows_are_fetched_in_batches(frame):
+    model = DataFrameModel(frame, batch_size=BATCH)
+    inserted = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    assert model.rowCount() == BATCH and model.columnCount() == 3
+    fetch_all(model)
+    assert inserted == [(1_000, 1_999), (2_000, 2_499)]
+    assert model.rowCount() == ROWS and not model.canFetchMore()
+    assert column_text(model, 1) == [str(value) for value in frame['Amount']]
+
+
+def test_set_frame_resets_rows_and_order(frame):
+    model = DataFrameModel(frame, batch_size=BATCH)
+    fetch_all(model)
+    model.sort(1)
+    model.set_frame(frame.head(10))
+    assert model.rowCount() == 10
+    assert model.headerData(0, Qt.Vertical) == 'r0'
+
+# %% cells
+
+def test_cells_are_formatted_on_demand(frame):
+    model = DataFrameModel(frame, batch_size=BATCH)
+    model.set_frame(frame, formatters={'DocumentNumber': lambda number: f'DOC_{number:08d}'})
+    index = model.index(3, 2)
+    assert model.data(index) == f"DOC_{frame['DocumentNumber'].iloc[3]:08d}"
+    assert model.data(model.index(3, 0)) == str(frame['CostCenter'].iloc[3])
+    assert model.data(model.index(3, 1), Qt.TextAlignmentRole) == int(Qt.AlignRight | Qt.AlignVCenter)
+    assert model.data(model.index(3, 0), Qt.TextAlignmentRole) is None
+    assert model.headerData(1, Qt.Horizontal) == 'Amount'
+
+# %% sorting
+
+@pytest.mark.parametrize('column', [0, 1, 2])
+@pytest.mark.parametrize('order', [Qt.AscendingOrder, Qt.DescendingOrder])
+def test_sort_is_a_row_permutation(frame, column, order):
+    original = frame.copy()
+    model = DataFrameModel(frame, batch_size=BATCH)
+    fetch_all(model)
+    model.sort(column, order)
+
+    name = frame.columns[column]
+    expected = frame.sort_values(name, ascending=order == Qt.AscendingOrder, kind='stable', na_position='last')
+    assert column_text(model, column) == [str(value) for value in expected[name]]
+    assert [model.headerData(row, Qt.Vertical) for row in range(ROWS)] == list(expected.index)
+    # the frame itself is neither reordered nor copied
+    pd.testing.assert_frame_equal(frame, original)
+    assert model._df is frame
+
+
+def test_sort_reset_restores_frame_order(frame):
+    model = DataFrameModel(frame, batch_size=BATCH)
+    model.sort(1, Qt.DescendingOrder)
+    assert model.headerData(0, Qt.Vertical) != 'r0'
+    model.sort(-1)
+    assert [model.headerData(row, Qt.Vertical) for row in range(model.rowCount())] == list(frame.index[:BATCH])
+
+
+def test_sort_of_empty_frame():
+    model = DataFrameModel(pd.DataFrame({'Amount': []}))
+    model.sort(0)
+    assert model.rowCount() == 0 and not model.canFetchMore()
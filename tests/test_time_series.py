@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 00:07:52 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_generator
+import time_series
+from data_analysis import StreamingSAPDataAnalyzer
+
+# %%
+
+ROWS = 20_000
+SEED = 17
+
+
+@pytest.fixture(scope='module')
+def ledger():
+    df = data_generator.generate_sap_like_data(ROWS, seed=SEED)
+    df['PostingDate'] = pd.to_datetime(df['PostingDate'].astype(str))
+    df.loc[::53, 'Amount'] = np.nan
+    return df
+
+
+@pytest.fixture(scope='module')
+def periods(ledger):
+    state = time_series.PeriodAggregates()
+    for chunk in np.array_split(np.arange(len(ledger)), 5):
+        state.update(ledger.iloc[chunk])
+    return state
+
+
+def reference_matrix(df, granularity, dimension, value):
+    """The period matrix with a pandas groupby over the full period range"""
+    if granularity == 'fiscal_period':
+        periods = pd.PeriodIndex.from_fields(year=df['FiscalYear'], month=df['FiscalPeriod'], freq='M')
+    else:
+        periods = df['PostingDate'].dt.to_period(time_series.GRANULARITIES[granularity])
+    keys = [pd.Series(periods, index=df.index, name=granularity)]
+    if dimension is not None:
+        keys.append(df[dimension].astype(str))
+    amount = df['Amount'].groupby(keys, observed=True)
+    sums = amount.sum() if value == 'sum' else amount.count() if value == 'count' else amount.mean()
+    wide = sums.unstack(fill_value=np.nan if value == 'mean' else 0) if dimension is not None else sums.to_frame('Total')
+    full = pd.period_range(wide.index.min(), wide.index.max(), name=granularity)
+    return wide.reindex(full, fill_value=np.nan if value == 'mean' else 0)
+
+
+def assert_matrix_equal(actual, expected):
+    assert list(actual.index) == list(expected.index)
+    assert list(map(str, actual.columns)) == list(map(str, expected.columns))
+    np.testing.assert_allclose(actual.to_numpy(float), expected.to_numpy(float), rtol=1e-9)
+
+# %% aggregates
+
+@pytest.mark.parametrize('granularity', list(time_series.GRANULARITIES))
+@pytest.mark.parametrize('dimension', [None, 'CostCenter'])
+@pytest.mark.parametrize('value', ['sum', 'count', 'mean'])
+def test_matrix_matches_groupby(ledger, periods, granularity, dimension, value):
+    assert_matrix_equal(periods.matrix(granularity, dimension, value),
+                        reference_matrix(ledger, granularity, dimension, value))
+
+
+def test_streaming_periods_persist_with_state(ledger, tmp_path):
+    first, second = str(tmp_path / 'first.csv'), str(tmp_path / 'second.csv')
+    data_generator.save_data(ledger.iloc[:ROWS // 2], first, verbose=False)
+    data_generator.save_data(ledger.iloc[ROWS // 2:], second, verbose=False)
+    state_path = str(tmp_path / 'state.pkl')
+
+    StreamingSAPDataAnalyzer(first, chunksize=3_000, state_path=state_path, periods=True)
+    # a new process continues from the stored state
+    analyzer = StreamingSAPDataAnalyzer(state_path=state_path)
+    analyzer.append(second)
+    assert_matrix_equal(StreamingSAPDataAnalyzer(state_path=state_path).build_time_series().matrix('month', 'Material'),
+                        reference_matrix(ledger, 'month', 'Material', 'sum'))
+
+
+def test_streaming_without_periods(ledger, tmp_path):
+    path = str(tmp_path / 'ledger.csv')
+    data_generator.save_data(ledger.iloc[:1_000], path, verbose=False)
+    with pytest.raises(ValueError):
+        StreamingSAPDataAnalyzer(path).build_time_series()
+
+# %% analytics
+
+def test_rolling_mean_matches_pandas(periods):
+    matrix = periods.matrix('week', 'CompanyCode')
+    pd.testing.assert_frame_equal(time_series.rolling_mean(matrix, 4), matrix.astype(float).rolling(4).mean())
+
+
+@pytest.mark.parametrize('granularity', ['month', 'week'])
+def test_compare_periods_matches_pandas(periods, granularity):
+    matrix = periods.matrix(granularity, 'CostCenter')
+    changes = time_series.compare_periods(matrix, granularity)
+    for name, lag in [('previous', 1), ('year', time_series.SEASON[granularity])]:
+        pd.testing.assert_frame_equal(changes[name]['delta'], matrix.diff(lag), check_dtype=False)
+        pd.testing.assert_frame_equal(changes[name]['pct'], matrix.pct_change(lag, fill_method=None) * 100,
+                                      check_dtype=False)
+
+
+def test_simple_smoothing_matches_ewm(periods):
+    matrix = periods.matrix('month', 'CostCenter')
+    result = time_series.exponential_smoothing(matrix, horizon=2, alpha=0.3)
+    level = matrix.ewm(alpha=0.3, adjust=False).mean().iloc[-1]
+    for step in range(2):
+        np.testing.assert_allclose(result['forecast'].iloc[step].to_numpy(), level.to_numpy(), rtol=1e-12)
+    assert list(result['forecast'].index) == list(pd.period_range(matrix.index[-1] + 1, periods=2))
+
+
+def test_fitted_alpha_minimizes_one_step_error(periods):
+    matrix = periods.matrix('week', 'Material')
+    parameters = time_series.exponential_smoothing(matrix)['parameters']
+    # one-step-ahead errors of every grid alpha, the level before a period being its forecast
+    sse = pd.DataFrame({alpha: ((matrix - matrix.ewm(alpha=alpha, adjust=False).mean().shift(1)) ** 2).iloc[1:].sum()
+                        for alpha in time_series.ALPHA_GRID})
+    np.testing.assert_array_equal(parameters['alpha'].to_numpy(), sse.idxmin(axis=1).to_numpy())
+    np.testing.assert_allclose(parameters['sse'].to_numpy(), sse.min(axis=1).to_numpy(), rtol=1e-9)
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:24:45 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import data_storage
+
+# %%
+
+DIMENSIONS = ['CompanyCode', 'CostCenter', 'Material']
+
+# pandas period frequency of each granularity; fiscal periods are labelled
+# as months (FiscalYear-FiscalPeriod), which is exact for calendar fiscal years
+GRANULARITIES = {'day': 'D', 'week': 'W-SUN', 'month': 'M', 'fiscal_period': 'M'}
+
+# periods per year, the lag of year-over-year comparisons
+SEASON = {'day': 365, 'week': 52, 'month': 12, 'fiscal_period': 12}
+
+# smoothing parameters tried when fitting exponential smoothing
+ALPHA_GRID = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 0.95)
+BETA_GRID = (0.01, 0.05, 0.1, 0.2, 0.3)
+
+STATE_VERSION = 1
+
+# %%
+
+def period_keys(chunk, granularity):
+    """Integer period ordinal of every row (-1 = missing), compatible with pd.Period ordinals"""
+    if granularity == 'fiscal_period':
+        year = np.asarray(chunk['FiscalYear'], dtype=np.float64)
+        period = np.asarray(chunk['FiscalPeriod'], dtype=np.float64)
+        keys = (year - 1970) * 12 + period - 1
+        return np.where(np.isnan(keys), -1, keys).astype(np.int64)
+    days = chunk['PostingDate'].to_numpy().astype('datetime64[D]')
+    valid = ~np.isnat(days)
+    if granularity == 'day':
+        keys = days.view(np.int64)
+    elif granularity == 'week':
+        # W-SUN ordinal 1 is the week from Monday 1969-12-29
+        keys = (days.view(np.int64) + 3) // 7 + 1
+    else:
+        keys = days.astype('datetime64[M]').view(np.int64)
+    return np.where(valid, keys, -1)
+
+
+def _period_sums(keys, codes, labels, amount, valid):
+    """sum/count per (period, member) of the rows with a period and a member"""
+    keep = (keys >= 0) & (codes >= 0)
+    keys, codes, amount, valid = keys[keep], codes[keep], amount[keep], valid[keep]
+    if not len(keys):
+        return None
+    first = keys.min()
+    cells = (keys - first) * len(labels) + codes
+    size = (keys.max() - first + 1) * len(labels)
+    rows = np.bincount(cells, minlength=size)
+    sums = np.bincount(cells, weights=amount, minlength=size)
+    counts = np.bincount(cells, weights=valid, minlength=size).astype(np.int64)
+    present = np.flatnonzero(rows)
+    index = pd.MultiIndex.from_arrays([first + present // len(labels), labels.take(present % len(labels))],
+                                      names=['period', 'member'])
+    return pd.DataFrame({'sum': sums[present], 'count': counts[present]}, index=index)
+
+
+class PeriodAggregates:
+    """
+    Amount sum and count per period and dimension member, at several granularities.
+
+    Like aggregates.ReportState, the state is folded in chunk by chunk
+    (update) and states of disjoint rows combine with merge, so new postings
+    extend the series without touching the history. matrix() turns a
+    granularity/dimension pair into a dense period x member table, the
+    input of the rolling, period-over-period and forecasting functions.
+    """
+    def __init__(self, dimensions=DIMENSIONS, granularities=tuple(GRANULARITIES), measure='Amount'):
+        self.dimensions = list(dimensions)
+        self.granularities = list(granularities)
+        self.measure = measure
+        # dimension None holds the total over all members
+        self.tables = {(g, d): None for g in self.granularities for d in [None] + self.dimensions}
+
+    @property
+    def columns(self):
+        """Input columns needed to build the aggregates"""
+        columns = {self.measure} | set(self.dimensions)
+        if set(self.granularities) - {'fiscal_period'}:
+            columns.add('PostingDate')
+        if 'fiscal_period' in self.granularities:
+            columns |= {'FiscalYear', 'FiscalPeriod'}
+        return sorted(columns)
+
+    @classmethod
+    def from_frame(cls, df, dimensions=DIMENSIONS, granularities=tuple(GRANULARITIES), measure='Amount'):
+        return cls(dimensions, granularities, measure).update(df)
+
+    @classmethod
+    def from_file(cls, data_path, dimensions=DIMENSIONS, granularities=tuple(GRANULARITIES), measure='Amount',
+                  filters=None, chunksize=1_000_000):
+        """Build the aggregates chunk by chunk, reading only the needed columns"""
+        state = cls(dimensions, granularities, measure)
+        for chunk in data_storage.iter_chunks(data_path, state.columns, filters, chunksize):
+            state.update(chunk)
+        return state
+
+    def update(self, chunk):
+        """Fold one DataFrame chunk (with parsed PostingDate) into the aggregates"""
+        if len(chunk) == 0:
+            return self
+        amount = chunk[self.measure].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(amount)
+        amount = np.where(valid, amount, 0.0)
+        members = {None: (np.zeros(len(chunk), dtype=np.int64), pd.Index(['Total']))}
+        for dimension in self.dimensions:
+            members[dimension] = aggregates.factorize(chunk[dimension])
+        for granularity in self.granularities:
+            keys = period_keys(chunk, granularity)
+            for dimension, (codes, labels) in members.items():
+                table = _period_sums(keys, codes, labels, amount, valid)
+                if table is not None:
+                    self.tables[granularity, dimension] = aggregates._add_tables(self.tables[granularity, dimension], table)
+        return self
+
+    def merge(self, other):
+        """Combine with the aggregates of another, disjoint set of rows"""
+        for key, table in other.tables.items():
+            if table is not None and key in self.tables:
+                self.tables[key] = aggregates._add_tables(self.tables[key], table)
+        return self
+
+    def save(self, path):
+        aggregates.save_versioned(self, path, STATE_VERSION)
+
+    @classmethod
+    def load(cls, path):
+        return aggregates.load_versioned(path, STATE_VERSION, 'time series state')
+
+    def matrix(self, granularity='month', dimension=None, value='sum'):
+        """
+        Dense table of value ('sum', 'count' or 'mean') with one row per period
+        of the full range (gaps filled with 0, NaN for mean) and one column per
+        member, or a single 'Total' column for dimension None.
+        """
+        table = self.tables[granularity, dimension]
+        if table is None:
+            return pd.DataFrame(index=pd.PeriodIndex([], freq=GRANULARITIES[granularity], name=granularity))
+        wide = table.unstack('member', fill_value=0)
+        keys = wide.index.to_numpy()
+        ordinals = np.arange(keys.min(), keys.max() + 1)
+        wide = wide.reindex(ordinals, fill_value=0)
+        if value == 'mean':
+            result = wide['sum'] / wide['count'].replace(0, np.nan)
+        else:
+            result = wide[value]
+        result.index = pd.PeriodIndex.from_ordinals(ordinals, freq=GRANULARITIES[granularity]).rename(granularity)
+        result.columns.name = dimension
+        return result
+
+# %% rolling windows
+
+def rolling_mean(matrix, window):
+    """Rolling mean of every column of a period matrix from one cumulative sum (NaN before the window is full)"""
+    values = matrix.to_numpy(dtype=np.float64)
+    cumulative = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    result = np.full(values.shape, np.nan)
+    result[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+    return pd.DataFrame(result, index=matrix.index, columns=matrix.columns)
+
+# %% period over period
+
+def period_over_period(matrix, lag=1):
+    """Absolute and relative (%) change of every column against `lag` periods earlier"""
+    previous = matrix.shift(lag)
+    return {'delta': matrix - previous, 'pct': (matrix - previous) / previous * 100}
+
+
+def compare_periods(matrix, granularity='month'):
+    """
+    Changes against the previous period and the same period a year earlier:
+    {'previous': {'delta', 'pct'}, 'year': {'delta', 'pct'}}, e.g. MoM and
+    YoY for monthly matrices.
+    """
+    return {'previous': period_over_period(matrix, 1), 'year': period_over_period(matrix, SEASON[granularity])}
+
+# %% forecasting
+
+def _smooth(values, alpha, beta):
+    """
+    Holt's linear exponential smoothing (simple smoothing if beta is None)
+    of values (periods x series) for parameter rows alpha/beta (grid x 1),
+    one vectorized step per period for all series and parameters at once.
+    Returns the last level, the last trend and the one-step-ahead SSE.
+    """
+    level = np.broadcast_to(values[0], (len(alpha), values.shape[1])).copy()
+    trend = np.zeros_like(level)
+    if beta is not None and len(values) > 1:
+        trend += values[1] - values[0]
+    sse = np.zeros_like(level)
+    for y in values[1:]:
+        error = y - (level + trend)
+        sse += error ** 2
+        previous = level
+        level = level + trend + alpha * error
+        if beta is not None:
+            trend = trend + beta * (level - previous - trend)
+    return level, trend, sse
+
+
+def exponential_smoothing(matrix, horizon=3, alpha=None, beta=None, trend=False):
+    """
+    Forecast every column of a period matrix `horizon` periods ahead.
+
+    Simple exponential smoothing, or Holt's linear trend method with
+    trend=True. Parameters left as None are fitted per series by the
+    smallest one-step-ahead squared error over ALPHA_GRID/BETA_GRID; all
+    series and candidate parameters are smoothed together as arrays, so
+    thousands of series take about as many steps as one.
+    Returns {'forecast': horizon x series, 'parameters': alpha, beta and sse per series}.
+    """
+    values = matrix.to_numpy(dtype=np.float64)
+    if not len(values):
+        raise ValueError("Cannot forecast an empty series")
+    alphas = ALPHA_GRID if alpha is None else (alpha,)
+    betas = (BETA_GRID if beta is None else (beta,)) if trend else (None,)
+    grid = [(a, b) for a in alphas for b in betas]
+    alpha_column = np.array([a for a, b in grid])[:, None]
+    beta_column = np.array([b for a, b in grid], dtype=np.float64)[:, None] if trend else None
+
+    level, slope, sse = _smooth(values, alpha_column, beta_column)
+    best = np.argmin(sse, axis=0)
+    series = np.arange(values.shape[1])
+    level, slope = level[best, series], slope[best, series]
+
+    steps = np.arange(1, horizon + 1)[:, None]
+    forecast = level + steps * slope
+    if isinstance(matrix.index, pd.PeriodIndex):
+        index = pd.period_range(matrix.index[-1] + 1, periods=horizon, name=matrix.index.name)
+    else:
+        index = None
+    parameters = pd.DataFrame({
+        'alpha': alpha_column[best, 0],
+        'beta': beta_column[best, 0] if trend else np.nan,
+        'sse': sse[best, series]
+    }, index=matrix.columns)
+    return {'forecast': pd.DataFrame(forecast, index=index, columns=matrix.columns), 'parameters': parameters}
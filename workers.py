@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 13:10:26 2026
+
+@author: Diyar Altinses, M.Sc.
+"""
+
+# %% imports
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+import profiling
+
+# %%
+
+class WorkerSignals(QObject):
+    """Signals of a TaskWorker, delivered to the GUI thread"""
+    partial = Signal(str, object)
+    progress = Signal(int, str)
+    error = Signal(str)
+    cancelled = Signal()
+    finished = Signal()
+
+
+class TaskWorker(QRunnable):
+    """
+    Runs a generator function on a QThreadPool.
+
+    Every (name, value) pair the generator yields is sent to the GUI thread
+    through signals.partial as soon as it exists. Cancellation is checked
+    between two items, so a cancelled task stops after its current step and
+    never runs the code after its loop.
+    """
+    def __init__(self, task, *args):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = WorkerSignals()
+        self.task = task
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop after the current step and drop all further signals"""
+        self.cancelled = True
+        self.signals.blockSignals(True)
+
+    def run(self):
+        try:
+            # cProfile of the main thread does not see the pool threads
+            with profiling.thread_profile():
+                for done, (name, value) in enumerate(self.task(*self.args), start=1):
+                    if self.cancelled:
+                        break
+                    self.signals.partial.emit(name, value)
+                    self.signals.progress.emit(done, name)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+            return
+        if self.cancelled:
+            self.signals.cancelled.emit()
+        else:
+            self.signals.finished.emit()